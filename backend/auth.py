@@ -1,10 +1,18 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
+import asyncio
+import os
 import secrets
+import time
 import bcrypt
-from datetime import datetime, timedelta
+from datetime import datetime
+from session_store import SessionStore
+from user_store import UserStore, default_users_path
+from signed_tokens import Claims, RevocationList, TokenSigner, default_revocation_path
 
 # Security setup
 security = HTTPBearer()
@@ -17,9 +25,14 @@ security = HTTPBearer()
 #   2. The token is stored in the SESSIONS dictionary with user info.
 #   3. The token is returned to the client.
 #   4. The client must send this token with every request.
-# The server validates tokens by checking them in the SESSIONS dict.
+# The server validates tokens by checking them in the SESSIONS store.
 # If the token exists, the user is authenticated.
-# If not, the session has expired or the user is logged out.
+# If not, the session has expired, gone idle or the user is logged out.
+# A background sweeper (started by main.py) removes expired sessions.
+#
+# With AUTH_TOKEN_MODE=signed, tokens are HMAC-signed instead (see
+# signed_tokens.py): any worker can verify them without SESSIONS, so the
+# API can run with several workers or replicas and survive restarts.
 # =====================================================================
 
 
@@ -27,10 +40,14 @@ security = HTTPBearer()
 # USER DATABASE 
 # =======================================================================
 
+# bcrypt work factor: each +1 doubles the time per hash. Stored hashes with
+# a different cost are re-hashed on the user's next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 def hash_password(password: str) -> str:
     """Hash password using bcrypt - Industry standard!"""
     # Generate salt and hash password
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -41,18 +58,66 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         hashed_password.encode('utf-8')
     )
 
-# Pre-hashed passwords for demo users
-# To add new user: print(hash_password("your_password"))
-USERS = {
-    "demo": hash_password("demo123"),
-    "admin": hash_password("admin123"),
-    "user": hash_password("password"),
-    # Add more users here
-}
+def needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a different work factor ("$2b$<cost>$...")"""
+    return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+
+# Checked against for unknown usernames, so they take as long as a wrong
+# password. Precomputed at 12 rounds; other BCRYPT_ROUNDS values compute
+# their own once, on first use.
+DUMMY_HASH = "$2b$12$kcunZwanY5ffWjqlme.XfOgcmEMpHC.lrEoFd8BZTqGQNBbWoooue"
+
+def dummy_hash() -> str:
+    global DUMMY_HASH
+    if needs_rehash(DUMMY_HASH):
+        DUMMY_HASH = hash_password("dummy-password")
+    return DUMMY_HASH
+
+# Pre-hashed passwords (demo, admin, user), read from users.json on the
+# first login. To add a user: python backend/user_store.py <username>
+USERS = UserStore(default_users_path())
+
+
+# Users allowed to call /admin endpoints
+ADMIN_USERS = {"admin"}
+
+# Scheduler lane per user ("admin" > "default" > "batch"); others get "default"
+USER_TIERS = {"admin": "admin"}
+
+# Active sessions (token -> Session), expiring after SESSION_MAX_AGE_HOURS
+# or SESSION_IDLE_TIMEOUT_MINUTES without activity
+SESSIONS = SessionStore(
+    max_age=float(os.getenv("SESSION_MAX_AGE_HOURS", "24")) * 3600,
+    idle_timeout=float(os.getenv("SESSION_IDLE_TIMEOUT_MINUTES", "120")) * 60,
+    max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "100000"))
+)
+
+# Signed-token mode: every worker shares AUTH_SECRET (comma-separated; the
+# first one signs, all are accepted, for rotation) and the revocation file
+SIGNER: Optional[TokenSigner] = None
+REVOCATIONS: Optional[RevocationList] = None
+if os.getenv("AUTH_TOKEN_MODE", "session").lower() == "signed":
+    SIGNER = TokenSigner(
+        os.getenv("AUTH_SECRET", "").split(","),
+        max_age=float(os.getenv("SESSION_MAX_AGE_HOURS", "24")) * 3600
+    )
+    REVOCATIONS = RevocationList(default_revocation_path())
+
+# Signed tokens have no server-side session to hold the model preference,
+# so each worker remembers it for recently seen tokens
+MODEL_PREFERENCES: "OrderedDict[str, str]" = OrderedDict()
+MAX_MODEL_PREFERENCES = 10_000
 
+REVOCATION_PRUNE_INTERVAL = 600
+_last_revocation_prune = 0.0
 
-# Active sessions (token: user_data)
-SESSIONS = {}
+# Password checks run on their own small thread pool (bcrypt releases the
+# GIL), never on the event loop or the request threadpool. Logins beyond
+# AUTH_MAX_PENDING_LOGINS waiting for it are turned away with 503.
+PASSWORD_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", str(os.cpu_count() or 2)))
+MAX_PENDING_LOGINS = int(os.getenv("AUTH_MAX_PENDING_LOGINS", "64"))
+PASSWORD_POOL = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="bcrypt")
+_pending_logins = 0
 
 # ============================================================================
 # MODELS
@@ -81,28 +146,63 @@ def create_token() -> str:
     """Generate cryptographically secure random token"""
     return secrets.token_urlsafe(32)
 
+def check_credentials(username: str, password: str) -> bool:
+    """bcrypt password check (blocking: ~250ms at 12 rounds)"""
+    hashed = USERS.get(username)
+    if hashed is None:
+        # Prevent timing attacks by still checking a password
+        verify_password(password, dummy_hash())
+        return False
+    
+    if not verify_password(password, hashed):
+        return False
+    if needs_rehash(hashed):
+        # Upgrade (or downgrade) to the configured work factor
+        USERS[username] = hash_password(password)
+        print(f" Re-hashed password for {username} with {BCRYPT_ROUNDS} rounds")
+    return True
+
+def issue_token(username: str) -> str:
+    """New session token (or signed token) for an authenticated user"""
+    if SIGNER is not None:
+        return SIGNER.issue(username)
+    # Create secure session token
+    token = create_token()
+    SESSIONS.add(token, username)
+    return token
+
 def authenticate_user(username: str, password: str) -> Optional[str]:
     """
     Authenticate user with bcrypt password verification
     Returns: token if success, None if failed
     """
-    # Check if user exists
-    if username not in USERS:
-        # Prevent timing attacks by still checking password
-        bcrypt.checkpw(b"dummy", bcrypt.gensalt())
-        return None
+    if check_credentials(username, password):
+        print(f"Authentication successful: {username}")
+        return issue_token(username)
     
-    # Verify password using bcrypt
-    if verify_password(password, USERS[username]):
-        # Create secure session token
-        token = create_token()
-        SESSIONS[token] = {
-            "username": username,
-            "created_at": datetime.now(),
-            "last_activity": datetime.now()
-        }
+    print(f"Authentication failed: {username}")
+    return None
+
+async def authenticate_user_async(username: str, password: str) -> Optional[str]:
+    """authenticate_user() with the bcrypt work on PASSWORD_POOL"""
+    global _pending_logins
+    if _pending_logins >= MAX_PENDING_LOGINS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress. Please try again shortly.",
+            headers={"Retry-After": "1"}
+        )
+    
+    _pending_logins += 1
+    try:
+        loop = asyncio.get_running_loop()
+        ok = await loop.run_in_executor(PASSWORD_POOL, check_credentials, username, password)
+    finally:
+        _pending_logins -= 1
+    
+    if ok:
         print(f"Authentication successful: {username}")
-        return token
+        return issue_token(username)
     
     print(f"Authentication failed: {username}")
     return None
@@ -112,48 +212,101 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security))
     Verify JWT-like token and return username
     Used as dependency in protected routes
     """
-    token = credentials.credentials
+    if SIGNER is not None:
+        claims = signed_claims(credentials.credentials)
+        username = claims.username if claims else None
+    else:
+        # Expired or idle sessions are removed here; a hit updates last activity
+        session = SESSIONS.touch(credentials.credentials)
+        username = session.username if session else None
     
-    if token not in SESSIONS:
+    if username is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired session. Please login again."
         )
     
-    # Update last activity
-    SESSIONS[token]["last_activity"] = datetime.now()
-    
-    # Check if session is too old (24 hours)
-    session_age = datetime.now() - SESSIONS[token]["created_at"]
-    if session_age > timedelta(hours=24):
-        del SESSIONS[token]
+    return username
+
+def signed_claims(token: str) -> Optional[Claims]:
+    """Claims of a valid, unexpired, unrevoked signed token"""
+    claims = SIGNER.verify(token)
+    if claims is None or REVOCATIONS.is_revoked(claims.token_id):
+        return None
+    return claims
+
+def session_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    """Raw bearer token of the current request"""
+    return credentials.credentials
+
+def get_session_model(token: str) -> Optional[str]:
+    """Model preference stored in the session, if any"""
+    if SIGNER is not None:
+        return MODEL_PREFERENCES.get(token)
+    session = SESSIONS.get(token)
+    return session.model if session else None
+
+def set_session_model(token: str, model_name: str) -> bool:
+    """Store the model preference for this session only"""
+    if SIGNER is not None:
+        if signed_claims(token) is None:
+            return False
+        MODEL_PREFERENCES[token] = model_name
+        MODEL_PREFERENCES.move_to_end(token)
+        if len(MODEL_PREFERENCES) > MAX_MODEL_PREFERENCES:
+            MODEL_PREFERENCES.popitem(last=False)
+        return True
+    session = SESSIONS.get(token)
+    if session is None:
+        return False
+    session.model = model_name
+    return True
+
+def require_admin(username: str = Depends(verify_token)) -> str:
+    """
+    Verify token and require an admin account
+    Used as dependency in admin routes
+    """
+    if username not in ADMIN_USERS:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Session expired. Please login again."
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required."
         )
-    
-    return SESSIONS[token]["username"]
+    return username
+
+def get_user_tier(username: str) -> str:
+    """Scheduler priority lane for this user"""
+    return USER_TIERS.get(username, "default")
 
 def logout_user(token: str) -> bool:
-    """Remove token from active sessions"""
-    if token in SESSIONS:
-        username = SESSIONS[token]["username"]
-        del SESSIONS[token]
-        print(f" User logged out: {username}")
+    """Remove token from active sessions (or revoke a signed token)"""
+    if SIGNER is not None:
+        claims = signed_claims(token)
+        if claims is None:
+            return False
+        REVOCATIONS.revoke(claims.token_id, claims.expires_at)
+        MODEL_PREFERENCES.pop(token, None)
+        print(f" User logged out: {claims.username}")
+        return True
+    session = SESSIONS.remove(token)
+    if session is not None:
+        print(f" User logged out: {session.username}")
         return True
     return False
 
 def get_user_info(token: str) -> Optional[UserInfo]:
     """Get user session information"""
-    if token not in SESSIONS:
+    session = signed_claims(token) if SIGNER is not None else SESSIONS.get(token)
+    if session is None:
         return None
     
-    session = SESSIONS[token]
-    created = session["created_at"]
+    created = datetime.fromtimestamp(
+        session.issued_at if SIGNER is not None else session.created_at
+    )
     duration = datetime.now() - created
     
     return UserInfo(
-        username=session["username"],
+        username=session.username,
         login_time=created.strftime("%Y-%m-%d %H:%M:%S"),
         session_duration=str(duration).split('.')[0]  # Remove microseconds
     )
@@ -163,33 +316,40 @@ def get_user_info(token: str) -> Optional[UserInfo]:
 # ============================================================================
 
 def get_active_users() -> int:
-    """Get count of active sessions"""
+    """Get count of active sessions (not tracked for signed tokens)"""
     return len(SESSIONS)
 
-def get_all_sessions() -> list:
-    """Get all active sessions (admin only)"""
+def get_all_sessions(offset: int = 0, limit: int = 50) -> list:
+    """One page of active sessions, most recently active first (admin only)"""
     return [
         {
-            "username": data["username"],
-            "login_time": data["created_at"].strftime("%Y-%m-%d %H:%M:%S"),
-            "last_activity": data["last_activity"].strftime("%H:%M:%S")
+            "username": session.username,
+            "login_time": datetime.fromtimestamp(session.created_at).strftime("%Y-%m-%d %H:%M:%S"),
+            "last_activity": datetime.fromtimestamp(session.last_activity).strftime("%H:%M:%S")
         }
-        for token, data in SESSIONS.items()
+        for token, session in SESSIONS.page(offset, limit)
     ]
 
-def cleanup_old_sessions(max_age_hours: int = 24):
-    """Remove sessions older than max_age_hours"""
-    now = datetime.now()
-    expired = [
-        token for token, data in SESSIONS.items()
-        if (now - data["created_at"]).total_seconds() > max_age_hours * 3600
-    ]
-    for token in expired:
-        username = SESSIONS[token]["username"]
-        del SESSIONS[token]
-        print(f" Cleaned up expired session: {username}")
+def cleanup_old_sessions(max_age_hours: Optional[float] = None, *, limit: Optional[int] = None) -> int:
+    """
+    Remove expired and idle sessions now (the background sweeper calls this)
+    max_age_hours also removes every session older than that; `limit` caps
+    how many expired sessions one call removes
+    """
+    global _last_revocation_prune
+    removed = SESSIONS.sweep(limit)
+    if max_age_hours is not None:
+        removed += SESSIONS.remove_older_than(max_age_hours * 3600)
+    if removed:
+        print(f" Cleaned up {removed} expired sessions")
     
-    return len(expired)
+    # Revocations are only needed until the revoked token would expire
+    if REVOCATIONS is not None and time.monotonic() - _last_revocation_prune > REVOCATION_PRUNE_INTERVAL:
+        _last_revocation_prune = time.monotonic()
+        pruned = REVOCATIONS.prune()
+        if pruned:
+            print(f" Pruned {pruned} expired token revocations")
+    return removed
 
 # ============================================================================
 # UTILITY FUNCTIONS
@@ -0,0 +1,261 @@
+"""
+Offline bulk inference: run a JSONL file of prompts through LLMService
+
+Each input line is a JSON object:
+    {"id": "q1", "prompt": "...", "model": "zephyr", "max_tokens": 150, "system_prompt": "..."}
+Only "prompt" is required. One result per line is appended to the output
+file as it completes (in completion order, tagged with the input line):
+    {"line": 0, "id": "q1", "response": "...", "model": "zephyr", "cached": false, "latency_ms": 812.4}
+    {"line": 1, "id": "q2", "error": "...", "status": 503}
+
+Progress is checkpointed next to the output file. A killed run started
+again with the same arguments skips finished lines and writes each result
+exactly once. Memory stays constant: the input is read as it is processed,
+never more than a bounded window ahead of the oldest unfinished line.
+
+Usage:
+    python backend/bulk_runner.py prompts.jsonl results.jsonl
+    python backend/bulk_runner.py prompts.jsonl results.jsonl --concurrency 16 --retries 5 --no-cache
+"""
+from typing import Callable, Optional, Set
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+
+from latency import LatencyHistogram
+from resilience import UpstreamError
+
+
+class Checkpoint:
+    """Resume point: every line before next_line (and those in done_ahead) is written"""
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        self.input_path = input_path
+        self.next_line = 0
+        self.done_ahead: Set[int] = set()
+        self.output_bytes = 0
+        self.counts = {"ok": 0, "failed": 0, "cached": 0}
+
+    @classmethod
+    def load(cls, path: str, input_path: str) -> Optional["Checkpoint"]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if data["input"] != input_path:
+            raise ValueError(f"{path} belongs to {data['input']}; use --restart to start over")
+        checkpoint = cls(path, input_path)
+        checkpoint.next_line = data["next_line"]
+        checkpoint.done_ahead = set(data["done_ahead"])
+        checkpoint.output_bytes = data["output_bytes"]
+        checkpoint.counts = data["counts"]
+        return checkpoint
+
+    def is_done(self, line: int) -> bool:
+        return line < self.next_line or line in self.done_ahead
+
+    def complete(self, line: int):
+        self.done_ahead.add(line)
+        while self.next_line in self.done_ahead:
+            self.done_ahead.remove(self.next_line)
+            self.next_line += 1
+
+    def save(self, output_bytes: int):
+        self.output_bytes = output_bytes
+        data = {
+            "input": self.input_path,
+            "next_line": self.next_line,
+            "done_ahead": sorted(self.done_ahead),
+            "output_bytes": output_bytes,
+            "counts": self.counts
+        }
+        with open(f"{self.path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(f"{self.path}.tmp", self.path)
+
+
+def parse_line(text: str) -> dict:
+    """One input line -> request dict; ValueError says what is wrong with it"""
+    try:
+        request = json.loads(text)
+    except ValueError:
+        raise ValueError("invalid input line: not JSON")
+    if not isinstance(request, dict) or not isinstance(request.get("prompt"), str):
+        raise ValueError("invalid input line: prompt must be a string")
+    max_tokens = request.get("max_tokens")
+    if max_tokens is not None and (type(max_tokens) is not int or max_tokens < 1):
+        raise ValueError("invalid input line: max_tokens must be a positive integer")
+    return request
+
+
+async def run_item(service, line: int, request: dict, defaults: dict, use_cache: bool,
+                   latency: LatencyHistogram) -> dict:
+    """One prompt -> one result line (errors are results too)"""
+    result = {"line": line, "id": request.get("id")}
+    start = time.perf_counter()
+    try:
+        completion = await service.generate(
+            request["prompt"],
+            request.get("max_tokens") or defaults["max_tokens"],
+            system_prompt=request.get("system_prompt"),
+            use_cache=use_cache,
+            model=request.get("model") or defaults["model"]
+        )
+    except UpstreamError as e:
+        return {**result, "error": str(e), "status": e.status_code}
+    except ValueError as e:
+        # Unknown model
+        return {**result, "error": str(e), "status": 400}
+    except Exception as e:
+        # Anything else fails this line only; the run and its checkpoint go on
+        return {**result, "error": f"{type(e).__name__}: {e}", "status": 500}
+    elapsed = time.perf_counter() - start
+    latency.record(elapsed)
+    return {**result, "response": completion.text, "model": completion.model,
+            "cached": completion.cached, "latency_ms": round(elapsed * 1000, 1)}
+
+
+async def run_bulk(service, input_path: str, output_path: str, concurrency: int = 8,
+                   use_cache: bool = True, model: Optional[str] = None, max_tokens: int = 150,
+                   restart: bool = False, checkpoint_interval: float = 1.0,
+                   log: Callable[[str], None] = print) -> dict:
+    """Process input_path into output_path, resuming from the checkpoint if there is one"""
+    input_path = os.path.abspath(input_path)
+    checkpoint_path = f"{output_path}.checkpoint"
+    checkpoint = None if restart else Checkpoint.load(checkpoint_path, input_path)
+    resumed = checkpoint is not None
+    if checkpoint is None:
+        checkpoint = Checkpoint(checkpoint_path, input_path)
+    defaults = {"model": model, "max_tokens": max_tokens}
+    # Never read further than this past the oldest unfinished line, so the
+    # checkpoint (and memory) stay small even if one prompt is very slow
+    read_ahead = concurrency * 4
+    latency = LatencyHistogram(window=sys.maxsize)
+    processed = 0
+    start = time.perf_counter()
+
+    # Anything written after the last checkpoint is dropped and redone
+    with open(output_path, "r+b" if resumed and os.path.exists(output_path) else "wb") as out:
+        out.truncate(checkpoint.output_bytes if resumed else 0)
+        out.seek(0, os.SEEK_END)
+        if resumed:
+            log(f" Resuming at line {checkpoint.next_line} ({out.tell()} bytes already written)")
+
+        def write(line: int, result: dict):
+            nonlocal processed
+            out.write(json.dumps(result).encode("utf-8") + b"\n")
+            checkpoint.counts["failed" if "error" in result else "ok"] += 1
+            checkpoint.counts["cached"] += bool(result.get("cached"))
+            checkpoint.complete(line)
+            processed += 1
+
+        pending = {}
+        last_save = time.monotonic()
+        with open(input_path, encoding="utf-8") as source:
+            lines = enumerate(source)
+            exhausted = False
+            read = 0
+            try:
+                while True:
+                    while (not exhausted and len(pending) < concurrency
+                           and read - checkpoint.next_line < read_ahead):
+                        item = next(lines, None)
+                        if item is None:
+                            exhausted = True
+                            break
+                        number, text = item
+                        read = number + 1
+                        if checkpoint.is_done(number):
+                            continue
+                        if not text.strip():
+                            checkpoint.complete(number)
+                            continue
+                        try:
+                            request = parse_line(text)
+                        except ValueError as e:
+                            write(number, {"line": number, "error": str(e), "status": 400})
+                            continue
+                        task = asyncio.ensure_future(run_item(service, number, request, defaults, use_cache, latency))
+                        pending[task] = number
+                    if not pending:
+                        if exhausted:
+                            break
+                        continue
+
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        write(pending.pop(task), task.result())
+                    if time.monotonic() - last_save >= checkpoint_interval:
+                        out.flush()
+                        checkpoint.save(out.tell())
+                        last_save = time.monotonic()
+                        log(f" {checkpoint.next_line} lines done, {len(pending)} in flight")
+            finally:
+                for task in pending:
+                    task.cancel()
+                # Results already written are safe to keep
+                out.flush()
+                checkpoint.save(out.tell())
+
+    elapsed = time.perf_counter() - start
+    return {
+        "processed": processed,
+        **checkpoint.counts,
+        "seconds": round(elapsed, 2),
+        "throughput_per_second": round(processed / elapsed, 2) if elapsed else 0.0,
+        "latency": latency.snapshot()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("output", help="JSONL file for results (appended to on resume)")
+    parser.add_argument("--concurrency", type=int, default=8, help="prompts in flight at once")
+    parser.add_argument("--retries", type=int, default=None, help="upstream attempts per prompt (LLM_RETRY_ATTEMPTS)")
+    parser.add_argument("--model", default=None, help="model for lines that do not name one")
+    parser.add_argument("--max-tokens", type=int, default=150, help="for lines that do not set max_tokens")
+    parser.add_argument("--no-cache", action="store_true", help="always call the model")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--verbose", action="store_true", help="show per-request service logging")
+    args = parser.parse_args()
+
+    from llm_service import LLMService
+
+    async def run() -> dict:
+        service = LLMService()
+        if args.retries is not None:
+            service.retry_policy.attempts = max(1, args.retries)
+        try:
+            return await run_bulk(
+                service, args.input, args.output,
+                concurrency=args.concurrency, use_cache=not args.no_cache,
+                model=args.model, max_tokens=args.max_tokens, restart=args.restart,
+                log=lambda message: print(message, file=sys.stderr)
+            )
+        finally:
+            await service.close()
+
+    # LLMService logs every request; keep the progress readable
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            report = asyncio.run(run())
+
+    latency = report["latency"]
+    print("=" * 60)
+    print(" BULK RUN")
+    print("=" * 60)
+    print(f"processed {report['processed']} lines in {report['seconds']}s "
+          f"({report['throughput_per_second']}/s)")
+    print(f"ok {report['ok']} | failed {report['failed']} | cached {report['cached']} (all runs)")
+    print(f"latency p50 {latency['p50_ms']}ms | p95 {latency['p95_ms']}ms | p99 {latency['p99_ms']}ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
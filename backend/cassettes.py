@@ -0,0 +1,263 @@
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import gzip
+import json
+import os
+import time
+
+from providers import ChatProvider, SimulatedUpstreamError, chat_chunk, chat_response
+from response_cache import make_cache_key
+
+# ============================================================================
+# RECORD / REPLAY OF UPSTREAM TRAFFIC
+# ============================================================================
+# LLM_RECORD_CASSETTE=<path> wraps every provider in a RecordingProvider:
+# each chat_completion call is appended to the cassette as one JSON line
+#     {"model", "messages", "max_tokens", "temperature", "stream",
+#      "latency_ms", "text"}                          non-streaming answer
+#      "chunks": [[ms since the call started, text], ...]     streamed answer
+#      "status": 503                                          failed call
+# (gzip-compressed when the path ends in .gz). Entries are buffered and
+# written by a background task on a worker thread, so recording never
+# blocks the event loop on disk I/O.
+#
+# LLM_PROVIDER=replay plays a cassette (CASSETTE_PATH) back without network:
+#   - a request is matched on model, messages, max_tokens and temperature;
+#     repeats of the same request are replayed in recorded order
+#   - answers arrive with the recorded timing divided by REPLAY_SPEED
+#     (1 = original, 2 = twice as fast, 0 = no waiting)
+#   - REPLAY_MISS=error fails unmatched requests; "sequential" answers them
+#     with the recorded interactions in order instead, so a load test with
+#     different prompts still sees the recorded latencies and payloads
+# ============================================================================
+
+CASSETTE_VERSION = 1
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _status(error: Exception) -> int:
+    status = getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None and isinstance(error, TimeoutError):
+        status = 504
+    return status or 502
+
+
+class CassetteRecorder:
+    """Appends interactions to a cassette file, one JSON line each"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.interactions = 0
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = _open(path, "a")
+        # Lines waiting for the writer task, which runs while there are any
+        self._pending: List[str] = []
+        self._writer: Optional[asyncio.Task] = None
+        if new:
+            self._write_lines([_line({"cassette": CASSETTE_VERSION})])
+
+    def record(self, interaction: dict):
+        """Queue an interaction; it reaches the file shortly after"""
+        self._pending.append(_line(interaction))
+        self.interactions += 1
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self):
+        while self._pending:
+            lines, self._pending = self._pending, []
+            await asyncio.to_thread(self._write_lines, lines)
+
+    def _write_lines(self, lines: List[str]):
+        self._file.write("".join(lines))
+        self._file.flush()
+
+    async def close(self):
+        """Write what is still queued, then close the file"""
+        if self._writer is not None:
+            await self._writer
+        if not self._file.closed:
+            self._file.close()
+
+
+def load_cassette(path: str) -> List[dict]:
+    """Interactions of a cassette, in recorded order"""
+    with _open(path, "r") as f:
+        interactions = [json.loads(line) for line in f if line.strip()]
+    if not interactions or interactions[0].get("cassette") != CASSETTE_VERSION:
+        raise ValueError(f"{path} is not a version {CASSETTE_VERSION} cassette")
+    return interactions[1:]
+
+
+class RecordingProvider(ChatProvider):
+    """Passes calls through to another provider and records them"""
+
+    def __init__(self, inner: ChatProvider, recorder: CassetteRecorder):
+        self.inner = inner
+        self.recorder = recorder
+        self.name = inner.name
+
+    async def chat_completion(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                              temperature: float, stream: bool = False):
+        interaction = {
+            "model": model, "messages": messages, "max_tokens": max_tokens,
+            "temperature": temperature, "stream": stream
+        }
+        start = time.perf_counter()
+        try:
+            response = await self.inner.chat_completion(
+                messages=messages, model=model, max_tokens=max_tokens, temperature=temperature, stream=stream
+            )
+        except Exception as e:
+            self._record_error(interaction, start, e)
+            raise
+        if stream:
+            return self._record_stream(interaction, start, response)
+        interaction["latency_ms"] = _elapsed_ms(start)
+        interaction["text"] = response.choices[0].message.content
+        self.recorder.record(interaction)
+        return response
+
+    async def _record_stream(self, interaction: dict, start: float, stream) -> AsyncIterator:
+        chunks = []
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunks.append([_elapsed_ms(start), chunk.choices[0].delta.content])
+                yield chunk
+        except Exception as e:
+            # A stream that breaks part-way is replayed the same way
+            interaction["chunks"] = chunks
+            self._record_error(interaction, start, e)
+            raise
+        interaction["chunks"] = chunks
+        interaction["latency_ms"] = _elapsed_ms(start)
+        self.recorder.record(interaction)
+
+    def _record_error(self, interaction: dict, start: float, error: Exception):
+        interaction["latency_ms"] = _elapsed_ms(start)
+        interaction["status"] = _status(error)
+        self.recorder.record(interaction)
+
+    async def close(self):
+        await self.inner.close()
+        await self.recorder.close()
+
+    def stats(self) -> dict:
+        return {**self.inner.stats(), "recording": {"path": self.recorder.path,
+                                                    "interactions": self.recorder.interactions}}
+
+
+class ReplayProvider(ChatProvider):
+    """Answers from a recorded cassette with the recorded timing"""
+
+    name = "replay"
+
+    def __init__(self, interactions: List[dict], speed: float = 1.0, miss: str = "error"):
+        if miss not in ("error", "sequential"):
+            raise ValueError(f"Unknown REPLAY_MISS: {miss}")
+        self.interactions = interactions
+        self.speed = speed
+        self.miss = miss
+        # request key -> recorded interactions, replayed in order (cycling)
+        self._by_key: Dict[str, List[dict]] = {}
+        for interaction in interactions:
+            key = self._key(interaction["model"], interaction["messages"],
+                            interaction["max_tokens"], interaction["temperature"])
+            self._by_key.setdefault(key, []).append(interaction)
+        self._played: Dict[str, int] = {}
+        self._sequence = 0
+        self.replayed = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "ReplayProvider":
+        path = os.getenv("CASSETTE_PATH")
+        if not path:
+            raise ValueError(" CASSETTE_PATH is required for LLM_PROVIDER=replay")
+        return cls(
+            load_cassette(path),
+            speed=float(os.getenv("REPLAY_SPEED", "1")),
+            miss=os.getenv("REPLAY_MISS", "error").lower()
+        )
+
+    @staticmethod
+    def _key(model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> str:
+        return make_cache_key(model, messages, max_tokens, temperature)
+
+    def _next(self, model: str, messages: List[Dict[str, str]], max_tokens: int,
+              temperature: float) -> Optional[dict]:
+        key = self._key(model, messages, max_tokens, temperature)
+        recorded = self._by_key.get(key)
+        if recorded:
+            played = self._played.get(key, 0)
+            self._played[key] = played + 1
+            return recorded[played % len(recorded)]
+        self.misses += 1
+        if self.miss == "sequential" and self.interactions:
+            self._sequence += 1
+            return self.interactions[(self._sequence - 1) % len(self.interactions)]
+        return None
+
+    async def _wait_until(self, start: float, offset_ms: float):
+        """Sleep until offset_ms (recorded time, scaled by speed) after start"""
+        if self.speed <= 0:
+            return
+        delay = start + offset_ms / 1000 / self.speed - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def chat_completion(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                              temperature: float, stream: bool = False):
+        start = time.perf_counter()
+        interaction = self._next(model, messages, max_tokens, temperature)
+        if interaction is None:
+            raise SimulatedUpstreamError(404, f"no recorded interaction for this {model} request")
+        self.replayed += 1
+        chunks = interaction.get("chunks")
+        if chunks is None:
+            # Recorded without streaming: the whole answer arrives at once
+            chunks = [[interaction["latency_ms"], interaction["text"]]] if "text" in interaction else []
+        status = interaction.get("status")
+
+        if not stream:
+            await self._wait_until(start, interaction["latency_ms"])
+            if status:
+                raise SimulatedUpstreamError(status)
+            return chat_response("".join(text for _, text in chunks))
+        if status and not chunks:
+            await self._wait_until(start, interaction["latency_ms"])
+            raise SimulatedUpstreamError(status)
+        return self._stream(start, chunks, interaction)
+
+    async def _stream(self, start: float, chunks: List[list], interaction: dict) -> AsyncIterator:
+        for offset, text in chunks:
+            await self._wait_until(start, offset)
+            yield chat_chunk(text)
+        await self._wait_until(start, interaction["latency_ms"])
+        if interaction.get("status"):
+            raise SimulatedUpstreamError(interaction["status"])
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.name,
+            "interactions": len(self.interactions),
+            "speed": self.speed,
+            "replayed": self.replayed,
+            "misses": self.misses
+        }
+
+
+def _line(data: dict) -> str:
+    return json.dumps(data, separators=(",", ":")) + "\n"
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
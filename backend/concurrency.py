@@ -0,0 +1,165 @@
+from collections import deque
+from typing import Deque, Optional
+import asyncio
+import math
+import time
+
+from resilience import UpstreamOverloaded
+
+# ============================================================================
+# ADAPTIVE UPSTREAM CONCURRENCY LIMIT
+# ============================================================================
+# Each model endpoint has its own throughput ceiling, and we don't know it in
+# advance. The limit is discovered from what the model tells us:
+#   - Latency (gradient): recent latency is compared with a no-load
+#     baseline (the lowest recent latency seen over the last two windows of
+#     samples). While recent <= tolerance x baseline the model keeps up and
+#     the limit grows by ~sqrt(limit) per round trip; once latency climbs
+#     the limit shrinks in proportion (never below half per step). The
+#     baseline is refreshed every window, so a model that got permanently
+#     slower is re-learned.
+#   - Errors (AIMD): timeouts, 429s and 5xx cut the limit multiplicatively.
+# Decreases happen at most once per round trip: the calls that finish right
+# after a cut were started before it and carry no news about the new limit.
+# Work over the limit waits in a bounded FIFO; when that is full or the wait
+# takes too long the request is shed with UpstreamOverloaded (503) instead
+# of piling onto a struggling model.
+# ============================================================================
+
+
+class AdaptiveLimiter:
+    """Gradient/AIMD concurrency limit with a bounded wait queue"""
+
+    def __init__(self, name: str, initial_limit: int = 8, min_limit: int = 1,
+                 max_limit: int = 64, tolerance: float = 2.0, backoff: float = 0.75,
+                 window: int = 250, max_queue: int = 256,
+                 queue_timeout: float = 10, adaptive: bool = True):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.adaptive = adaptive
+        self.limit = float(max_limit if not adaptive
+                           else min(max(initial_limit, self.min_limit), self.max_limit))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window = window
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Recent latency (EWMA over ~10 samples) and its minimum in the
+        # current and previous window
+        self._short: Optional[float] = None
+        self._min_current = math.inf
+        self._min_previous = math.inf
+        self._samples = 0
+        self._last_decrease = 0.0
+
+        self.shed = 0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        """Wait for a slot, or raise UpstreamOverloaded"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.shed += 1
+            raise UpstreamOverloaded(self.name, "too many requests waiting for this model",
+                                     retry_after=1)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over just as we gave up
+                self.release(None)
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed += 1
+                raise UpstreamOverloaded(self.name, "model is overloaded, request shed",
+                                         retry_after=1) from e
+            raise
+
+    def release(self, latency: Optional[float], dropped: bool = False):
+        """
+        Free a slot and adapt the limit
+        latency: signal for a successful call (None = no signal, e.g. cancelled)
+        dropped: the model failed in a way that signals overload
+        """
+        self.in_flight -= 1
+        if self.adaptive:
+            if dropped:
+                self._decrease(self.limit * self.backoff)
+            elif latency is not None:
+                self._on_sample(latency)
+        self._wake()
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "adaptive": self.adaptive,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "shed": self.shed,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "latency_baseline_ms": round(self._baseline() * 1000, 2),
+            "latency_recent_ms": round((self._short or 0) * 1000, 2)
+        }
+
+    def _on_sample(self, latency: float):
+        latency = max(latency, 1e-6)
+        if self._short is None:
+            self._short = latency
+        self._short += (latency - self._short) * 0.1
+        self._min_current = min(self._min_current, self._short)
+        self._samples += 1
+        if self._samples >= self.window:
+            self._min_previous, self._min_current = self._min_current, math.inf
+            self._samples = 0
+
+        gradient = self.tolerance * self._baseline() / self._short
+        if gradient < 1.0:
+            self._decrease(self.limit * max(0.5, gradient))
+        elif self.in_flight + 1 >= self.limit / 2:
+            # Only grow while the limit is actually being used; ~limit calls
+            # finish per round trip, so this adds ~sqrt(limit) per round trip
+            before = int(self.limit)
+            self.limit = min(float(self.max_limit), self.limit + math.sqrt(self.limit) / self.limit)
+            if int(self.limit) > before:
+                self.increases += 1
+
+    def _baseline(self) -> float:
+        baseline = min(self._min_current, self._min_previous)
+        return 0.0 if baseline == math.inf else baseline
+
+    def _decrease(self, new_limit: float):
+        now = time.monotonic()
+        if now - self._last_decrease < (self._short or 0.0):
+            return
+        self._last_decrease = now
+        before = int(self.limit)
+        self.limit = max(float(self.min_limit), new_limit)
+        if int(self.limit) < before:
+            self.decreases += 1
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
@@ -0,0 +1,160 @@
+from typing import Dict, List, NamedTuple, Optional
+import re
+
+# ============================================================================
+# CONTEXT PACKING
+# ============================================================================
+# Fits a conversation into the model's prompt budget before it is sent:
+#     budget = min(context window - max_tokens, max_prompt_tokens)
+# The system prompt and the new message always go in. Earlier turns are
+# added newest first while they fit; turns that no longer fit are folded
+# into a rolling summary that rides along in the system message.
+#   - Token counts are estimated once per turn and stored on the Turn
+#   - The summary is extended incrementally: each turn is summarized once,
+#     when it first falls out of the window, never re-reading the history
+#   - The summary has its own budget; its oldest lines go first
+# Summaries are extractive (the first sentence of each turn), so packing
+# never costs an extra model call.
+# ============================================================================
+
+# Word pieces and punctuation; long words count as several tokens
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Role markers and separators the chat template adds around each message
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate tokenizer-independent token count"""
+    return sum(1 + len(piece) // 6 for piece in _TOKEN_PATTERN.findall(text))
+
+
+def summarize_turn(role: str, content: str, max_chars: int = 160) -> str:
+    """One-line extractive summary: the first sentence, shortened"""
+    text = " ".join(content.split())
+    match = re.search(r"[.!?](\s|$)", text)
+    if match:
+        text = text[:match.end()].strip()
+    if len(text) > max_chars:
+        text = text[:max_chars - 3].rstrip() + "..."
+    return f"- {'User' if role == 'user' else 'Assistant'}: {text}"
+
+
+class SummaryLine(NamedTuple):
+    turn: int           # absolute index of the summarized turn
+    text: str
+    tokens: int
+
+
+class PackedContext(NamedTuple):
+    system_prompt: Optional[str]
+    history: List[Dict[str, str]]
+    prompt_tokens: int
+    turns_included: int
+    turns_summarized: int
+
+
+class ContextPacker:
+    """Fit system prompt, history and new message into a per-model token budget"""
+
+    def __init__(self, context_windows: Dict[str, int], max_prompt_tokens: int = 4096,
+                 summary_tokens: int = 256, default_window: int = 4096):
+        self.context_windows = context_windows
+        self.max_prompt_tokens = max_prompt_tokens
+        self.summary_tokens = summary_tokens
+        self.default_window = default_window
+        self.packed = 0
+        self.turns_summarized = 0
+
+    def budget(self, model: str, max_tokens: int) -> int:
+        """Prompt tokens available once room for the answer is reserved"""
+        window = self.context_windows.get(model, self.default_window)
+        return max(0, min(window - max_tokens, self.max_prompt_tokens))
+
+    def pack(self, conversation, prompt: str, model: str, max_tokens: int) -> PackedContext:
+        """Messages for `prompt` in `conversation`; updates its rolling summary"""
+        turns = conversation.turns
+        first = conversation.dropped        # absolute index of turns[0]
+        fixed = estimate_tokens(prompt) + MESSAGE_OVERHEAD
+        if conversation.system_prompt:
+            fixed += estimate_tokens(conversation.system_prompt) + MESSAGE_OVERHEAD
+        room = self.budget(model, max_tokens) - fixed
+
+        # Newest turns first, while they fit
+        used = 0
+        keep = len(turns)
+        while keep > 0:
+            cost = turn_tokens(turns[keep - 1]) + MESSAGE_OVERHEAD
+            if used + cost > room:
+                break
+            used += cost
+            keep -= 1
+        if keep > 0:
+            # Something falls out: leave room for the summary
+            room -= self.summary_tokens
+            while keep < len(turns) and used > room:
+                used -= turn_tokens(turns[keep]) + MESSAGE_OVERHEAD
+                keep += 1
+
+        self._extend_summary(conversation, first + keep)
+        lines = [line for line in conversation.summary_lines if line.turn < first + keep]
+        system_prompt = conversation.system_prompt
+        summary_used = 0
+        if lines:
+            summary = "\n".join([SUMMARY_HEADER] + [line.text for line in lines])
+            system_prompt = f"{system_prompt}\n\n{summary}" if system_prompt else summary
+            summary_used = sum(line.tokens for line in lines) + MESSAGE_OVERHEAD
+
+        history = [{"role": turn.role, "content": turn.content} for turn in turns[keep:]]
+        self.packed += 1
+        return PackedContext(
+            system_prompt, history, fixed + used + summary_used,
+            len(turns) - keep, len(lines)
+        )
+
+    def stats(self) -> dict:
+        return {
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "summary_tokens": self.summary_tokens,
+            "packed": self.packed,
+            "turns_summarized": self.turns_summarized
+        }
+
+    def _extend_summary(self, conversation, until: int):
+        """Summarize turns before absolute index `until` that are not summarized yet"""
+        start = max(conversation.summarized, conversation.dropped)
+        if until <= start:
+            return
+        summary = conversation.summary_lines
+        offset = conversation.dropped
+        # Newest first, stopping once the summary budget is full: older turns
+        # would only be dropped again (a 10k-turn backlog costs no more than
+        # a short one)
+        new_lines = []
+        total = 0
+        for index in range(until - 1, start - 1, -1):
+            turn = conversation.turns[index - offset]
+            text = summarize_turn(turn.role, turn.content)
+            line = SummaryLine(index, text, estimate_tokens(text))
+            total += line.tokens
+            if total > self.summary_tokens:
+                break
+            new_lines.append(line)
+        summary.extend(reversed(new_lines))
+        conversation.summarized = until
+        self.turns_summarized += until - start
+
+        # Oldest summary lines go once the summary is over its budget
+        total = sum(line.tokens for line in summary)
+        drop = 0
+        while total > self.summary_tokens and drop < len(summary):
+            total -= summary[drop].tokens
+            drop += 1
+        del summary[:drop]
+
+
+def turn_tokens(turn) -> int:
+    """Cached token count of a turn (estimated if the store did not set one)"""
+    return turn.tokens or estimate_tokens(turn.content)
@@ -0,0 +1,307 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import mmap
+import os
+import re
+import secrets
+import struct
+import time
+
+from conversations import Conversation, ConversationStore, Turn, with_token_counts
+
+# ============================================================================
+# APPEND-ONLY CONVERSATION LOG (CONVERSATION_STORE=log)
+# ============================================================================
+# Each conversation is three files under <directory>/<user key>/:
+#     <id>.log   turns as JSON records, appended and never rewritten in place
+#     <id>.idx   fixed-width index: entry i = (offset, length) of record i
+#     <id>.json  metadata (system prompt, model, timestamps, live range)
+# Both data files are read through mmap, so turn i is one struct read at
+# i * 16 in the index plus one slice of the log: "last N turns" or "page K"
+# costs the same at turn 10 and at turn 1,000,000, and only the requested
+# records are ever copied out of the page cache.
+#
+# Turns beyond max_turns are dropped by moving the start of the live range.
+# Once the dead prefix outweighs the live turns, the segment is compacted
+# (live records rewritten to new files, then renamed over the old ones).
+# Deleting a conversation deletes its files.
+# ============================================================================
+
+INDEX_ENTRY = struct.Struct("<QQ")      # record offset, record length
+
+# Conversation ids come from secrets.token_urlsafe; anything else could
+# escape the directory
+_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class LogSegment:
+    """One conversation's record log and mmap-ed offset index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._log_map: Optional[mmap.mmap] = None
+        self._index_map: Optional[mmap.mmap] = None
+        self._log_size = os.path.getsize(f"{path}.log")
+        index_size = os.path.getsize(f"{path}.idx")
+        # A crash mid-append can leave a partial index entry; drop it
+        if index_size % INDEX_ENTRY.size:
+            index_size -= index_size % INDEX_ENTRY.size
+            os.truncate(f"{path}.idx", index_size)
+        self.count = index_size // INDEX_ENTRY.size
+
+    @classmethod
+    def create(cls, path: str) -> "LogSegment":
+        for suffix in (".log", ".idx"):
+            open(f"{path}{suffix}", "wb").close()
+        return cls(path)
+
+    def append(self, turns: List[Turn]):
+        records = [json.dumps(turn._asdict(), separators=(",", ":")).encode("utf-8") + b"\n" for turn in turns]
+        entries = []
+        offset = self._log_size
+        for record in records:
+            entries.append(INDEX_ENTRY.pack(offset, len(record)))
+            offset += len(record)
+        # Records first, then their index entries: an entry never points
+        # at bytes that are not on disk yet
+        with open(f"{self.path}.log", "ab") as log:
+            log.write(b"".join(records))
+        with open(f"{self.path}.idx", "ab") as index:
+            index.write(b"".join(entries))
+        self._log_size = offset
+        self.count += len(records)
+        self._unmap()
+
+    def read(self, start: int, stop: int) -> List[Turn]:
+        """Records start..stop-1"""
+        if stop <= start:
+            return []
+        self._map()
+        index, log = self._index_map, self._log_map
+        turns = []
+        for i in range(start, stop):
+            offset, length = INDEX_ENTRY.unpack_from(index, i * INDEX_ENTRY.size)
+            turns.append(Turn(**json.loads(log[offset:offset + length])))
+        return turns
+
+    def rewrite(self, start: int):
+        """Compact: keep only records from `start` on"""
+        self._map()
+        begin = INDEX_ENTRY.unpack_from(self._index_map, start * INDEX_ENTRY.size)[0] if start < self.count else self._log_size
+        entries = []
+        for i in range(start, self.count):
+            offset, length = INDEX_ENTRY.unpack_from(self._index_map, i * INDEX_ENTRY.size)
+            entries.append(INDEX_ENTRY.pack(offset - begin, length))
+        with open(f"{self.path}.log.tmp", "wb") as log:
+            log.write(self._log_map[begin:self._log_size])
+        with open(f"{self.path}.idx.tmp", "wb") as index:
+            index.write(b"".join(entries))
+        self._unmap()
+        os.replace(f"{self.path}.log.tmp", f"{self.path}.log")
+        os.replace(f"{self.path}.idx.tmp", f"{self.path}.idx")
+        self._log_size -= begin
+        self.count = len(entries)
+
+    def close(self):
+        self._unmap()
+
+    def _map(self):
+        if self._index_map is None and self.count:
+            with open(f"{self.path}.idx", "rb") as index:
+                self._index_map = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+            with open(f"{self.path}.log", "rb") as log:
+                self._log_map = mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _unmap(self):
+        for mapped in (self._index_map, self._log_map):
+            if mapped is not None:
+                mapped.close()
+        self._index_map = self._log_map = None
+
+
+class LogTurns:
+    """Read-only list-like view of a conversation's live turns"""
+
+    def __init__(self, segment: LogSegment, meta: dict):
+        self._segment = segment
+        self._meta = meta
+
+    def __len__(self) -> int:
+        return self._segment.count - self._meta["first"]
+
+    def __getitem__(self, item):
+        first = self._meta["first"]
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                return self._segment.read(first + start, first + stop)[::step]
+            return self._segment.read(first + start, first + stop)
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("turn index out of range")
+        return self._segment.read(first + item, first + item + 1)[0]
+
+    def __iter__(self):
+        return iter(self[:])
+
+
+class LogConversationStore(ConversationStore):
+    """Conversations in append-only files; survives restarts"""
+
+    def __init__(self, directory: str, max_per_user: int = 20, max_turns: int = 200,
+                 max_open: int = 256):
+        self.directory = directory
+        self.max_per_user = max_per_user
+        self.max_turns = max_turns
+        self.max_open = max_open
+        os.makedirs(directory, exist_ok=True)
+        # (username, id) -> (Conversation, segment, meta) for recently used
+        # conversations; the rest stay on disk
+        self._open: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self.compactions = 0
+        self.turns_dropped = 0
+
+    def create(self, username: str, system_prompt: Optional[str] = None,
+               model: Optional[str] = None) -> Conversation:
+        conversation_id = secrets.token_urlsafe(12)
+        os.makedirs(self._user_dir(username), exist_ok=True)
+        path = self._path(username, conversation_id)
+        now = time.time()
+        meta = {
+            "id": conversation_id, "username": username, "system_prompt": system_prompt,
+            "model": model, "created_at": now, "updated_at": now,
+            "base": 0,      # absolute number of the first record in the files
+            "first": 0      # first live record (earlier ones await compaction)
+        }
+        segment = LogSegment.create(path)
+        self._write_meta(path, meta)
+        conversation = self._cache(username, meta, segment)
+
+        existing = self.list(username)
+        for old in existing[self.max_per_user:]:
+            self.delete(username, old.id)
+        return conversation
+
+    def get(self, username: str, conversation_id: str) -> Optional[Conversation]:
+        key = (username, conversation_id)
+        if key in self._open:
+            self._open.move_to_end(key)
+            return self._open[key][0]
+        if not _ID_PATTERN.match(conversation_id):
+            return None
+        path = self._path(username, conversation_id)
+        meta = self._read_meta(path)
+        if meta is None:
+            return None
+        return self._cache(username, meta, LogSegment(path))
+
+    def append(self, username: str, conversation_id: str, turns: List[Turn]) -> bool:
+        conversation = self.get(username, conversation_id)
+        if conversation is None:
+            return False
+        _, segment, meta = self._open[(username, conversation_id)]
+        segment.append(with_token_counts(turns))
+
+        live = segment.count - meta["first"]
+        if live > self.max_turns:
+            meta["first"] += live - self.max_turns
+            self.turns_dropped += live - self.max_turns
+        if meta["first"] >= max(64, segment.count - meta["first"]):
+            # The dead prefix outweighs the live turns: rewrite the segment
+            segment.rewrite(meta["first"])
+            meta["base"] += meta["first"]
+            meta["first"] = 0
+            self.compactions += 1
+        meta["updated_at"] = time.time()
+        conversation.dropped = meta["base"] + meta["first"]
+        conversation.updated_at = meta["updated_at"]
+        self._write_meta(segment.path, meta)
+        return True
+
+    def list(self, username: str) -> List[Conversation]:
+        directory = self._user_dir(username)
+        if not os.path.isdir(directory):
+            return []
+        metas = []
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                meta = self._read_meta(os.path.join(directory, name[:-5]))
+                if meta is not None:
+                    metas.append(meta)
+        metas.sort(key=lambda meta: meta["updated_at"], reverse=True)
+        return [self.get(username, meta["id"]) for meta in metas]
+
+    def delete(self, username: str, conversation_id: str) -> bool:
+        if not _ID_PATTERN.match(conversation_id):
+            return False
+        cached = self._open.pop((username, conversation_id), None)
+        if cached is not None:
+            cached[1].close()
+        path = self._path(username, conversation_id)
+        if not os.path.exists(f"{path}.json"):
+            return False
+        # Metadata first: a half-deleted conversation is simply gone
+        for suffix in (".json", ".log", ".idx"):
+            try:
+                os.remove(f"{path}{suffix}")
+            except FileNotFoundError:
+                pass
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "backend": "log",
+            "directory": self.directory,
+            "open": len(self._open),
+            "max_per_user": self.max_per_user,
+            "max_turns": self.max_turns,
+            "compactions": self.compactions,
+            "turns_dropped": self.turns_dropped
+        }
+
+    def close(self):
+        for _, segment, _ in self._open.values():
+            segment.close()
+        self._open.clear()
+
+    def _cache(self, username: str, meta: dict, segment: LogSegment) -> Conversation:
+        conversation = Conversation(meta["id"], username, meta["system_prompt"], meta["model"], meta["created_at"])
+        conversation.updated_at = meta["updated_at"]
+        conversation.turns = LogTurns(segment, meta)
+        conversation.dropped = meta["base"] + meta["first"]
+        self._open[(username, meta["id"])] = (conversation, segment, meta)
+        while len(self._open) > self.max_open:
+            _, (_, evicted, _) = self._open.popitem(last=False)
+            evicted.close()
+        return conversation
+
+    def _user_dir(self, username: str) -> str:
+        # Usernames can contain anything; directory names cannot
+        return os.path.join(self.directory, hashlib.sha256(username.encode("utf-8")).hexdigest()[:16])
+
+    def _path(self, username: str, conversation_id: str) -> str:
+        return os.path.join(self._user_dir(username), conversation_id)
+
+    @staticmethod
+    def _read_meta(path: str) -> Optional[Dict]:
+        try:
+            with open(f"{path}.json", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_meta(path: str, meta: dict):
+        with open(f"{path}.json.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{path}.json.tmp", f"{path}.json")
+
+
+def default_log_directory() -> str:
+    return os.getenv(
+        "CONVERSATION_LOG_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "conversation_logs")
+    )
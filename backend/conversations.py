@@ -0,0 +1,194 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+import os
+import secrets
+import time
+
+from context_packer import SummaryLine, estimate_tokens
+
+# ============================================================================
+# CONVERSATIONS (server-side chat history)
+# ============================================================================
+# Clients create a conversation once and then send only the new message;
+# the backend keeps the turns and builds the full `messages` list for the
+# model. Request size stays the same however long the chat gets.
+#
+# ConversationStore is the persistence interface; CONVERSATION_STORE picks
+# the implementation: "memory" (below) or "log" (conversation_log.py, kept
+# on disk). The in-memory store bounds what each user can hold:
+#   - at most max_per_user conversations (least recently used goes first)
+#   - at most max_turns turns per conversation (oldest turns dropped)
+#   - at most max_users users (least recently active user's chats go)
+# ============================================================================
+
+
+class Turn(NamedTuple):
+    role: str           # "user" or "assistant"
+    content: str
+    created_at: float
+    tokens: int = 0     # estimated token count, filled in by the store
+
+
+class Conversation:
+    __slots__ = ("id", "username", "system_prompt", "model", "created_at", "updated_at", "turns",
+                 "dropped", "summary_lines", "summarized")
+
+    def __init__(self, conversation_id: str, username: str, system_prompt: Optional[str] = None,
+                 model: Optional[str] = None, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self.id = conversation_id
+        self.username = username
+        self.system_prompt = system_prompt
+        self.model = model
+        self.created_at = now
+        self.updated_at = now
+        self.turns: List[Turn] = []
+        # Turns dropped from the front of `turns` (turns[0] is turn number `dropped`)
+        self.dropped = 0
+        # Rolling summary of turns that no longer fit the prompt (see context_packer)
+        self.summary_lines: List[SummaryLine] = []
+        self.summarized = 0
+
+    def messages(self) -> List[Dict[str, str]]:
+        """Turns as chat messages, oldest first (without the system prompt)"""
+        return [{"role": turn.role, "content": turn.content} for turn in self.turns]
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "model": self.model,
+            "turns": len(self.turns),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+
+
+class ConversationStore(ABC):
+    """Persistence interface for conversations; every call is scoped to one user"""
+
+    @abstractmethod
+    def create(self, username: str, system_prompt: Optional[str] = None,
+               model: Optional[str] = None) -> Conversation:
+        ...
+
+    @abstractmethod
+    def get(self, username: str, conversation_id: str) -> Optional[Conversation]:
+        """The conversation, or None if it does not exist or belongs to someone else"""
+        ...
+
+    @abstractmethod
+    def append(self, username: str, conversation_id: str, turns: List[Turn]) -> bool:
+        """Add turns to the end of a conversation; False if it does not exist"""
+        ...
+
+    @abstractmethod
+    def list(self, username: str) -> List[Conversation]:
+        """The user's conversations, most recently used first"""
+        ...
+
+    @abstractmethod
+    def delete(self, username: str, conversation_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Conversations in process memory, bounded per user and overall"""
+
+    def __init__(self, max_per_user: int = 20, max_turns: int = 200, max_users: int = 10_000):
+        self.max_per_user = max_per_user
+        self.max_turns = max_turns
+        self.max_users = max_users
+        # username -> (conversation id -> Conversation), both in LRU order
+        self._users: "OrderedDict[str, OrderedDict[str, Conversation]]" = OrderedDict()
+        self.evicted = 0
+        self.turns_dropped = 0
+
+    def create(self, username: str, system_prompt: Optional[str] = None,
+               model: Optional[str] = None) -> Conversation:
+        conversation = Conversation(secrets.token_urlsafe(12), username, system_prompt, model)
+        conversations = self._user(username, create=True)
+        conversations[conversation.id] = conversation
+        while len(conversations) > self.max_per_user:
+            conversations.popitem(last=False)
+            self.evicted += 1
+        while len(self._users) > self.max_users:
+            _, dropped = self._users.popitem(last=False)
+            self.evicted += len(dropped)
+        return conversation
+
+    def get(self, username: str, conversation_id: str) -> Optional[Conversation]:
+        conversations = self._user(username)
+        if conversations is None or conversation_id not in conversations:
+            return None
+        conversations.move_to_end(conversation_id)
+        return conversations[conversation_id]
+
+    def append(self, username: str, conversation_id: str, turns: List[Turn]) -> bool:
+        conversation = self.get(username, conversation_id)
+        if conversation is None:
+            return False
+        conversation.turns.extend(with_token_counts(turns))
+        excess = len(conversation.turns) - self.max_turns
+        if excess > 0:
+            del conversation.turns[:excess]
+            conversation.dropped += excess
+            self.turns_dropped += excess
+        conversation.updated_at = time.time()
+        return True
+
+    def list(self, username: str) -> List[Conversation]:
+        conversations = self._user(username)
+        return list(reversed(conversations.values())) if conversations else []
+
+    def delete(self, username: str, conversation_id: str) -> bool:
+        conversations = self._user(username)
+        return conversations is not None and conversations.pop(conversation_id, None) is not None
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "users": len(self._users),
+            "conversations": sum(len(c) for c in self._users.values()),
+            "max_per_user": self.max_per_user,
+            "max_turns": self.max_turns,
+            "evicted": self.evicted,
+            "turns_dropped": self.turns_dropped
+        }
+
+    def _user(self, username: str, create: bool = False) -> Optional["OrderedDict[str, Conversation]"]:
+        conversations = self._users.get(username)
+        if conversations is None:
+            if not create:
+                return None
+            conversations = self._users[username] = OrderedDict()
+        self._users.move_to_end(username)
+        return conversations
+
+
+def with_token_counts(turns: List[Turn]) -> List[Turn]:
+    """Turns with their token count estimated once, when stored"""
+    return [turn if turn.tokens else turn._replace(tokens=estimate_tokens(turn.content)) for turn in turns]
+
+
+def create_conversation_store() -> ConversationStore:
+    """Store selected by CONVERSATION_STORE (default "memory")"""
+    backend = os.getenv("CONVERSATION_STORE", "memory").lower()
+    if backend == "memory":
+        return InMemoryConversationStore(
+            max_per_user=int(os.getenv("CONVERSATION_MAX_PER_USER", "20")),
+            max_turns=int(os.getenv("CONVERSATION_MAX_TURNS", "200")),
+            max_users=int(os.getenv("CONVERSATION_MAX_USERS", "10000"))
+        )
+    if backend == "log":
+        from conversation_log import LogConversationStore, default_log_directory
+        return LogConversationStore(
+            default_log_directory(),
+            max_per_user=int(os.getenv("CONVERSATION_MAX_PER_USER", "20")),
+            max_turns=int(os.getenv("CONVERSATION_MAX_TURNS", "200"))
+        )
+    raise ValueError(f"Unknown CONVERSATION_STORE: {backend}")
@@ -0,0 +1,240 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+import heapq
+import random
+import re
+import sys
+import time
+import zlib
+
+# ============================================================================
+# NEAR-DUPLICATE (FUZZY) RESPONSE CACHE
+# ============================================================================
+# Catches prompts the exact-match cache misses because they differ only in
+# casing, punctuation or a word or two ("what is python?" / "What's Python").
+#   1. The prompt is normalized and split into character shingles
+#   2. A MinHash signature estimates Jaccard similarity between shingle sets
+#      (one-permutation hashing: each shingle is hashed once and binned,
+#      empty bins are filled from their neighbour - O(shingles), not
+#      O(shingles x permutations))
+#   3. LSH banding buckets signatures so a lookup only looks at candidates
+#      that share a band - cost does not grow with the number of entries
+#   4. The best candidates are verified with exact Jaccard >= threshold
+# Entries live in a partition (model + parameters + earlier messages), so a
+# fuzzy hit is only ever served for the same model and context.
+# ============================================================================
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_EMPTY = 1 << 64
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop apostrophes and punctuation, collapse whitespace"""
+    text = text.lower().replace("'", "").replace("’", "")
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def shingles(text: str, k: int = 3) -> Set[str]:
+    """Character k-grams of normalized text"""
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class _Entry:
+    __slots__ = ("partition", "text", "answer", "expires_at", "bucket_keys", "size")
+
+    def __init__(self, partition, text, answer, expires_at, bucket_keys, size):
+        self.partition = partition
+        self.text = text
+        self.answer = answer
+        self.expires_at = expires_at
+        self.bucket_keys = bucket_keys
+        self.size = size
+
+
+class FuzzyCache:
+    """MinHash/LSH index of answered prompts with LRU, TTL and memory cap"""
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 16,
+                 shingle_size: int = 3, max_entries: int = 100_000,
+                 max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 3600,
+                 max_candidates: int = 8, max_bucket_size: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_candidates = max_candidates
+        self.max_bucket_size = max_bucket_size
+
+        self._seed = random.Random(seed).getrandbits(32)
+
+        # entry id -> entry, in LRU order
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        # LSH bucket -> entry ids sharing that band signature (insertion-ordered
+        # dict used as a set; very popular buckets keep only the newest ids so
+        # a lookup never scans more than bands x max_bucket_size candidates)
+        self._buckets: Dict[int, Dict[int, None]] = {}
+        self._next_id = 0
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ------------------------------------------------------------------
+    # MinHash / LSH
+    # ------------------------------------------------------------------
+
+    def signature(self, shingle_set: Set[str]) -> List[int]:
+        """One-permutation MinHash signature with rotation densification"""
+        num_perm = self.num_perm
+        bins = [_EMPTY] * num_perm
+        for s in shingle_set:
+            h = (zlib.crc32(s.encode("utf-8"), self._seed) * _GOLDEN) & _MASK64
+            index, value = h % num_perm, h // num_perm
+            if value < bins[index]:
+                bins[index] = value
+
+        # Empty bins borrow the next non-empty bin's value (plus distance) so
+        # similar sets still agree bin by bin
+        if _EMPTY not in bins:
+            return bins
+        signature = list(bins)
+        for i in range(num_perm):
+            if bins[i] == _EMPTY:
+                distance = 1
+                while bins[(i + distance) % num_perm] == _EMPTY:
+                    distance += 1
+                signature[i] = bins[(i + distance) % num_perm] + distance * _EMPTY
+        return signature
+
+    def _bucket_keys(self, partition: str, signature: List[int]) -> Tuple[int, ...]:
+        rows = self.rows
+        return tuple(
+            hash((partition, band, tuple(signature[band * rows:(band + 1) * rows])))
+            for band in range(self.bands)
+        )
+
+    # ------------------------------------------------------------------
+    # Cache API
+    # ------------------------------------------------------------------
+
+    def get(self, partition: str, text: str) -> Optional[str]:
+        """Return the answer of the most similar stored prompt, or None"""
+        normalized = normalize_text(text)
+        query_shingles = shingles(normalized, self.shingle_size)
+        keys = self._bucket_keys(partition, self.signature(query_shingles))
+
+        # Count shared bands per candidate; more shared bands = more similar
+        votes: Dict[int, int] = {}
+        for key in keys:
+            for entry_id in self._buckets.get(key, ()):
+                votes[entry_id] = votes.get(entry_id, 0) + 1
+
+        best_id, best_score = None, 0.0
+        now = time.monotonic()
+        ranked = heapq.nlargest(self.max_candidates, votes, key=votes.get)
+        for entry_id in ranked:
+            entry = self._entries[entry_id]
+            if entry.expires_at <= now:
+                self._remove(entry_id)
+                self.expirations += 1
+                continue
+            if entry.partition != partition:
+                continue
+            score = jaccard(query_shingles, shingles(entry.text, self.shingle_size))
+            if score > best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None or best_score < self.threshold:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(best_id)
+        self.hits += 1
+        return self._entries[best_id].answer
+
+    def set(self, partition: str, text: str, answer: str):
+        """Index a prompt and its answer"""
+        if self.max_entries <= 0:
+            return
+
+        normalized = normalize_text(text)
+        keys = self._bucket_keys(
+            partition, self.signature(shingles(normalized, self.shingle_size))
+        )
+        size = self._entry_size(normalized, answer)
+        if size > self.max_bytes:
+            return
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(
+            partition, normalized, answer,
+            time.monotonic() + self.ttl_seconds, keys, size
+        )
+        for key in keys:
+            bucket = self._buckets.setdefault(key, {})
+            bucket[entry_id] = None
+            if len(bucket) > self.max_bucket_size:
+                del bucket[next(iter(bucket))]
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        """Drop all entries (stats are kept)"""
+        self._entries.clear()
+        self._buckets.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "memory_bytes": self._bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        for key in entry.bucket_keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.pop(entry_id, None)
+                if not bucket:
+                    del self._buckets[key]
+        self._bytes -= entry.size
+
+    def _entry_size(self, text: str, answer: str) -> int:
+        # Strings + entry object + one int key and set slot per band
+        return sys.getsizeof(text) + sys.getsizeof(answer) + 200 + self.bands * 100
@@ -0,0 +1,67 @@
+from typing import List
+import bisect
+
+# ============================================================================
+# LATENCY HISTOGRAM
+# ============================================================================
+# Fixed log-spaced buckets (1ms .. ~10min, ~5% apart) so recording is O(1)
+# memory and percentiles are O(buckets), no matter how many samples.
+# Two rotating windows (current + previous) make percentiles follow recent
+# traffic instead of the whole process lifetime.
+# ============================================================================
+
+_MIN_SECONDS = 0.001
+_GROWTH = 1.05
+_BOUNDS: List[float] = []
+_bound = _MIN_SECONDS
+while _bound < 600:
+    _BOUNDS.append(_bound)
+    _bound *= _GROWTH
+_BOUNDS.append(float("inf"))
+
+
+class LatencyHistogram:
+    """Bounded-memory latency histogram with percentile queries"""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._current = [0] * len(_BOUNDS)
+        self._previous = [0] * len(_BOUNDS)
+        self._current_count = 0
+        self._previous_count = 0
+        self.total = 0
+
+    def record(self, seconds: float):
+        """Add one sample (in seconds)"""
+        self._current[bisect.bisect_left(_BOUNDS, seconds)] += 1
+        self._current_count += 1
+        self.total += 1
+        if self._current_count >= self.window:
+            self._previous, self._current = self._current, [0] * len(_BOUNDS)
+            self._previous_count, self._current_count = self._current_count, 0
+
+    @property
+    def count(self) -> int:
+        """Samples in the recent window"""
+        return self._current_count + self._previous_count
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound (seconds) of the bucket holding the pct-th percentile"""
+        count = self.count
+        if count == 0:
+            return 0.0
+        rank = max(1, round(count * pct / 100))
+        seen = 0
+        for i, bound in enumerate(_BOUNDS):
+            seen += self._current[i] + self._previous[i]
+            if seen >= rank:
+                return bound if bound != float("inf") else _BOUNDS[-2]
+        return _BOUNDS[-2]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.total,
+            "p50_ms": round(self.percentile(50) * 1000, 1),
+            "p95_ms": round(self.percentile(95) * 1000, 1),
+            "p99_ms": round(self.percentile(99) * 1000, 1)
+        }
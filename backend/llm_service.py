@@ -1,12 +1,90 @@
-from huggingface_hub import InferenceClient
-from typing import List
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
+from response_cache import ResponseCache, make_cache_key
+from fuzzy_cache import FuzzyCache
+from single_flight import SingleFlight
+from latency import LatencyHistogram
+from concurrency import AdaptiveLimiter
+from context_packer import ContextPacker
+from providers import ChatProvider, OpenAICompatibleProvider, create_provider, parse_local_models
+from resilience import (
+    CircuitBreaker,
+    RetryPolicy,
+    UpstreamBadRequest,
+    UpstreamError,
+    call_with_resilience,
+    classify_error
+)
 
 load_dotenv()
 
+class Completion(NamedTuple):
+    """A finished answer and the model that produced it"""
+    text: str
+    model: str
+    cached: bool = False
+
+def latency_signal(elapsed: float, chars: int) -> float:
+    """Seconds per output token (~4 chars), so long answers don't look like overload"""
+    return elapsed / max(1, chars // 4)
+
+class ModelState:
+    """Per-model upstream client, concurrency limit and stats"""
+    
+    def __init__(self, name: str, model_id: str, client: ChatProvider, max_concurrency: int):
+        self.name = name
+        self.model_id = model_id
+        # Whatever answers chat_completion for this model (see providers.py)
+        self.client = client
+        # The limit adapts between LLM_MIN_CONCURRENCY and max_concurrency
+        self.limiter = AdaptiveLimiter(
+            name,
+            initial_limit=int(os.getenv("LLM_INITIAL_CONCURRENCY", "8")),
+            min_limit=int(os.getenv("LLM_MIN_CONCURRENCY", "1")),
+            max_limit=max_concurrency,
+            max_queue=int(os.getenv("LLM_MAX_QUEUE", "256")),
+            queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10")),
+            adaptive=os.getenv("LLM_ADAPTIVE_CONCURRENCY", "true").lower() == "true"
+        )
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        # Successful full-response latency and streaming time-to-first-token
+        self.latency = LatencyHistogram()
+        self.ttft = LatencyHistogram()
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+        )
+    
+    def record(self, latency: float, outcome: str):
+        """Record one finished upstream call ("ok", "error" or "cancelled")"""
+        self.requests += 1
+        if outcome == "ok":
+            self.latency.record(latency)
+        elif outcome == "cancelled":
+            self.cancelled += 1
+        else:
+            self.errors += 1
+    
+    def stats(self) -> dict:
+        return {
+            "model_id": self.model_id,
+            "concurrency": self.limiter.snapshot(),
+            "requests": self.requests,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "latency": self.latency.snapshot(),
+            "time_to_first_token": self.ttft.snapshot(),
+            "circuit": self.breaker.snapshot()
+        }
+
 class LLMService:
-    """Service to handle multiple HuggingFace models"""
+    """Service to handle multiple models behind their inference providers"""
     
     #  THESE MODELS ACTUALLY WORK (Tested and Free!)
     MODELS = {
@@ -15,70 +93,492 @@ class LLMService:
         "llama": "meta-llama/Llama-3.2-3B-Instruct"
     }
     
+    # Context window (prompt + answer tokens) of each model
+    CONTEXT_WINDOWS = {
+        "mistral": 32768,
+        "zephyr": 32768,
+        "llama": 131072
+    }
+    
+    DEFAULT_MODEL = "mistral"
+    TEMPERATURE = 0.7
+    
+    # Model that receives the hedge request when the primary is slow
+    HEDGE_FALLBACKS = {
+        "mistral": "zephyr",
+        "zephyr": "mistral",
+        "llama": "mistral"
+    }
+    
     def __init__(self):
-        self.token = os.getenv("HUGGINGFACE_API_TOKEN")
-        if not self.token:
-            raise ValueError(" HUGGINGFACE_API_TOKEN not found in .env file!")
-        
-        self.client = InferenceClient(token=self.token)
-        self.current_model = "mistral"
-        print(f" Service initialized with model: {self.current_model}")
-    
-    def switch_model(self, model_name: str):
-        """Switch between different models"""
-        if model_name in self.MODELS:
-            self.current_model = model_name
-            print(f" Switched to {model_name}")
-            return f"Switched to {model_name}"
-        print(f" Model {model_name} not found")
-        return "Model not found"
-    
-    def generate_response(self, prompt: str, max_tokens: int = 512) -> str:
-        """Generate response using current model"""
+        # Upstream calls are awaited, so concurrency is bounded only by each
+        # model's adaptive limit (at most LLM_MAX_CONCURRENCY). Each model has
+        # its own limit and stats, so mixed traffic runs side by side with no
+        # shared selection. LLM_PROVIDER=stub answers locally (no token needed).
+        self.timeout = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+        self.provider = create_provider(os.getenv("LLM_PROVIDER", "huggingface"), self.timeout)
+        self.providers: Dict[str, ChatProvider] = {self.provider.name: self.provider}
+        targets = {name: (model_id, self.provider) for name, model_id in self.MODELS.items()}
+        
+        # Self-hosted models (OpenAI-compatible servers) share one connection pool
+        local_models = parse_local_models(os.getenv("LOCAL_MODELS", ""))
+        if local_models:
+            local = OpenAICompatibleProvider.from_env(self.timeout)
+            for name, (model_id, base_url) in local_models.items():
+                local.register(model_id, base_url)
+                targets[name] = (model_id, local)
+            self.providers[local.name] = local
+        
+        # LLM_RECORD_CASSETTE: record every upstream call for offline replay
+        record_path = os.getenv("LLM_RECORD_CASSETTE")
+        if record_path:
+            from cassettes import CassetteRecorder, RecordingProvider
+            recorder = CassetteRecorder(record_path)
+            recording = {id(provider): RecordingProvider(provider, recorder) for provider in self.providers.values()}
+            self.providers = {name: recording[id(provider)] for name, provider in self.providers.items()}
+            targets = {name: (model_id, recording[id(provider)]) for name, (model_id, provider) in targets.items()}
+            self.provider = recording[id(self.provider)]
+        
+        self.models = {
+            name: ModelState(name, model_id, provider, self.max_concurrency)
+            for name, (model_id, provider) in targets.items()
+        }
+        
+        self.cache = ResponseCache(
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+            max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+        )
+        # Retryable upstream failures are retried with jittered backoff
+        self.retry_policy = RetryPolicy(
+            attempts=int(os.getenv("LLM_RETRY_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "0.25")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "4"))
+        )
+        
+        # Conversation history is packed into a per-model prompt budget; long
+        # prompts cost latency and money well before the context window fills
+        self.context = ContextPacker(
+            self.CONTEXT_WINDOWS,
+            max_prompt_tokens=int(os.getenv("CONTEXT_MAX_PROMPT_TOKENS", "4096")),
+            summary_tokens=int(os.getenv("CONTEXT_SUMMARY_TOKENS", "256"))
+        )
+        
+        # Identical requests already in flight share one upstream call
+        self.inflight = SingleFlight()
+        
+        # Hedging: if the primary model is slower than its own recent
+        # HEDGE_PERCENTILE latency, race a second model and keep the winner
+        self.hedging = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+        self.hedge_percentile = float(os.getenv("HEDGE_PERCENTILE", "95"))
+        self.hedge_min_samples = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+        self.hedge_default_delay = float(os.getenv("HEDGE_DEFAULT_DELAY_SECONDS", "5"))
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        
+        # Optional near-duplicate tier, consulted after an exact-match miss
+        self.fuzzy_cache = None
+        if os.getenv("FUZZY_CACHE_ENABLED", "false").lower() == "true":
+            self.fuzzy_cache = FuzzyCache(
+                threshold=float(os.getenv("FUZZY_CACHE_THRESHOLD", "0.85")),
+                max_entries=int(os.getenv("FUZZY_CACHE_MAX_ENTRIES", "100000")),
+                max_bytes=int(os.getenv("FUZZY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+                ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+            )
+        print(f" Service initialized with models: {', '.join(self.models)} ({', '.join(self.providers)})")
+    
+    def resolve_model(self, model_name: Optional[str] = None) -> str:
+        """Return a valid model name, falling back to the default model"""
+        if model_name is None:
+            return self.DEFAULT_MODEL
+        if model_name not in self.models:
+            raise ValueError(f"Model {model_name} not found")
+        return model_name
+    
+    def _build_messages(self, prompt: str, system_prompt: Optional[str] = None,
+                        history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        """Build the chat messages sent upstream: system, earlier turns, new message"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def _cache_key(self, model: str, messages: List[Dict[str, str]], max_tokens: int) -> str:
+        return make_cache_key(self.models[model].model_id, messages, max_tokens, self.TEMPERATURE)
+    
+    def _cache_lookup(self, model: str, messages: List[Dict[str, str]], max_tokens: int) -> Optional[str]:
+        """Exact-match tier first, then the optional fuzzy tier"""
+        cached = self.cache.get(self._cache_key(model, messages, max_tokens))
+        if cached is not None:
+            print(f" Cache hit for {model}")
+            return cached
+        
+        if self.fuzzy_cache is not None:
+            # Everything but the final user turn must match exactly
+            partition = self._cache_key(model, messages[:-1], max_tokens)
+            cached = self.fuzzy_cache.get(partition, messages[-1]["content"])
+            if cached is not None:
+                print(f" Fuzzy cache hit for {model}")
+                # Promote so the next identical prompt is an exact hit
+                self.cache.set(self._cache_key(model, messages, max_tokens), cached)
+                return cached
+        return None
+    
+    def _cache_store(self, model: str, messages: List[Dict[str, str]], max_tokens: int, answer: str):
+        self.cache.set(self._cache_key(model, messages, max_tokens), answer)
+        if self.fuzzy_cache is not None:
+            partition = self._cache_key(model, messages[:-1], max_tokens)
+            self.fuzzy_cache.set(partition, messages[-1]["content"], answer)
+    
+    def cache_stats(self) -> dict:
+        """Statistics for every cache tier"""
+        stats = self.cache.stats()
+        if self.fuzzy_cache is not None:
+            stats["fuzzy"] = self.fuzzy_cache.stats()
+        return stats
+    
+    def clear_cache(self):
+        """Drop all cached responses in every tier"""
+        self.cache.clear()
+        if self.fuzzy_cache is not None:
+            self.fuzzy_cache.clear()
+    
+    def hedge_delay(self, model: str, first_token: bool = False) -> float:
+        """How long to wait for the primary before firing a hedge request"""
+        state = self.models[model]
+        histogram = state.ttft if first_token else state.latency
+        if histogram.count < self.hedge_min_samples:
+            return self.hedge_default_delay
+        return max(0.05, histogram.percentile(self.hedge_percentile))
+    
+    def _hedge_target(self, model: str) -> Optional[str]:
+        if not self.hedging:
+            return None
+        fallback = self.HEDGE_FALLBACKS.get(model)
+        return fallback if fallback in self.models and fallback != model else None
+    
+    async def _complete(self, model: str, messages: List[Dict[str, str]], max_tokens: int) -> str:
+        """Upstream chat completion with retries; the answer is cached on success"""
+        state = self.models[model]
+        
+        async def attempt() -> str:
+            await state.limiter.acquire()
+            start = time.perf_counter()
+            outcome = "error"
+            answer = ""
+            overloaded = False
+            try:
+                #  FIX: Use chat_completion instead of text_generation
+                response = await state.client.chat_completion(
+                    messages=messages,
+                    model=state.model_id,
+                    max_tokens=max_tokens,
+                    temperature=self.TEMPERATURE
+                )
+                
+                # Extract the message content from the response
+                answer = response.choices[0].message.content.strip()
+                outcome = "ok"
+                return answer
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            except Exception as e:
+                overloaded = classify_error(model, e).retryable
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                state.record(elapsed, outcome)
+                state.limiter.release(
+                    latency_signal(elapsed, len(answer)) if outcome == "ok" else None,
+                    dropped=overloaded
+                )
+        
+        answer = await call_with_resilience(attempt, model, state.breaker, self.retry_policy)
+        
+        # Only successful answers are cached
+        self._cache_store(model, messages, max_tokens, answer)
+        return answer
+    
+    async def _stream(self, model: str, messages: List[Dict[str, str]], max_tokens: int) -> AsyncIterator[str]:
+        """Upstream streaming completion; the full answer is cached at the end"""
+        state = self.models[model]
+        parts = []
+        await state.limiter.acquire()
+        start = time.perf_counter()
+        outcome = "error"
+        overloaded = False
         try:
-            print(f" Sending request to {self.current_model}...")
+            # Opening the stream is retried; a stream that fails part-way is not
+            stream = await call_with_resilience(
+                lambda: state.client.chat_completion(
+                    messages=messages,
+                    model=state.model_id,
+                    max_tokens=max_tokens,
+                    temperature=self.TEMPERATURE,
+                    stream=True
+                ),
+                model, state.breaker, self.retry_policy
+            )
             
-            #  FIX: Use chat_completion instead of text_generation
-            response = self.client.chat_completion(
-                messages=[{"role": "user", "content": prompt}],
-                model=self.MODELS[self.current_model],
-                max_tokens=max_tokens,
-                temperature=0.7
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    if not parts:
+                        state.ttft.record(time.perf_counter() - start)
+                    parts.append(token)
+                    yield token
+            outcome = "ok"
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        except UpstreamError as e:
+            overloaded = e.retryable
+            raise
+        except Exception as e:
+            error = classify_error(model, e)
+            if error.retryable:
+                state.breaker.record_failure()
+            overloaded = error.retryable
+            raise error from e
+        finally:
+            elapsed = time.perf_counter() - start
+            state.record(elapsed, outcome)
+            state.limiter.release(
+                latency_signal(elapsed, sum(map(len, parts))) if outcome == "ok" else None,
+                dropped=overloaded
             )
+        
+        # Cache the complete answer so later identical prompts skip upstream
+        answer = "".join(parts).strip()
+        if answer:
+            self._cache_store(model, messages, max_tokens, answer)
+    
+    async def _complete_hedged(self, model: str, messages: List[Dict[str, str]], max_tokens: int) -> Completion:
+        """Complete on the primary model, racing a hedge if it is too slow"""
+        fallback = self._hedge_target(model)
+        if fallback is None:
+            return Completion(await self._complete(model, messages, max_tokens), model)
+        
+        tasks = {asyncio.ensure_future(self._complete(model, messages, max_tokens)): model}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay(model))
+            failed = next(iter(done)).exception() if done else None
+            # A rejected request would be rejected by the fallback too
+            if isinstance(failed, UpstreamBadRequest):
+                raise failed
+            # Hedge when the primary is slow, or fall back when it already failed
+            if not done or failed is not None:
+                print(f" {model} is {'slow' if not done else 'failing'}, hedging with {fallback}")
+                self.hedges_fired += 1
+                tasks[asyncio.ensure_future(self._complete(fallback, messages, max_tokens))] = fallback
             
-            # Extract the message content from the response
-            answer = response.choices[0].message.content
+            # First successful answer wins; fail only if every attempt failed
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = tasks[task]
+                        if winner != model:
+                            self.hedges_won += 1
+                        return Completion(task.result(), winner)
+                    if tasks[task] == model and isinstance(task.exception(), UpstreamBadRequest):
+                        raise task.exception()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # Cancel the losing request
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def _stream_hedged(self, model: str, messages: List[Dict[str, str]],
+                             max_tokens: int) -> AsyncIterator[Tuple[str, str]]:
+        """Stream from the primary model, racing a hedge for the first token"""
+        fallback = self._hedge_target(model)
+        if fallback is None:
+            async for token in self._stream(model, messages, max_tokens):
+                yield model, token
+            return
+        
+        primary = self._stream(model, messages, max_tokens)
+        streams = {asyncio.ensure_future(primary.__anext__()): (model, primary)}
+        winner = None
+        try:
+            done, _ = await asyncio.wait(streams, timeout=self.hedge_delay(model, first_token=True))
+            failed = next(iter(done)).exception() if done else None
+            if isinstance(failed, UpstreamBadRequest):
+                raise failed
+            if not done or not isinstance(failed, (type(None), StopAsyncIteration)):
+                print(f" {model} first token is {'slow' if not done else 'failing'}, hedging with {fallback}")
+                self.hedges_fired += 1
+                hedge = self._stream(fallback, messages, max_tokens)
+                streams[asyncio.ensure_future(hedge.__anext__())] = (fallback, hedge)
             
-            print(f" Got response from {self.current_model}")
-            return answer.strip()
+            # Whichever stream produces a first token (or finishes) first wins
+            pending = set(streams)
+            error = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or isinstance(task.exception(), StopAsyncIteration):
+                        winner = task
+                        break
+                    if streams[task][0] == model and isinstance(task.exception(), UpstreamBadRequest):
+                        raise task.exception()
+                    error = error or task.exception()
+            if winner is None:
+                raise error
+        finally:
+            for task, (_, stream) in streams.items():
+                if task is not winner:
+                    if not task.done():
+                        task.cancel()
+                    else:
+                        await stream.aclose()
+        
+        winner_model, stream = streams[winner]
+        if winner_model != model:
+            self.hedges_won += 1
+        if isinstance(winner.exception(), StopAsyncIteration):
+            return
+        yield winner_model, winner.result()
+        async for token in stream:
+            yield winner_model, token
+    
+    async def generate(self, prompt: str, max_tokens: int = 512,
+                       system_prompt: Optional[str] = None,
+                       use_cache: bool = True,
+                       model: Optional[str] = None,
+                       history: Optional[List[Dict[str, str]]] = None) -> Completion:
+        """
+        Generate a response and report which model produced it
+        `history` holds earlier turns of the conversation, oldest first
+        Raises UpstreamError (with an HTTP status) if no model could answer
+        """
+        model = self.resolve_model(model)
+        messages = self._build_messages(prompt, system_prompt, history)
+        
+        if use_cache:
+            cached = self._cache_lookup(model, messages, max_tokens)
+            if cached is not None:
+                return Completion(cached, model, cached=True)
+        
+        try:
+            print(f" Sending request to {model}...")
             
-        except Exception as e:
-            error_msg = f"Error with {self.current_model}: {str(e)}"
-            print(f" {error_msg}")
-            return error_msg
+            completion = await self.inflight.do(
+                self._cache_key(model, messages, max_tokens),
+                lambda: self._complete_hedged(model, messages, max_tokens)
+            )
+            
+            print(f" Got response from {completion.model}")
+            return completion
+            
+        except UpstreamError as e:
+            print(f" Error with {model}: {e}")
+            raise
+    
+    async def stream(self, prompt: str, max_tokens: int = 512,
+                     system_prompt: Optional[str] = None,
+                     use_cache: bool = True,
+                     model: Optional[str] = None,
+                     history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[Tuple[str, str]]:
+        """Stream (model, token) pairs as they are generated"""
+        model = self.resolve_model(model)
+        messages = self._build_messages(prompt, system_prompt, history)
+        
+        if use_cache:
+            cached = self._cache_lookup(model, messages, max_tokens)
+            if cached is not None:
+                yield model, cached
+                return
+        
+        try:
+            print(f" Streaming request to {model}...")
+            
+            tokens = self.inflight.stream(
+                self._cache_key(model, messages, max_tokens),
+                lambda: self._stream_hedged(model, messages, max_tokens)
+            )
+            async for answered_by, token in tokens:
+                yield answered_by, token
+            
+            print(f" Finished streaming from {model}")
+            
+        except UpstreamError as e:
+            print(f" Error with {model}: {e}")
+            raise
+    
+    async def generate_response(self, prompt: str, max_tokens: int = 512,
+                                system_prompt: Optional[str] = None,
+                                use_cache: bool = True,
+                                model: Optional[str] = None) -> str:
+        """Generate response using the requested (or default) model"""
+        completion = await self.generate(prompt, max_tokens, system_prompt, use_cache, model)
+        return completion.text
+    
+    async def stream_response(self, prompt: str, max_tokens: int = 512,
+                              system_prompt: Optional[str] = None,
+                              use_cache: bool = True,
+                              model: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream response tokens from the requested (or default) model"""
+        async for _, token in self.stream(prompt, max_tokens, system_prompt, use_cache, model):
+            yield token
+    
+    def health(self) -> dict:
+        """Circuit breaker state of every model"""
+        return {name: state.breaker.snapshot() for name, state in self.models.items()}
+    
+    def stats(self) -> dict:
+        """Per-model, provider, hedging and request coalescing counters"""
+        return {
+            "models": {name: state.stats() for name, state in self.models.items()},
+            "providers": {name: provider.stats() for name, provider in self.providers.items()},
+            "context": self.context.stats(),
+            "hedging": {
+                "enabled": self.hedging,
+                "fired": self.hedges_fired,
+                "won": self.hedges_won,
+                "delays_ms": {
+                    name: round(self.hedge_delay(name) * 1000, 1) for name in self.models
+                }
+            },
+            "coalescing": self.inflight.stats()
+        }
     
     def get_available_models(self) -> List[str]:
         """Return list of available models"""
-        return list(self.MODELS.keys())
+        return list(self.models.keys())
     
-    def get_current_model(self) -> str:
-        """Get currently active model"""
-        return self.current_model
+    async def close(self):
+        """Release the upstream HTTP sessions"""
+        for provider in self.providers.values():
+            await provider.close()
 
 
 # Test the service
-if __name__ == "__main__":
+async def main():
     print("=" * 60)
     print(" TESTING LLM SERVICE")
     print("=" * 60)
     
+    llm = None
     try:
         # Initialize service
         llm = LLMService()
         
         # Show available models
         print(f"\n Available models: {llm.get_available_models()}")
-        print(f" Current model: {llm.get_current_model()}")
+        print(f" Default model: {llm.DEFAULT_MODEL}")
         
         # Test 1: Mistral
         print("\n" + "=" * 60)
@@ -86,27 +586,25 @@ if __name__ == "__main__":
         print("=" * 60)
         question1 = "What is machine learning in one sentence?"
         print(f"Question: {question1}")
-        response1 = llm.generate_response(question1, max_tokens=100)
+        response1 = await llm.generate_response(question1, max_tokens=100, model="mistral")
         print(f"Answer: {response1}")
         
         # Test 2: Zephyr
         print("\n" + "=" * 60)
         print("TEST 2: ZEPHYR MODEL")
         print("=" * 60)
-        llm.switch_model("zephyr")
         question2 = "What is Python programming?"
         print(f"Question: {question2}")
-        response2 = llm.generate_response(question2, max_tokens=100)
+        response2 = await llm.generate_response(question2, max_tokens=100, model="zephyr")
         print(f"Answer: {response2}")
         
         # Test 3: Llama
         print("\n" + "=" * 60)
         print("TEST 3: LLAMA MODEL")
         print("=" * 60)
-        llm.switch_model("llama")
         question3 = "Explain AI briefly"
         print(f"Question: {question3}")
-        response3 = llm.generate_response(question3, max_tokens=100)
+        response3 = await llm.generate_response(question3, max_tokens=100, model="llama")
         print(f"Answer: {response3}")
         
         print("\n" + "=" * 60)
@@ -118,4 +616,11 @@ if __name__ == "__main__":
         print("\n Check that:")
         print("   1. Your HUGGINGFACE_TOKEN is in backend/.env")
         print("   2. Your token is valid (check https://huggingface.co/settings/tokens)")
-        print("   3. You're connected to internet")
\ No newline at end of file
+        print("   3. You're connected to internet")
+    finally:
+        if llm is not None:
+            await llm.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
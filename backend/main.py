@@ -1,22 +1,93 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from llm_service import LLMService
+from resilience import UpstreamError
+from scheduler import AdmissionError, FairScheduler, parse_weights
+from rate_limit import DEFAULT_LIMITS, RateLimiter, RateLimitResult, parse_limits
+from conversations import Conversation, Turn, create_conversation_store
 
 from auth import (
     LoginRequest, 
     LoginResponse, 
-    authenticate_user, 
+    authenticate_user_async, 
     verify_token, 
+    require_admin,
+    session_token,
+    get_session_model,
+    set_session_model,
+    get_user_tier,
     logout_user,
-    get_active_users
+    get_active_users,
+    get_all_sessions,
+    cleanup_old_sessions,
+    SESSIONS
 )
-from typing import Optional
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import math
+import os
+import time
+
+# Initialize LLM service
+llm_service = LLMService()
+
+# Admission control: bounded queue, priority lanes, fair share per user
+scheduler = FairScheduler(
+    max_concurrent=int(os.getenv("SCHEDULER_MAX_CONCURRENT", "128")),
+    max_queue=int(os.getenv("SCHEDULER_MAX_QUEUE", "512")),
+    max_queue_per_user=int(os.getenv("SCHEDULER_MAX_QUEUE_PER_USER", "64")),
+    max_wait=float(os.getenv("SCHEDULER_MAX_WAIT_SECONDS", "30")),
+    weights=parse_weights(os.getenv("SCHEDULER_USER_WEIGHTS", ""))
+)
+
+# Per-user token buckets; RATE_LIMITS overrides individual defaults
+rate_limiter = RateLimiter(
+    {**DEFAULT_LIMITS, **parse_limits(os.getenv("RATE_LIMITS", ""))},
+    max_buckets=int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+)
+
+# /query/batch: items per request, and items sent upstream at once per batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Largest answer a request may ask for (max_tokens)
+MAX_RESPONSE_TOKENS = int(os.getenv("MAX_RESPONSE_TOKENS", "4096"))
+
+# Server-side chat history (CONVERSATION_STORE picks the backend)
+conversations = create_conversation_store()
+
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "30"))
+SESSION_SWEEP_BATCH = 10_000
+
+async def sweep_sessions():
+    """Background task: remove expired sessions in small batches"""
+    while True:
+        try:
+            removed = cleanup_old_sessions(limit=SESSION_SWEEP_BATCH)
+        except Exception as e:
+            # One bad sweep must not stop expiry for the life of the process
+            print(f" Session sweep failed: {e}")
+            removed = 0
+        # A full batch means more are waiting: yield to requests, then continue
+        await asyncio.sleep(0 if removed == SESSION_SWEEP_BATCH else SESSION_SWEEP_INTERVAL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sweeper = asyncio.create_task(sweep_sessions())
+    yield
+    sweeper.cancel()
+    # Close the shared upstream HTTP session on shutdown
+    await llm_service.close()
 
 app = FastAPI(
     title="AI Assistant API",
     description="Backend API with Authentication",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS
@@ -28,16 +99,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize LLM service
-llm_service = LLMService()
-
 # ============================================================================
 # MODELS
 # ============================================================================
 
 class QueryRequest(BaseModel):
     prompt: str
-    max_tokens: Optional[int] = 150
+    max_tokens: int = Field(150, ge=1, le=MAX_RESPONSE_TOKENS)
+    system_prompt: Optional[str] = None
+    model: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    items: List[QueryRequest]
 
 class QueryResponse(BaseModel):
     response: str
@@ -46,12 +119,22 @@ class QueryResponse(BaseModel):
 class ModelSwitchRequest(BaseModel):
     model_name: str
 
+class ConversationCreateRequest(BaseModel):
+    system_prompt: Optional[str] = None
+    model: Optional[str] = None
+
+class ConversationMessageRequest(BaseModel):
+    prompt: str
+    # Sizes the history budget, so it must be a real number
+    max_tokens: int = Field(150, ge=1, le=MAX_RESPONSE_TOKENS)
+    model: Optional[str] = None
+
 # ============================================================================
 # PUBLIC ENDPOINTS (No auth required)
 # ============================================================================
 
 @app.get("/")
-def read_root():
+async def read_root():
     """Root endpoint"""
     return {
         "message": "AI Assistant API with Authentication ",
@@ -61,12 +144,15 @@ def read_root():
     }
 
 @app.get("/health")
-def health_check():
-    """Health check"""
+async def health_check():
+    """Health check - includes each model's circuit breaker state"""
+    models = llm_service.health()
+    degraded = any(breaker["state"] != "closed" for breaker in models.values())
     return {
-        "status": "healthy",
-        "current_model": llm_service.get_current_model(),
-        "active_users": get_active_users()
+        "status": "degraded" if degraded else "healthy",
+        "default_model": llm_service.DEFAULT_MODEL,
+        "active_users": get_active_users(),
+        "models": models
     }
 
 # ============================================================================
@@ -74,7 +160,7 @@ def health_check():
 # ============================================================================
 
 @app.post("/login", response_model=LoginResponse)
-def login(request: LoginRequest):
+async def login(request: LoginRequest):
     """
     Login endpoint - returns token if successful
     
@@ -84,7 +170,7 @@ def login(request: LoginRequest):
     """
     print(f" Login attempt: {request.username}")
     
-    token = authenticate_user(request.username, request.password)
+    token = await authenticate_user_async(request.username, request.password)
     
     if token:
         print(f" Login successful: {request.username}")
@@ -110,46 +196,442 @@ def logout(token: str):
         "message": "Logged out successfully" if success else "Invalid token"
     }
 
+def select_model(requested: Optional[str], token: str) -> str:
+    """Model for this request: explicit choice, then session preference, then default"""
+    model = requested or get_session_model(token) or llm_service.DEFAULT_MODEL
+    if model not in llm_service.models:
+        raise HTTPException(status_code=400, detail=f"Model {model} not found")
+    return model
+
+def upstream_http_error(error: UpstreamError) -> HTTPException:
+    """Map a typed upstream failure to its HTTP status (+ Retry-After)"""
+    headers = None
+    if error.retry_after:
+        headers = {"Retry-After": str(math.ceil(error.retry_after))}
+    return HTTPException(status_code=error.status_code, detail=str(error), headers=headers)
+
+def admission_http_error(error: AdmissionError) -> HTTPException:
+    """429 (queue full) / 503 (waited too long) with Retry-After and queue depth"""
+    return HTTPException(
+        status_code=error.status_code,
+        detail=str(error),
+        headers={
+            "Retry-After": str(math.ceil(error.retry_after)),
+            "X-Queue-Depth": str(error.queue_depth)
+        }
+    )
+
+async def admit(username: str):
+    """Wait for a scheduler slot in this user's lane"""
+    try:
+        await scheduler.acquire(username, get_user_tier(username))
+    except AdmissionError as e:
+        print(f" Rejected {username}: {e} (queue depth {e.queue_depth})")
+        raise admission_http_error(e)
+
+def check_rate_limit(username: str, endpoint: str, cost: int = 1) -> Optional[RateLimitResult]:
+    """Take `cost` tokens from the user's bucket, 429 + Retry-After when exhausted"""
+    result = rate_limiter.check(username, get_user_tier(username), endpoint, cost)
+    if result is not None and not result.allowed:
+        print(f" Rate limited {username} on {endpoint}")
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded. Please slow down.",
+            headers=result.headers()
+        )
+    return result
+
+def rate_limited(endpoint: str):
+    """Dependency: meter `endpoint` per user and set the RateLimit headers"""
+    async def check(response: Response, username: str = Depends(verify_token)) -> Optional[RateLimitResult]:
+        result = check_rate_limit(username, endpoint)
+        if result is not None:
+            response.headers.update(result.headers())
+        return result
+    return check
+
+async def stream_ndjson(
+    username: str,
+    model: str,
+    tokens: AsyncIterator[Tuple[str, str]],
+    limit: Optional[RateLimitResult],
+    on_complete: Optional[Callable[[str, str], None]] = None
+) -> StreamingResponse:
+    """
+    NDJSON response for a (model, token) stream; releases the admission slot
+    when the stream ends. on_complete(answer, model) runs after a full answer.
+    """
+    # Wait for the first token so upstream errors still get a real status code
+    try:
+        first = await tokens.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except UpstreamError as e:
+        scheduler.release()
+        raise upstream_http_error(e)
+    except BaseException:
+        scheduler.release()
+        raise
+    
+    async def ndjson_lines() -> AsyncIterator[str]:
+        # A hedged request may be answered by another model
+        answered_by = model
+        parts = []
+        try:
+            if first is not None:
+                answered_by, chunk = first
+                parts.append(chunk)
+                yield json.dumps({"token": chunk}) + "\n"
+                async for answered_by, chunk in tokens:
+                    parts.append(chunk)
+                    yield json.dumps({"token": chunk}) + "\n"
+        except UpstreamError as e:
+            yield json.dumps({"error": str(e), "status": e.status_code}) + "\n"
+            return
+        finally:
+            await tokens.aclose()
+            scheduler.release()
+        if on_complete is not None:
+            on_complete("".join(parts).strip(), answered_by)
+        yield json.dumps({"done": True, "model": answered_by}) + "\n"
+        print(f" Stream finished for {username}")
+    
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers=limit.headers() if limit else None
+    )
+
+def wants_cache(cache_control: Optional[str]) -> bool:
+    """Requests can skip the response cache with `Cache-Control: no-cache`"""
+    if not cache_control:
+        return True
+    directives = {d.strip().lower() for d in cache_control.split(",")}
+    return not directives & {"no-cache", "no-store"}
+
 # ============================================================================
 # PROTECTED ENDPOINTS (Auth required)
 # ============================================================================
 
 @app.get("/models")
-def get_models(username: str = Depends(verify_token)):
+async def get_models(username: str = Depends(verify_token), token: str = Depends(session_token)):
     """Get available models - PROTECTED"""
     print(f" {username} requested models")
     return {
         "models": llm_service.get_available_models(),
-        "current": llm_service.get_current_model()
+        "current": get_session_model(token) or llm_service.DEFAULT_MODEL
     }
 
 @app.post("/query", response_model=QueryResponse)
-def query_llm(request: QueryRequest, username: str = Depends(verify_token)):
+async def query_llm(
+    request: QueryRequest,
+    username: str = Depends(verify_token),
+    token: str = Depends(session_token),
+    cache_control: Optional[str] = Header(None),
+    limit: Optional[RateLimitResult] = Depends(rate_limited("query"))
+):
     """Send query to LLM - PROTECTED"""
+    model = select_model(request.model, token)
+    await admit(username)
     try:
-        print(f" {username} sent query: {request.prompt[:50]}...")
+        print(f" {username} sent query to {model}: {request.prompt[:50]}...")
         
-        response = llm_service.generate_response(
+        completion = await llm_service.generate(
             request.prompt,
-            request.max_tokens
+            request.max_tokens,
+            system_prompt=request.system_prompt,
+            use_cache=wants_cache(cache_control),
+            model=model
         )
         
         print(f" Response generated for {username}")
         
         return QueryResponse(
-            response=response,
-            model=llm_service.current_model
+            response=completion.text,
+            model=completion.model
         )
+    except UpstreamError as e:
+        raise upstream_http_error(e)
     except Exception as e:
         print(f" Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        scheduler.release()
+
+@app.post("/query/stream")
+async def query_llm_stream(
+    request: QueryRequest,
+    username: str = Depends(verify_token),
+    token: str = Depends(session_token),
+    cache_control: Optional[str] = Header(None),
+    limit: Optional[RateLimitResult] = Depends(rate_limited("query"))
+):
+    """
+    Stream query response as NDJSON - PROTECTED
+    
+    Each line is a JSON object:
+    - {"token": "..."} for every chunk produced by the model
+    - {"done": true, "model": "..."} once generation has finished
+    - {"error": "...", "status": 503} if the model fails mid-stream
+    Failures before the first token are returned as normal HTTP errors.
+    """
+    model = select_model(request.model, token)
+    print(f" {username} sent streaming query to {model}: {request.prompt[:50]}...")
+    
+    # The slot is held until the stream ends (released in stream_ndjson)
+    await admit(username)
+    tokens = llm_service.stream(
+        request.prompt,
+        request.max_tokens,
+        system_prompt=request.system_prompt,
+        use_cache=wants_cache(cache_control),
+        model=model
+    )
+    return await stream_ndjson(username, model, tokens, limit)
+
+@app.post("/query/batch")
+async def query_llm_batch(
+    request: BatchQueryRequest,
+    username: str = Depends(verify_token),
+    token: str = Depends(session_token),
+    cache_control: Optional[str] = Header(None)
+):
+    """
+    Run many prompts and stream each result as NDJSON as soon as it is ready - PROTECTED
+    
+    Each line is one of:
+    - {"index": 0, "response": "...", "model": "...", "cached": false}
+    - {"index": 1, "error": "...", "status": 503} (other items still run)
+    - {"done": true, "succeeded": 1, "failed": 1} at the end
+    Every item counts against the query rate limit, so a batch may hold
+    at most as many items as the user's query bucket. Items run in the
+    scheduler's "batch" lane, behind interactive requests.
+    """
+    items = request.items
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    # A batch bigger than the user's bucket could never be admitted, so it
+    # is refused outright instead of getting a 429 that never clears
+    tier = get_user_tier(username)
+    policy = rate_limiter.policy(tier, "query")
+    max_items = min(BATCH_MAX_ITEMS, policy.limit) if policy is not None else BATCH_MAX_ITEMS
+    if len(items) > max_items:
+        raise HTTPException(status_code=413, detail=f"At most {max_items} items per batch for the {tier} tier")
+    limit = check_rate_limit(username, "query", cost=len(items))
+    use_cache = wants_cache(cache_control)
+    fan_out = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    print(f" {username} sent a batch of {len(items)} queries")
+    
+    async def run(index: int, item: QueryRequest) -> dict:
+        async with fan_out:
+            try:
+                model = select_model(item.model, token)
+                await scheduler.acquire(username, "batch")
+            except HTTPException as e:
+                return {"index": index, "error": e.detail, "status": e.status_code}
+            except AdmissionError as e:
+                return {"index": index, "error": str(e), "status": e.status_code}
+            try:
+                completion = await llm_service.generate(
+                    item.prompt,
+                    item.max_tokens,
+                    system_prompt=item.system_prompt,
+                    use_cache=use_cache,
+                    model=model
+                )
+                return {"index": index, "response": completion.text,
+                        "model": completion.model, "cached": completion.cached}
+            except UpstreamError as e:
+                return {"index": index, "error": str(e), "status": e.status_code}
+            except Exception as e:
+                print(f" Error: {str(e)}")
+                return {"index": index, "error": str(e), "status": 500}
+            finally:
+                scheduler.release()
+    
+    async def ndjson_lines() -> AsyncIterator[str]:
+        tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+        failed = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                failed += "error" in result
+                yield json.dumps(result) + "\n"
+        finally:
+            # Client went away: stop the items that have not finished
+            for task in tasks:
+                task.cancel()
+        yield json.dumps({"done": True, "succeeded": len(items) - failed, "failed": failed}) + "\n"
+        print(f" Batch finished for {username}: {len(items) - failed} ok, {failed} failed")
+    
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers=limit.headers() if limit else None
+    )
 
 @app.post("/switch-model")
-def switch_model(request: ModelSwitchRequest, username: str = Depends(verify_token)):
-    """Switch AI model - PROTECTED"""
+async def switch_model(
+    request: ModelSwitchRequest,
+    username: str = Depends(verify_token),
+    token: str = Depends(session_token),
+    limit: Optional[RateLimitResult] = Depends(rate_limited("switch-model"))
+):
+    """Switch AI model for this session only - PROTECTED"""
     print(f" {username} switching to {request.model_name}")
-    result = llm_service.switch_model(request.model_name)
+    if request.model_name in llm_service.models:
+        set_session_model(token, request.model_name)
+        result = f"Switched to {request.model_name}"
+    else:
+        result = "Model not found"
     return {
         "message": result,
-        "current_model": llm_service.get_current_model()
+        "current_model": get_session_model(token) or llm_service.DEFAULT_MODEL
     }
+
+# ============================================================================
+# CONVERSATION ENDPOINTS (Auth required)
+# ============================================================================
+# The backend stores each conversation's turns; clients send only the new
+# message and the model still sees the whole conversation.
+
+def get_conversation(username: str, conversation_id: str) -> Conversation:
+    conversation = conversations.get(username, conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
+
+@app.post("/conversations")
+async def create_conversation(
+    request: ConversationCreateRequest,
+    username: str = Depends(verify_token),
+    token: str = Depends(session_token)
+):
+    """Start a new conversation - PROTECTED"""
+    model = select_model(request.model, token) if request.model else None
+    conversation = conversations.create(username, request.system_prompt, model)
+    print(f" {username} started conversation {conversation.id}")
+    return conversation.summary()
+
+@app.get("/conversations")
+async def list_conversations(username: str = Depends(verify_token)):
+    """The user's conversations, most recently used first - PROTECTED"""
+    return {"conversations": [c.summary() for c in conversations.list(username)]}
+
+@app.get("/conversations/{conversation_id}")
+async def read_conversation(
+    conversation_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    username: str = Depends(verify_token)
+):
+    """One page of a conversation's turns, oldest first - PROTECTED"""
+    conversation = get_conversation(username, conversation_id)
+    return {
+        **conversation.summary(),
+        "system_prompt": conversation.system_prompt,
+        "offset": offset,
+        "limit": limit,
+        "messages": [turn._asdict() for turn in conversation.turns[offset:offset + limit]]
+    }
+
+@app.delete("/conversations/{conversation_id}")
+async def delete_conversation(conversation_id: str, username: str = Depends(verify_token)):
+    """Delete a conversation and its history - PROTECTED"""
+    if not conversations.delete(username, conversation_id):
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {"message": "Conversation deleted"}
+
+@app.post("/conversations/{conversation_id}/messages")
+async def send_message(
+    conversation_id: str,
+    request: ConversationMessageRequest,
+    username: str = Depends(verify_token),
+    token: str = Depends(session_token),
+    cache_control: Optional[str] = Header(None),
+    limit: Optional[RateLimitResult] = Depends(rate_limited("query"))
+):
+    """
+    Add a message to a conversation and stream the reply as NDJSON - PROTECTED
+    
+    Same events as /query/stream. The message and the reply are saved to
+    the conversation once the reply is complete.
+    """
+    conversation = get_conversation(username, conversation_id)
+    model = select_model(request.model or conversation.model, token)
+    sent_at = time.time()
+    print(f" {username} sent message to {model} in {conversation_id}: {request.prompt[:50]}...")
+    
+    def save_turns(answer: str, answered_by: str):
+        # No tokens came back: keep the history free of empty replies
+        if not answer:
+            return
+        conversations.append(username, conversation_id, [
+            Turn("user", request.prompt, sent_at),
+            Turn("assistant", answer, time.time())
+        ])
+    
+    # Fit the history into the model's prompt budget (older turns summarized)
+    context = llm_service.context.pack(conversation, request.prompt, model, request.max_tokens)
+    
+    await admit(username)
+    tokens = llm_service.stream(
+        request.prompt,
+        request.max_tokens,
+        system_prompt=context.system_prompt,
+        use_cache=wants_cache(cache_control),
+        model=model,
+        history=context.history
+    )
+    return await stream_ndjson(username, model, tokens, limit, on_complete=save_turns)
+
+# ============================================================================
+# ADMIN ENDPOINTS (Admin account required)
+# ============================================================================
+
+@app.get("/admin/llm")
+async def llm_stats(username: str = Depends(require_admin)):
+    """Per-model latency, hedging and request coalescing counters - ADMIN"""
+    return llm_service.stats()
+
+@app.get("/admin/scheduler")
+async def scheduler_stats(username: str = Depends(require_admin)):
+    """Queue depth, rejections and queue wait per lane - ADMIN"""
+    return scheduler.stats()
+
+@app.get("/admin/rate-limits")
+async def rate_limit_stats(username: str = Depends(require_admin)):
+    """Rate limiter buckets, allowed and rejected counts - ADMIN"""
+    return rate_limiter.stats()
+
+@app.get("/admin/sessions")
+async def list_sessions(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    username: str = Depends(require_admin)
+):
+    """Active sessions, most recently active first, one page at a time - ADMIN"""
+    return {
+        "total": get_active_users(),
+        "offset": offset,
+        "limit": limit,
+        "sessions": get_all_sessions(offset, limit),
+        "store": SESSIONS.stats()
+    }
+
+@app.get("/admin/conversations")
+async def conversation_stats(username: str = Depends(require_admin)):
+    """Conversation store size and evictions - ADMIN"""
+    return conversations.stats()
+
+@app.get("/admin/cache")
+async def cache_stats(username: str = Depends(require_admin)):
+    """Response cache hit rate, evictions and memory use - ADMIN"""
+    return llm_service.cache_stats()
+
+@app.delete("/admin/cache")
+async def clear_cache(username: str = Depends(require_admin)):
+    """Drop all cached responses - ADMIN"""
+    llm_service.clear_cache()
+    print(f" {username} cleared the response cache")
+    return {"message": "Cache cleared", **llm_service.cache_stats()}
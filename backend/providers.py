@@ -0,0 +1,345 @@
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+import os
+import random
+
+# ============================================================================
+# INFERENCE PROVIDERS
+# ============================================================================
+# A provider is what LLMService calls for each model:
+#     await provider.chat_completion(messages=..., model=<model id>,
+#                                    max_tokens=..., temperature=..., stream=...)
+# It returns a response with choices[0].message.content, or with
+# stream=True an async iterator of chunks with choices[0].delta.content
+# (the HuggingFace / OpenAI shape). Errors are raised as the client raises
+# them; resilience.classify_error maps them to HTTP statuses.
+#
+# LLM_PROVIDER picks the provider:
+#   - "huggingface" (default): the HuggingFace Inference API
+#   - "stub": answers locally after a simulated delay, with configurable
+#     time-to-first-token, tokens/sec, error rate and tail latency, so the
+#     whole app can be load-tested without network access or a token
+#   - "replay": plays back traffic recorded with LLM_RECORD_CASSETTE
+#     (see cassettes.py)
+# Models listed in LOCAL_MODELS are served by OpenAICompatibleProvider
+# instead, whatever LLM_PROVIDER says (self-hosted llama.cpp, vLLM, ...).
+# ============================================================================
+
+
+def chat_response(text: str):
+    """A non-streaming response in the shape the service reads"""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+def chat_chunk(text: Optional[str]):
+    """One streaming chunk in the shape the service reads"""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class ChatProvider(ABC):
+    """Upstream chat completion API shared by one or more models"""
+
+    name = "provider"
+
+    @abstractmethod
+    async def chat_completion(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                              temperature: float, stream: bool = False):
+        """A response, or with stream=True an async iterator of chunks"""
+
+    async def close(self):
+        """Release connections"""
+
+    def stats(self) -> dict:
+        return {"provider": self.name}
+
+
+class HuggingFaceProvider(ChatProvider):
+    """HuggingFace Inference API, one client per model created on first use"""
+
+    name = "huggingface"
+
+    def __init__(self, token: str, timeout: float):
+        self.token = token
+        self.timeout = timeout
+        self._clients = {}
+
+    def client(self, model: str):
+        client = self._clients.get(model)
+        if client is None:
+            # Imported here, so startup does not pay for huggingface_hub
+            from huggingface_hub import AsyncInferenceClient
+            client = self._clients[model] = AsyncInferenceClient(model=model, token=self.token, timeout=self.timeout)
+        return client
+
+    async def chat_completion(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                              temperature: float, stream: bool = False):
+        return await self.client(model).chat_completion(
+            messages=messages, model=model, max_tokens=max_tokens, temperature=temperature, stream=stream
+        )
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+
+    def stats(self) -> dict:
+        return {"provider": self.name, "clients": len(self._clients)}
+
+
+class SimulatedUpstreamError(Exception):
+    """Stubbed or replayed upstream failure; `status` is read by classify_error"""
+
+    def __init__(self, status: int, message: Optional[str] = None):
+        super().__init__(message or f"simulated upstream error ({status})")
+        self.status = status
+
+
+class StubProvider(ChatProvider):
+    """Local stand-in that answers after a realistic, configurable delay"""
+
+    name = "stub"
+
+    def __init__(self, ttft: float = 0.3, tokens_per_second: float = 40, answer_tokens: int = 60,
+                 jitter: float = 0.25, error_rate: float = 0.0, error_status: int = 503,
+                 tail_rate: float = 0.01, tail_multiplier: float = 8, seed: Optional[int] = None):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.tail_rate = tail_rate
+        self.tail_multiplier = tail_multiplier
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.tail_requests = 0
+        self.tokens = 0
+
+    @classmethod
+    def from_env(cls) -> "StubProvider":
+        seed = os.getenv("STUB_SEED")
+        return cls(
+            ttft=float(os.getenv("STUB_TTFT_SECONDS", "0.3")),
+            tokens_per_second=float(os.getenv("STUB_TOKENS_PER_SECOND", "40")),
+            answer_tokens=int(os.getenv("STUB_ANSWER_TOKENS", "60")),
+            jitter=float(os.getenv("STUB_JITTER", "0.25")),
+            error_rate=float(os.getenv("STUB_ERROR_RATE", "0")),
+            error_status=int(os.getenv("STUB_ERROR_STATUS", "503")),
+            tail_rate=float(os.getenv("STUB_TAIL_RATE", "0.01")),
+            tail_multiplier=float(os.getenv("STUB_TAIL_MULTIPLIER", "8")),
+            seed=int(seed) if seed else None
+        )
+
+    def _plan(self, messages: List[Dict[str, str]], model: str, max_tokens: int):
+        """Answer tokens and the delay factor for one request"""
+        self.requests += 1
+        # Log-normal noise around the configured speed, and an occasional
+        # much slower request (the tail that hedging and p99 care about)
+        slowdown = self.random.lognormvariate(0, self.jitter) if self.jitter else 1.0
+        if self.random.random() < self.tail_rate:
+            self.tail_requests += 1
+            slowdown *= self.tail_multiplier
+        words = f"Simulated {model} answer to: {messages[-1]['content']}".split()
+        count = max(1, min(max_tokens, self.answer_tokens))
+        tokens = [(" " if i else "") + words[i % len(words)] for i in range(count)]
+        return tokens, slowdown
+
+    def _fail(self) -> bool:
+        return self.error_rate > 0 and self.random.random() < self.error_rate
+
+    async def chat_completion(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                              temperature: float, stream: bool = False):
+        tokens, slowdown = self._plan(messages, model, max_tokens)
+        await asyncio.sleep(self.ttft * slowdown)
+        if self._fail():
+            self.errors += 1
+            raise SimulatedUpstreamError(self.error_status)
+        if stream:
+            return self._stream(tokens, slowdown)
+        await asyncio.sleep(len(tokens) / self.tokens_per_second * slowdown)
+        self.tokens += len(tokens)
+        return chat_response("".join(tokens))
+
+    async def _stream(self, tokens: List[str], slowdown: float) -> AsyncIterator:
+        delay = slowdown / self.tokens_per_second
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(delay)
+            self.tokens += 1
+            yield chat_chunk(token)
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.name,
+            "requests": self.requests,
+            "errors": self.errors,
+            "tail_requests": self.tail_requests,
+            "tokens": self.tokens
+        }
+
+
+class OpenAICompatibleProvider(ChatProvider):
+    """/v1/chat/completions servers (llama.cpp, vLLM, ...) over one keep-alive pool"""
+
+    name = "openai"
+
+    def __init__(self, pool_size: int = 100, keepalive: float = 30, connect_timeout: float = 5,
+                 timeout: float = 60, api_key: Optional[str] = None):
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self.api_key = api_key
+        self.base_urls: Dict[str, str] = {}
+        # One aiohttp session for every model: connections to a server are
+        # reused across requests instead of paying a handshake each time. A
+        # TraceConfig counts new and reused connections and waits for a slot.
+        self._session = None
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.pool_waits = 0
+
+    @classmethod
+    def from_env(cls, timeout: float) -> "OpenAICompatibleProvider":
+        return cls(
+            pool_size=int(os.getenv("LOCAL_LLM_POOL_SIZE", "100")),
+            keepalive=float(os.getenv("LOCAL_LLM_KEEPALIVE_SECONDS", "30")),
+            connect_timeout=float(os.getenv("LOCAL_LLM_CONNECT_TIMEOUT_SECONDS", "5")),
+            timeout=float(os.getenv("LOCAL_LLM_TIMEOUT_SECONDS", str(timeout))),
+            api_key=os.getenv("LOCAL_LLM_API_KEY") or None
+        )
+
+    def register(self, model: str, base_url: str):
+        """Send requests for `model` to the server at base_url"""
+        base_url = base_url.rstrip("/")
+        # Requests are routed by model id, so one id cannot live on two servers
+        registered = self.base_urls.get(model)
+        if registered is not None and registered != base_url:
+            raise ValueError(f"LOCAL_MODELS maps {model} to both {registered} and {base_url}")
+        self.base_urls[model] = base_url
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            # Imported here, so startup does not pay for aiohttp
+            import aiohttp
+            trace = aiohttp.TraceConfig()
+            trace.on_request_start.append(self._on_request)
+            trace.on_connection_create_end.append(self._on_connection_created)
+            trace.on_connection_reuseconn.append(self._on_connection_reused)
+            trace.on_connection_queued_start.append(self._on_pool_wait)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive),
+                timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout),
+                trace_configs=[trace]
+            )
+        return self._session
+
+    async def _on_request(self, session, context, params):
+        self.requests += 1
+
+    async def _on_connection_created(self, session, context, params):
+        self.connections_created += 1
+
+    async def _on_connection_reused(self, session, context, params):
+        self.connections_reused += 1
+
+    async def _on_pool_wait(self, session, context, params):
+        self.pool_waits += 1
+
+    async def chat_completion(self, messages: List[Dict[str, str]], model: str, max_tokens: int,
+                              temperature: float, stream: bool = False):
+        import aiohttp
+        session = self._get_session()
+        payload = {
+            "model": model, "messages": messages, "max_tokens": max_tokens,
+            "temperature": temperature, "stream": stream
+        }
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else None
+        # A stream may run longer than any total timeout; bound the gaps instead.
+        # (timeout=None would not mean "session default": it disables the timeout)
+        if stream:
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.timeout)
+        else:
+            timeout = aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.connect_timeout)
+        response = await session.post(
+            f"{self.base_urls[model]}/v1/chat/completions", json=payload, headers=headers, timeout=timeout
+        )
+        # ClientResponseError carries .status and .headers for classify_error
+        if not stream:
+            async with response:
+                response.raise_for_status()
+                data = await response.json()
+            return chat_response(data["choices"][0]["message"]["content"] or "")
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.release()
+            raise
+        return self._events(response)
+
+    async def _events(self, response) -> AsyncIterator:
+        """Server-sent events -> chunks, until data: [DONE]"""
+        try:
+            async for line in response.content:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                if choices:
+                    yield chat_chunk(choices[0].get("delta", {}).get("content"))
+        finally:
+            response.release()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> dict:
+        connections = self.connections_created + self.connections_reused
+        return {
+            "provider": self.name,
+            "models": dict(self.base_urls),
+            "pool_size": self.pool_size,
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "pool_hit_rate": round(self.connections_reused / connections, 3) if connections else 0.0,
+            "pool_waits": self.pool_waits
+        }
+
+
+def parse_local_models(value: str) -> Dict[str, tuple]:
+    """LOCAL_MODELS "name=model_id@http://host:port,..." -> {name: (model_id, base_url)}"""
+    models = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        name, _, target = entry.partition("=")
+        model_id, _, base_url = target.partition("@")
+        if not (name and model_id and base_url):
+            raise ValueError(f"LOCAL_MODELS entry must be name=model_id@base_url: {entry}")
+        models[name.strip()] = (model_id.strip(), base_url.strip())
+    return models
+
+
+def create_provider(name: str, timeout: float) -> ChatProvider:
+    """Provider selected by LLM_PROVIDER"""
+    name = name.lower()
+    if name == "huggingface":
+        token = os.getenv("HUGGINGFACE_API_TOKEN")
+        if not token:
+            raise ValueError(" HUGGINGFACE_API_TOKEN not found in .env file!")
+        return HuggingFaceProvider(token, timeout)
+    if name == "stub":
+        return StubProvider.from_env()
+    if name == "replay":
+        from cassettes import ReplayProvider
+        return ReplayProvider.from_env()
+    raise ValueError(f"Unknown LLM_PROVIDER: {name}")
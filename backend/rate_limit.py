@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+import math
+import time
+
+# ============================================================================
+# PER-USER TOKEN-BUCKET RATE LIMITING
+# ============================================================================
+# Every (user, endpoint) pair has a bucket holding up to `limit` tokens that
+# refills at limit/window tokens per second. A request takes one token (a
+# batch takes one per item) or is rejected with 429.
+#   - O(1) per check: the refill is computed lazily from the time elapsed
+#     since the bucket was last touched - no timers, no background task
+#   - Limits come from the user's tier ("admin", "default", ...)
+#   - Bounded memory: buckets live in an LRU; a bucket idle long enough to
+#     be full again is identical to a fresh one, so it is dropped, and the
+#     least recently used bucket goes when max_buckets is reached
+# ============================================================================
+
+
+class RateLimitPolicy(NamedTuple):
+    """`limit` requests per `window` seconds, with bursts up to `limit`"""
+    limit: int
+    window: float
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.window
+
+    def header(self) -> str:
+        return f"{self.limit};w={int(self.window)}"
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    policy: RateLimitPolicy
+    remaining: int
+    reset: float        # seconds until the bucket is full again
+    retry_after: float  # seconds until this request would be allowed
+
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.policy.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+            "RateLimit-Policy": self.policy.header()
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+# (tier, endpoint) -> policy
+DEFAULT_LIMITS: Dict[Tuple[str, str], RateLimitPolicy] = {
+    ("default", "query"): RateLimitPolicy(30, 60),
+    ("default", "switch-model"): RateLimitPolicy(10, 60),
+    ("admin", "query"): RateLimitPolicy(300, 60),
+    ("admin", "switch-model"): RateLimitPolicy(60, 60),
+}
+
+
+def parse_limits(spec: str) -> Dict[Tuple[str, str], RateLimitPolicy]:
+    """Parse "default:query=30/60,admin:query=300/60" into policies"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        tier, _, endpoint = name.strip().partition(":")
+        limit, _, window = value.partition("/")
+        limits[(tier, endpoint)] = RateLimitPolicy(int(limit), float(window or 60))
+    return limits
+
+
+class RateLimiter:
+    """Token buckets per (user, endpoint) with lazy refill and LRU eviction"""
+
+    def __init__(self, limits: Optional[Dict[Tuple[str, str], RateLimitPolicy]] = None,
+                 max_buckets: int = 100_000):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.max_buckets = max_buckets
+        # (username, endpoint) -> [tokens, last update, seconds to refill fully]
+        self._buckets: "OrderedDict[Tuple[str, str], list]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+        self.evictions = 0
+
+    def policy(self, tier: str, endpoint: str) -> Optional[RateLimitPolicy]:
+        return self.limits.get((tier, endpoint)) or self.limits.get(("default", endpoint))
+
+    def check(self, username: str, tier: str, endpoint: str, cost: int = 1) -> Optional[RateLimitResult]:
+        """Take `cost` tokens if available; None if the endpoint is not limited"""
+        policy = self.policy(tier, endpoint)
+        if policy is None:
+            return None
+
+        now = time.monotonic()
+        limit = policy.limit
+        rate = limit / policy.window
+        key = (username, endpoint)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(limit)
+            bucket = [tokens, now, policy.window]
+            self._buckets[key] = bucket
+            self._evict(now)
+        else:
+            self._buckets.move_to_end(key)
+            tokens = bucket[0] + (now - bucket[1]) * rate
+            if tokens > limit:
+                tokens = float(limit)
+            bucket[1] = now
+            bucket[2] = policy.window
+
+        if tokens >= cost:
+            tokens -= cost
+            bucket[0] = tokens
+            self.allowed += 1
+            return RateLimitResult(True, policy, int(tokens), (limit - tokens) / rate, 0.0)
+
+        bucket[0] = tokens
+        self.rejected += 1
+        return RateLimitResult(
+            False, policy, int(tokens), (limit - tokens) / rate,
+            (min(cost, limit) - tokens) / rate
+        )
+
+    def stats(self) -> dict:
+        return {
+            "buckets": len(self._buckets),
+            "max_buckets": self.max_buckets,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evictions": self.evictions
+        }
+
+    def _evict(self, now: float):
+        buckets = self._buckets
+        if len(buckets) > self.max_buckets:
+            buckets.popitem(last=False)
+            self.evictions += 1
+        # Drop a couple of idle buckets per insert: amortized O(1), and
+        # idle buckets never pile up
+        for _ in range(2):
+            key, (_, updated, window) = next(iter(buckets.items()))
+            if now - updated < window:
+                return
+            del buckets[key]
+            self.evictions += 1
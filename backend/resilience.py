@@ -0,0 +1,215 @@
+from typing import Awaitable, Callable, Optional, TypeVar
+import asyncio
+import random
+import sys
+import time
+
+# ============================================================================
+# UPSTREAM RESILIENCE
+# ============================================================================
+# - Typed errors: every upstream failure becomes an UpstreamError subclass
+#   that knows its HTTP status and whether retrying can help
+# - Retries: bounded attempts with full-jitter exponential backoff, only for
+#   retryable errors (timeouts, 429, 5xx, connection failures)
+# - Circuit breaker (per model): after N consecutive failures the model is
+#   "open" and requests fail fast with 503 + Retry-After. After a cool-down
+#   one probe request is let through ("half_open"); success closes it.
+# ============================================================================
+
+T = TypeVar("T")
+
+
+class UpstreamError(Exception):
+    """Base class for failures talking to a model"""
+    status_code = 502
+    retryable = False
+
+    def __init__(self, model: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"{model}: {message}")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class UpstreamTimeout(UpstreamError):
+    status_code = 504
+    retryable = True
+
+
+class UpstreamRateLimited(UpstreamError):
+    status_code = 429
+    retryable = True
+
+
+class UpstreamUnavailable(UpstreamError):
+    status_code = 503
+    retryable = True
+
+
+class UpstreamOverloaded(UpstreamError):
+    """Shed locally by the model's concurrency limiter - the model was not called"""
+    status_code = 503
+
+
+class UpstreamBadRequest(UpstreamError):
+    """The request itself was rejected (e.g. prompt too long) - don't retry"""
+    status_code = 400
+
+
+class CircuitOpenError(UpstreamError):
+    """Model is marked unhealthy; failing fast without calling it"""
+    status_code = 503
+
+
+def _retry_after_header(error: Exception) -> Optional[float]:
+    headers = getattr(error, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("Retry-After")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_aiohttp_error(error: Exception) -> bool:
+    # aiohttp is only imported by the HTTP client on first use; if it has
+    # not been loaded, the error cannot be one of its exceptions
+    aiohttp = sys.modules.get("aiohttp")
+    return aiohttp is not None and isinstance(error, aiohttp.ClientError)
+
+
+def classify_error(model: str, error: Exception) -> UpstreamError:
+    """Map a raw client exception to a typed UpstreamError"""
+    if isinstance(error, UpstreamError):
+        return error
+    if isinstance(error, TimeoutError):
+        return UpstreamTimeout(model, "request timed out")
+
+    # aiohttp errors carry .status, requests/huggingface_hub errors .response
+    status = getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+
+    if status == 429:
+        return UpstreamRateLimited(model, "rate limited by provider", _retry_after_header(error))
+    if status in (408, 504):
+        return UpstreamTimeout(model, f"upstream timeout ({status})")
+    if status is not None and status >= 500:
+        return UpstreamUnavailable(model, f"upstream error ({status})", _retry_after_header(error))
+    if status in (400, 413, 422):
+        return UpstreamBadRequest(model, f"request rejected ({status}): {error}")
+    if status is not None:
+        return UpstreamError(model, f"upstream refused request ({status})")
+    if isinstance(error, ConnectionError) or _is_aiohttp_error(error):
+        return UpstreamUnavailable(model, f"connection failed: {error}")
+    return UpstreamError(model, str(error) or type(error).__name__)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, model: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go upstream now"""
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        raise CircuitOpenError(
+            self.model,
+            "model temporarily unavailable (circuit open)",
+            retry_after=self.retry_after()
+        )
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_cancelled(self):
+        """A cancelled probe must not keep the breaker half-open forever"""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                print(f" Circuit opened for {self.model}")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "retry_after_seconds": round(self.retry_after(), 1)
+        }
+
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff"""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Sleep before retry number `attempt` (0-based)"""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+async def call_with_resilience(fn: Callable[[], Awaitable[T]], model: str,
+                               breaker: CircuitBreaker, policy: RetryPolicy) -> T:
+    """Run fn() through the breaker, retrying retryable failures"""
+    for attempt in range(policy.attempts):
+        breaker.before_call()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            breaker.record_cancelled()
+            raise
+        except UpstreamOverloaded:
+            # Local load shedding says nothing about the model's health
+            breaker.record_cancelled()
+            raise
+        except Exception as e:
+            error = classify_error(model, e)
+            if error.retryable:
+                breaker.record_failure()
+            else:
+                # The model answered; the request was the problem
+                breaker.record_success()
+            if not error.retryable or attempt == policy.attempts - 1:
+                raise error from e
+            await asyncio.sleep(policy.delay(attempt, error.retry_after))
+        else:
+            breaker.record_success()
+            return result
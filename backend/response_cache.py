@@ -0,0 +1,124 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import sys
+import time
+
+# ============================================================================
+# EXACT-MATCH RESPONSE CACHE
+# ============================================================================
+# Identical prompts (same model, messages and sampling parameters) are
+# answered from memory instead of paying for another upstream call.
+#   - Entries are kept in LRU order (OrderedDict, O(1) get/set/evict)
+#   - Each entry expires after ttl_seconds
+#   - Size is bounded by entry count AND approximate memory use
+# Only successful answers are stored - never error messages.
+# ============================================================================
+
+
+def normalize_messages(messages: List[Dict[str, str]]) -> List[Tuple[str, str]]:
+    """Normalize messages so whitespace-only differences share a cache entry"""
+    return [
+        (message["role"], " ".join(message["content"].split()))
+        for message in messages
+    ]
+
+
+def make_cache_key(model_id: str, messages: List[Dict[str, str]],
+                   max_tokens: int, temperature: float) -> str:
+    """Build a fixed-size cache key from everything that affects the answer"""
+    payload = json.dumps(
+        [model_id, normalize_messages(messages), max_tokens, temperature],
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Bounded LRU + TTL cache of LLM answers"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        # key -> (expires_at, answer, size_bytes)
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return cached answer or None (counts as hit/miss)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, answer, size = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return answer
+
+    def set(self, key: str, answer: str):
+        """Store answer, evicting least recently used entries if over budget"""
+        if self.max_entries <= 0:
+            return
+
+        size = self._entry_size(key, answer)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, answer, size)
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop all entries (stats are kept)"""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        """Hit-rate and memory statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "memory_bytes": self._bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    @staticmethod
+    def _entry_size(key: str, answer: str) -> int:
+        # Key + value string objects plus the tuple holding them
+        return sys.getsizeof(key) + sys.getsizeof(answer) + 64
@@ -0,0 +1,212 @@
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Sequence
+import asyncio
+import heapq
+import itertools
+import math
+import time
+
+from latency import LatencyHistogram
+
+# ============================================================================
+# ADMISSION CONTROL + FAIR-QUEUEING SCHEDULER
+# ============================================================================
+# Sits between the API handlers and LLMService:
+#   - At most max_concurrent LLM requests run at once; the rest wait in a
+#     bounded queue. A full queue rejects immediately (HTTP 429) instead of
+#     letting latency grow without bound.
+#   - Lanes are strict priorities (e.g. "admin" before "default" before
+#     "batch").
+#   - Inside a lane, users are served by start-time fair queueing: each
+#     request gets a virtual start tag max(lane_clock, user's last finish),
+#     so a user with 100 queued requests cannot starve a user with 1.
+#     A user's weight scales their share.
+# ============================================================================
+
+
+class AdmissionError(Exception):
+    """Request was not admitted to the scheduler"""
+    status_code = 429
+
+    def __init__(self, message: str, queue_depth: int, retry_after: float):
+        super().__init__(message)
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+
+
+class QueueFullError(AdmissionError):
+    status_code = 429
+
+
+class QueueTimeoutError(AdmissionError):
+    status_code = 503
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "alice=2,bob=0.5" into {"alice": 2.0, "bob": 0.5}"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        username, _, weight = item.partition("=")
+        weights[username.strip()] = float(weight)
+    return weights
+
+
+class _Waiter:
+    __slots__ = ("future", "lane", "username", "enqueued_at", "cancelled")
+
+    def __init__(self, future: asyncio.Future, lane: str, username: str):
+        self.future = future
+        self.lane = lane
+        self.username = username
+        self.enqueued_at = time.perf_counter()
+        self.cancelled = False
+
+
+class FairScheduler:
+    """Bounded queue with priority lanes and per-user weighted fair queueing"""
+
+    def __init__(self, max_concurrent: int = 128, max_queue: int = 512,
+                 max_queue_per_user: int = 64, max_wait: float = 30,
+                 lanes: Sequence[str] = ("admin", "default", "batch"),
+                 weights: Optional[Dict[str, float]] = None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait = max_wait
+        self.lanes = list(lanes)
+        self.weights = weights or {}
+
+        self.running = 0
+        self._queues: Dict[str, List] = {lane: [] for lane in self.lanes}
+        self._clock: Dict[str, float] = {lane: 0.0 for lane in self.lanes}
+        self._finish: Dict[str, Dict[str, float]] = {lane: {} for lane in self.lanes}
+        self._queued_per_user: Dict[str, int] = {}
+        self._depth = 0
+        self._seq = itertools.count()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait = {lane: LatencyHistogram() for lane in self.lanes}
+
+    @property
+    def queue_depth(self) -> int:
+        return self._depth
+
+    async def acquire(self, username: str, lane: str = "default") -> float:
+        """Wait for a slot; returns seconds spent queued"""
+        if lane not in self._queues:
+            lane = "default" if "default" in self._queues else self.lanes[-1]
+
+        # Fast path: free slot and nobody waiting
+        if self.running < self.max_concurrent and self._depth == 0:
+            self.running += 1
+            self.admitted += 1
+            self.queue_wait[lane].record(0.0)
+            return 0.0
+
+        if self._depth >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError("Server busy, queue is full", self._depth, self._retry_after())
+        if self._queued_per_user.get(username, 0) >= self.max_queue_per_user:
+            self.rejected += 1
+            raise QueueFullError("Too many queued requests for this user", self._depth, self._retry_after())
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), lane, username)
+        weight = self.weights.get(username, 1.0)
+        finish = self._finish[lane]
+        start = max(self._clock[lane], finish.get(username, 0.0))
+        finish[username] = start + 1.0 / weight
+        heapq.heappush(self._queues[lane], (start, next(self._seq), waiter))
+        self._depth += 1
+        self._queued_per_user[username] = self._queued_per_user.get(username, 0) + 1
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted just as we gave up - hand it back
+                self.release()
+            else:
+                waiter.cancelled = True
+                waiter.future.cancel()
+                self._dequeued(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise QueueTimeoutError("Timed out waiting in queue", self._depth, self._retry_after()) from e
+            raise
+
+        waited = time.perf_counter() - waiter.enqueued_at
+        self.queue_wait[lane].record(waited)
+        return waited
+
+    def release(self):
+        """Free a slot and hand it to the next waiter, if any"""
+        self.running -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, username: str, lane: str = "default"):
+        await self.acquire(username, lane)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": self._depth,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "lanes": {
+                lane: {
+                    "queued": sum(1 for _, _, w in self._queues[lane] if not w.cancelled),
+                    "wait": self.queue_wait[lane].snapshot()
+                }
+                for lane in self.lanes
+            }
+        }
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent and self._depth > 0:
+            waiter = self._pop_next()
+            if waiter is None:
+                return
+            self._dequeued(waiter)
+            self.running += 1
+            self.admitted += 1
+            waiter.future.set_result(None)
+
+    def _pop_next(self) -> Optional[_Waiter]:
+        # Strict priority across lanes, smallest virtual start tag inside a lane
+        for lane in self.lanes:
+            queue = self._queues[lane]
+            while queue:
+                start, _, waiter = heapq.heappop(queue)
+                if waiter.cancelled:
+                    continue
+                self._clock[lane] = start
+                if not queue:
+                    # Lane went idle: forget old finish tags so memory stays bounded
+                    self._finish[lane] = {
+                        user: tag for user, tag in self._finish[lane].items() if tag > start
+                    }
+                return waiter
+        return None
+
+    def _dequeued(self, waiter: _Waiter):
+        self._depth -= 1
+        remaining = self._queued_per_user[waiter.username] - 1
+        if remaining:
+            self._queued_per_user[waiter.username] = remaining
+        else:
+            del self._queued_per_user[waiter.username]
+
+    def _retry_after(self) -> float:
+        """Hint for clients: typical recent queue wait, at least one second"""
+        waits = [h.percentile(50) for h in self.queue_wait.values() if h.count]
+        return max(1.0, math.ceil(max(waits))) if waits else 1.0
@@ -0,0 +1,184 @@
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import threading
+import time
+
+# ============================================================================
+# SESSION STORE
+# ============================================================================
+# Sessions are indexed twice so expiry never needs a full scan:
+#   - An OrderedDict in last-activity order (touch = move_to_end, O(1)).
+#     Idle sessions are always at the front, and when the store is full
+#     the least recently active session is the one that goes.
+#   - A timing wheel of absolute expiry times (created + max_age): one set
+#     of tokens per `resolution`-second slot. Logout, idle removal and
+#     eviction take the token out of its slot in O(1), so the index never
+#     holds stale entries.
+# sweep() works from the front of both, so removing k expired sessions
+# costs O(k) no matter how many sessions are alive, and a `limit` keeps
+# each call short.
+#
+# Sync FastAPI dependencies run on the threadpool while the sweeper runs on
+# the event loop, so every public method holds the store's lock.
+# ============================================================================
+
+
+class Session:
+    __slots__ = ("username", "created_at", "last_activity", "expires_at", "model")
+
+    def __init__(self, username: str, now: float, expires_at: float):
+        self.username = username
+        self.created_at = now
+        self.last_activity = now
+        self.expires_at = expires_at
+        self.model: Optional[str] = None
+
+
+class SessionStore:
+    """Token -> Session with absolute expiry, idle timeout and a size cap"""
+
+    def __init__(self, max_age: float = 24 * 3600, idle_timeout: float = 2 * 3600,
+                 max_sessions: int = 100_000, resolution: float = 60,
+                 clock: Callable[[], float] = time.time):
+        self.max_age = max_age
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.resolution = resolution
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        # slot number -> tokens expiring within that slot
+        self._wheel: Dict[int, Set[str]] = {}
+        self._next_slot: Optional[int] = None
+        self.expired = 0
+        self.idled_out = 0
+        self.evicted = 0
+
+    def add(self, token: str, username: str) -> Session:
+        """Register a new session, evicting the least recently active one if full"""
+        with self._lock:
+            now = self.clock()
+            session = Session(username, now, now + self.max_age)
+            self._sessions[token] = session
+            slot = self._slot(session.expires_at)
+            self._wheel.setdefault(slot, set()).add(token)
+            if self._next_slot is None or slot < self._next_slot:
+                self._next_slot = slot
+            while len(self._sessions) > self.max_sessions:
+                self._unindex(*self._sessions.popitem(last=False))
+                self.evicted += 1
+            return session
+
+    def get(self, token: str) -> Optional[Session]:
+        """Live session for token, or None (expired sessions are removed)"""
+        with self._lock:
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            now = self.clock()
+            if now >= session.expires_at:
+                self.remove(token)
+                self.expired += 1
+                return None
+            if now - session.last_activity >= self.idle_timeout:
+                self.remove(token)
+                self.idled_out += 1
+                return None
+            return session
+
+    def touch(self, token: str) -> Optional[Session]:
+        """get() and mark the session active now"""
+        with self._lock:
+            session = self.get(token)
+            if session is not None:
+                session.last_activity = self.clock()
+                self._sessions.move_to_end(token)
+            return session
+
+    def remove(self, token: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.pop(token, None)
+            if session is not None:
+                self._unindex(token, session)
+            return session
+
+    def sweep(self, limit: Optional[int] = None) -> int:
+        """Remove up to `limit` expired sessions; returns how many went"""
+        with self._lock:
+            now = self.clock()
+            removed = 0
+            sessions = self._sessions
+
+            # Idle sessions sit at the front of the activity order
+            while sessions and (limit is None or removed < limit):
+                token, session = next(iter(sessions.items()))
+                if now - session.last_activity < self.idle_timeout:
+                    break
+                self.remove(token)
+                self.idled_out += 1
+                removed += 1
+
+            # Absolute expiry: empty every wheel slot that has fully passed
+            wheel = self._wheel
+            last_full_slot = self._slot(now) - 1
+            while (self._next_slot is not None and self._next_slot <= last_full_slot
+                   and (limit is None or removed < limit)):
+                tokens = wheel.get(self._next_slot)
+                while tokens and (limit is None or removed < limit):
+                    del sessions[tokens.pop()]
+                    self.expired += 1
+                    removed += 1
+                if tokens:
+                    break
+                wheel.pop(self._next_slot, None)
+                self._next_slot = self._next_slot + 1 if wheel else None
+            return removed
+
+    def remove_older_than(self, age: float) -> int:
+        """Remove sessions created more than `age` seconds ago (a full scan)"""
+        with self._lock:
+            cutoff = self.clock() - age
+            old = [token for token, session in self._sessions.items() if session.created_at < cutoff]
+            for token in old:
+                self.remove(token)
+            self.expired += len(old)
+            return len(old)
+
+    def page(self, offset: int = 0, limit: int = 50) -> List[Tuple[str, Session]]:
+        """Sessions in most-recently-active-first order"""
+        with self._lock:
+            return list(islice(reversed(self._sessions.items()), offset, offset + limit))
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "expiry_slots": len(self._wheel),
+            "expired": self.expired,
+            "idled_out": self.idled_out,
+            "evicted": self.evicted
+        }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, token: str) -> bool:
+        return self.get(token) is not None
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._wheel.clear()
+            self._next_slot = None
+
+    def _slot(self, timestamp: float) -> int:
+        return int(timestamp // self.resolution)
+
+    def _unindex(self, token: str, session: Session):
+        slot = self._slot(session.expires_at)
+        tokens = self._wheel.get(slot)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._wheel[slot]
@@ -0,0 +1,200 @@
+from typing import List, NamedTuple, Optional
+import base64
+import hashlib
+import hmac
+import math
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+# ============================================================================
+# STATELESS SIGNED TOKENS (AUTH_TOKEN_MODE=signed)
+# ============================================================================
+# A token carries its own claims and an HMAC-SHA256 signature:
+#     base64url("<issued>:<expires>:<token id>:<username>") . base64url(mac)
+# Any worker or replica holding AUTH_SECRET can verify it without shared
+# session state, and tokens survive restarts.
+#
+# Logout revokes the token id:
+#   - Revocations are stored in a SQLite file shared by all workers on the
+#     host (the exact list), and pruned once the token would have expired
+#   - Each worker keeps a Bloom filter of revoked ids; a "no" answer (the
+#     common case) needs no I/O, a "maybe" is confirmed against SQLite
+#   - Workers pick up other workers' revocations within refresh_interval
+# ============================================================================
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class Claims(NamedTuple):
+    username: str
+    issued_at: float
+    expires_at: float
+    token_id: str
+
+
+class TokenSigner:
+    """Issue and verify HMAC-signed tokens; the first secret signs, all verify"""
+
+    def __init__(self, secrets_: List[str], max_age: float = 24 * 3600):
+        if not secrets_ or not all(secrets_):
+            raise ValueError("AUTH_SECRET is required for signed tokens")
+        self._keys = [secret.encode("utf-8") for secret in secrets_]
+        self.max_age = max_age
+
+    def issue(self, username: str, now: Optional[float] = None) -> str:
+        now = time.time() if now is None else now
+        payload = f"{int(now)}:{int(now + self.max_age)}:{secrets.token_hex(8)}:{username}".encode("utf-8")
+        return f"{_b64encode(payload)}.{_b64encode(self._sign(self._keys[0], payload))}"
+
+    def verify(self, token: str, now: Optional[float] = None) -> Optional[Claims]:
+        """Claims if the signature is valid and the token has not expired"""
+        body, _, signature = token.partition(".")
+        try:
+            payload = _b64decode(body)
+            mac = _b64decode(signature)
+        except ValueError:
+            return None
+        if not any(hmac.compare_digest(mac, self._sign(key, payload)) for key in self._keys):
+            return None
+
+        issued, expires, token_id, username = payload.decode("utf-8").split(":", 3)
+        if (time.time() if now is None else now) >= int(expires):
+            return None
+        return Claims(username, float(issued), float(expires), token_id)
+
+    @staticmethod
+    def _sign(key: bytes, payload: bytes) -> bytes:
+        return hmac.new(key, payload, hashlib.sha256).digest()[:16]
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.01):
+        ln2 = math.log(2)
+        bits = max(64, int(-capacity * math.log(error_rate) / (ln2 * ln2)))
+        self.size = bits
+        self.hashes = max(1, round(bits / capacity * ln2))
+        self._bits = bytearray((bits + 7) // 8)
+        self.count = 0
+
+    def add(self, item: str):
+        for index in self._indexes(item):
+            self._bits[index >> 3] |= 1 << (index & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[index >> 3] & (1 << (index & 7)) for index in self._indexes(item))
+
+    def _indexes(self, item: str):
+        # Double hashing: k indexes from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+
+class RevocationList:
+    """Revoked token ids: SQLite (exact, shared) + per-worker Bloom filter"""
+
+    def __init__(self, path: str, capacity: int = 100_000, refresh_interval: float = 1.0):
+        self.path = path
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # AUTOINCREMENT: ids never go backwards, so "id > last seen" finds
+        # every new row even after pruning
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS revoked ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "token_id TEXT NOT NULL UNIQUE, "
+            "expires_at REAL NOT NULL)"
+        )
+        self._bloom = BloomFilter(capacity)
+        self._last_id = 0
+        self._next_refresh = 0.0
+        self.lookups = 0
+        self.exact_checks = 0
+        self._reload()
+
+    def revoke(self, token_id: str, expires_at: float):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO revoked (token_id, expires_at) VALUES (?, ?)",
+                (token_id, expires_at)
+            )
+            self._bloom.add(token_id)
+
+    def is_revoked(self, token_id: str) -> bool:
+        self.lookups += 1
+        if time.monotonic() >= self._next_refresh:
+            with self._lock:
+                self._refresh()
+        if token_id not in self._bloom:
+            return False
+        # Possible false positive: ask the exact list
+        self.exact_checks += 1
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM revoked WHERE token_id = ?", (token_id,)).fetchone()
+        return row is not None
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop revocations of tokens that have expired anyway, and rebuild the filter"""
+        now = time.time() if now is None else now
+        with self._lock:
+            removed = self._db.execute("DELETE FROM revoked WHERE expires_at <= ?", (now,)).rowcount
+            self._reload()
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            revoked = self._db.execute("SELECT COUNT(*) FROM revoked").fetchone()[0]
+        return {
+            "revoked": revoked,
+            "filter_bytes": len(self._bloom._bits),
+            "lookups": self.lookups,
+            "exact_checks": self.exact_checks
+        }
+
+    def close(self):
+        self._db.close()
+
+    def _refresh(self):
+        # New rows written by other workers since the last refresh
+        rows = self._db.execute(
+            "SELECT id, token_id FROM revoked WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        for row_id, token_id in rows:
+            self._bloom.add(token_id)
+            self._last_id = row_id
+        if self._bloom.count > self.capacity:
+            # Filter is past its design size; grow it
+            self.capacity *= 2
+            self._reload()
+        self._next_refresh = time.monotonic() + self.refresh_interval
+
+    def _reload(self):
+        self._bloom = BloomFilter(max(self.capacity, 1024))
+        self._last_id = 0
+        self._next_refresh = 0.0
+        self._refresh()
+
+
+def default_revocation_path() -> str:
+    return os.getenv(
+        "AUTH_REVOCATION_DB",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "revoked_tokens.db")
+    )
@@ -0,0 +1,128 @@
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+import asyncio
+
+# ============================================================================
+# SINGLE-FLIGHT REQUEST COALESCING
+# ============================================================================
+# Concurrent identical requests share ONE upstream call:
+#   - The first caller for a key starts the work in a background task
+#   - Later callers with the same key wait for that task instead
+#   - Every waiter gets the same result (or the same exception)
+# Streams work the same way: chunks are buffered while the upstream stream
+# is running, so a caller that joins late replays what it missed and then
+# follows live. The upstream work is cancelled only when every waiter has
+# gone away.
+# ============================================================================
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamCall:
+    __slots__ = ("task", "chunks", "done", "error", "changed", "subscribers")
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.chunks: list = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.subscribers = 0
+
+    def notify(self):
+        # Wake current subscribers; later waits use a fresh event
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls (and streams) that share a key"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _StreamCall] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.stream_leaders = 0
+        self.stream_coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() once for all concurrent callers with the same key"""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    async def stream(self, key: str, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Iterate fn() once for all concurrent subscribers with the same key"""
+        call = self._streams.get(key)
+        if call is None:
+            call = _StreamCall()
+            call.task = asyncio.ensure_future(self._pump(call, fn))
+            self._streams[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._streams, key, call))
+            self.stream_leaders += 1
+        else:
+            self.stream_coalesced += 1
+
+        call.subscribers += 1
+        try:
+            position = 0
+            while True:
+                while position < len(call.chunks):
+                    yield call.chunks[position]
+                    position += 1
+                if call.done:
+                    if call.error is not None:
+                        raise call.error
+                    return
+                await call.changed.wait()
+        finally:
+            call.subscribers -= 1
+            if call.subscribers == 0 and not call.task.done():
+                call.task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "stream_leaders": self.stream_leaders,
+            "stream_coalesced": self.stream_coalesced,
+            "in_flight": len(self._calls) + len(self._streams)
+        }
+
+    @staticmethod
+    async def _pump(call: _StreamCall, fn: Callable[[], AsyncIterator[T]]):
+        try:
+            async for chunk in fn():
+                call.chunks.append(chunk)
+                call.notify()
+        except Exception as e:
+            call.error = e
+        finally:
+            call.done = True
+            call.notify()
+
+    @staticmethod
+    def _forget(table: dict, key: str, call):
+        if table.get(key) is call:
+            del table[key]
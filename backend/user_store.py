@@ -0,0 +1,88 @@
+from typing import Dict, Optional
+import json
+import os
+import threading
+
+# ============================================================================
+# USER STORE
+# ============================================================================
+# Usernames and precomputed bcrypt hashes live in a JSON file
+# (AUTH_USERS_FILE, default backend/users.json), so nothing is hashed at
+# startup. The file is read on first use, not at import.
+#
+# To add a user:
+#     python backend/user_store.py alice
+# ============================================================================
+
+
+def default_users_path() -> str:
+    return os.getenv(
+        "AUTH_USERS_FILE",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "users.json")
+    )
+
+
+class UserStore:
+    """username -> bcrypt hash, loaded from a JSON file on first use"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._users: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._users is not None
+
+    def get(self, username: str, default: Optional[str] = None) -> Optional[str]:
+        return self._load().get(username, default)
+
+    def __getitem__(self, username: str) -> str:
+        return self._load()[username]
+
+    def __setitem__(self, username: str, hashed: str):
+        """Set a user's hash and write the file (used for re-hashing)"""
+        users = self._load()
+        with self._lock:
+            users[username] = hashed
+            self._save(users)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._load()
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def _load(self) -> Dict[str, str]:
+        users = self._users
+        if users is None:
+            # Password checks run on several threads; load once
+            with self._lock:
+                if self._users is None:
+                    with open(self.path, encoding="utf-8") as f:
+                        self._users = json.load(f)
+                users = self._users
+        return users
+
+    def _save(self, users: Dict[str, str]):
+        # Write to a temporary file and rename, so readers never see half a file
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(users, f, indent=2)
+            f.write("\n")
+        os.replace(tmp, self.path)
+
+
+if __name__ == "__main__":
+    import getpass
+    import sys
+
+    import bcrypt
+
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python backend/user_store.py <username>")
+    password = getpass.getpass(f"Password for {sys.argv[1]}: ")
+    rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+    UserStore(default_users_path())[sys.argv[1]] = hashed
+    print(f"Saved {sys.argv[1]} to {default_users_path()}")
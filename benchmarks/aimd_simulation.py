@@ -0,0 +1,158 @@
+"""
+Goodput vs offered load against a stub model backend
+
+The stub behaves like an overloaded inference endpoint: it serves `capacity`
+requests at full speed, slows down faster than linearly beyond that (so its
+total throughput drops, as with KV-cache thrashing) and starts answering 503
+once it is far past capacity. Requests are offered open-loop
+(Poisson arrivals) at increasing multiples of its capacity and each mode is
+measured for goodput (successful answers within the client deadline per
+second) and p95 latency:
+
+    unlimited  every request goes straight to the backend
+    fixed      a fixed concurrency limit (LLM_ADAPTIVE_CONCURRENCY=false)
+    adaptive   AdaptiveLimiter, as used by LLMService
+
+Usage:
+    python benchmarks/aimd_simulation.py
+    python benchmarks/aimd_simulation.py --loads 0.5 1 2 4 8 --duration 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from concurrency import AdaptiveLimiter  # noqa: E402
+from resilience import UpstreamOverloaded  # noqa: E402
+
+
+class StubBackend:
+    """Latency grows super-linearly with concurrency past `capacity`; errors far past it"""
+
+    def __init__(self, capacity: int, base_latency: float, error_factor: float = 4,
+                 exponent: float = 1.5):
+        self.capacity = capacity
+        self.base_latency = base_latency
+        self.error_factor = error_factor
+        self.exponent = exponent
+        self.active = 0
+
+    async def call(self):
+        self.active += 1
+        try:
+            if self.active > self.capacity * self.error_factor:
+                await asyncio.sleep(self.base_latency / 5)
+                raise ConnectionError("503 model overloaded")
+            overload = max(1.0, self.active / self.capacity)
+            await asyncio.sleep(self.base_latency * overload ** self.exponent)
+        finally:
+            self.active -= 1
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_level(mode: str, load: float, args) -> dict:
+    backend = StubBackend(args.capacity, args.base_latency)
+    limiter = None
+    if mode != "unlimited":
+        limiter = AdaptiveLimiter(
+            "stub", initial_limit=8, max_limit=args.max_limit,
+            queue_timeout=args.deadline / 2, adaptive=(mode == "adaptive")
+        )
+
+    rate = load * args.capacity / args.base_latency
+    rng = random.Random(1)
+    latencies, failures, shed = [], 0, 0
+
+    async def request():
+        nonlocal failures, shed
+        start = time.perf_counter()
+        try:
+            if limiter is None:
+                await asyncio.wait_for(backend.call(), args.deadline)
+            else:
+                await limiter.acquire()
+                call_start = time.perf_counter()
+                latency, dropped = None, False
+                try:
+                    await asyncio.wait_for(backend.call(), args.deadline)
+                    latency = time.perf_counter() - call_start
+                except (ConnectionError, asyncio.TimeoutError):
+                    dropped = True
+                    raise
+                finally:
+                    limiter.release(latency, dropped=dropped)
+        except UpstreamOverloaded:
+            shed += 1
+            return
+        except (ConnectionError, asyncio.TimeoutError):
+            failures += 1
+            return
+        elapsed = time.perf_counter() - start
+        if elapsed <= args.deadline:
+            latencies.append(elapsed)
+        else:
+            failures += 1
+
+    # Open loop: arrivals follow a fixed Poisson schedule, however slow the
+    # backend gets
+    tasks = []
+    start = time.perf_counter()
+    next_arrival = 0.0
+    while next_arrival < args.duration:
+        now = time.perf_counter() - start
+        while next_arrival <= now:
+            tasks.append(asyncio.ensure_future(request()))
+            next_arrival += rng.expovariate(rate)
+        await asyncio.sleep(max(0.0, next_arrival - now))
+    await asyncio.gather(*tasks)
+
+    return {
+        "goodput": len(latencies) / args.duration,
+        "p95": percentile(latencies, 95),
+        "failed": failures,
+        "shed": shed,
+        "limit": int(limiter.limit) if limiter else None,
+        "offered": len(tasks)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loads", type=float, nargs="+", default=[0.5, 1, 2, 4, 8],
+                        help="offered load as a multiple of backend capacity")
+    parser.add_argument("--modes", nargs="+", default=["unlimited", "fixed", "adaptive"])
+    parser.add_argument("--capacity", type=int, default=16, help="requests the stub serves at full speed")
+    parser.add_argument("--base-latency", type=float, default=0.05, help="stub latency when not overloaded")
+    parser.add_argument("--max-limit", type=int, default=64, help="LLM_MAX_CONCURRENCY")
+    parser.add_argument("--deadline", type=float, default=1.0, help="client timeout in seconds")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per load level")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(" ADAPTIVE CONCURRENCY SIMULATION")
+    print("=" * 60)
+    capacity_rps = args.capacity / args.base_latency
+    print(f"stub capacity ~{capacity_rps:.0f} req/s, deadline {args.deadline}s")
+    for mode in args.modes:
+        for load in args.loads:
+            r = asyncio.run(run_level(mode, load, args))
+            limit = f"limit {r['limit']:>3}" if r["limit"] is not None else "limit   -"
+            print(
+                f"{mode:>9} | load {load:4.1f}x | offered {r['offered'] / args.duration:6.0f}/s | "
+                f"goodput {r['goodput']:6.0f}/s ({r['goodput'] / capacity_rps:4.0%}) | "
+                f"p95 {r['p95'] * 1000:6.0f}ms | failed {r['failed']:>6} | shed {r['shed']:>6} | {limit}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Context packing cost and prompt-size reduction on long conversations
+
+Synthetic conversations of increasing length are packed for a model with
+the default budget (CONTEXT_MAX_PROMPT_TOKENS=4096). For each length:
+
+    full      tokens if the whole history were sent
+    packed    tokens actually sent (recent turns + rolling summary)
+    first     time of the first pack (summarizes everything out of window)
+    per turn  steady-state cost: append a user/assistant pair, then pack
+
+Usage:
+    python benchmarks/context_packer_bench.py
+    python benchmarks/context_packer_bench.py --turns 10 100 1000 10000 --max-tokens 512
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from context_packer import MESSAGE_OVERHEAD, ContextPacker, estimate_tokens  # noqa: E402
+from conversations import InMemoryConversationStore, Turn  # noqa: E402
+
+WORDS = ("model latency token cache request answer python stream budget summary "
+         "history server client question context window prompt user assistant").split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def turn(rng: random.Random, index: int) -> Turn:
+    role = "user" if index % 2 == 0 else "assistant"
+    length = rng.randint(1, 2) if role == "user" else rng.randint(3, 8)
+    return Turn(role, " ".join(sentence(rng, rng.randint(6, 18)) for _ in range(length)), float(index))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--steps", type=int, default=200, help="turn pairs appended for the per-turn timing")
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    print("=" * 60)
+    print(" CONTEXT PACKING")
+    print("=" * 60)
+    for count in args.turns:
+        store = InMemoryConversationStore(max_turns=count + 2 * args.steps)
+        conversation = store.create("bench", system_prompt="Keep your answer short.")
+        store.append("bench", conversation.id, [turn(rng, i) for i in range(count)])
+        packer = ContextPacker({"mistral": 32768})
+        prompt = sentence(rng, 12)
+
+        full = (estimate_tokens(conversation.system_prompt) + estimate_tokens(prompt)
+                + sum(t.tokens + MESSAGE_OVERHEAD for t in conversation.turns) + 2 * MESSAGE_OVERHEAD)
+        start = time.perf_counter()
+        packed = packer.pack(conversation, prompt, "mistral", args.max_tokens)
+        first = time.perf_counter() - start
+
+        elapsed = 0.0
+        for i in range(args.steps):
+            store.append("bench", conversation.id, [turn(rng, count + 2 * i), turn(rng, count + 2 * i + 1)])
+            start = time.perf_counter()
+            packer.pack(conversation, prompt, "mistral", args.max_tokens)
+            elapsed += time.perf_counter() - start
+
+        print(
+            f"{count:>6} turns | full {full:>8} tokens | packed {packed.prompt_tokens:>5} tokens "
+            f"({packed.prompt_tokens / full:6.1%}) | {packed.turns_included:>3} verbatim, "
+            f"{packed.turns_summarized:>3} summarized | first {first * 1000:7.2f}ms | "
+            f"per turn {elapsed / args.steps * 1e6:6.0f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Conversation log: appends, "last N turns" and random page reads
+
+For conversations of increasing length, compares the append-only log with
+its mmap-ed offset index against loading the whole transcript into a list
+(what keeping history in a plain JSON lines file, or in
+st.session_state.messages, amounts to):
+
+    append    pairs of turns per second (user + assistant, one call each)
+    last 20   latency of reading the 20 most recent turns
+    page      latency of reading a random page of 50 turns
+
+Usage:
+    python benchmarks/conversation_log_bench.py
+    python benchmarks/conversation_log_bench.py --turns 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from conversation_log import LogConversationStore  # noqa: E402
+from conversations import Turn  # noqa: E402
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def load_all(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [Turn(**json.loads(line)) for line in f]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(1)
+    text = "A typical chat message with a sentence or two of content. " * 3
+
+    print("=" * 60)
+    print(" CONVERSATION LOG")
+    print("=" * 60)
+    for count in args.turns:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = LogConversationStore(tmp, max_turns=count)
+            conversation = store.create("bench")
+            start = time.perf_counter()
+            for i in range(0, count, 2):
+                store.append("bench", conversation.id, [Turn("user", text, i), Turn("assistant", text, i + 1)])
+            append_rate = count / 2 / (time.perf_counter() - start)
+
+            turns = conversation.turns
+            last = timed(lambda: turns[-20:], args.reads)
+            offsets = iter([rng.randrange(0, count - 50) for _ in range(args.reads)])
+
+            def read_page():
+                offset = next(offsets)
+                return turns[offset:offset + 50]
+            page = timed(read_page, args.reads)
+
+            path = f"{store._path('bench', conversation.id)}.log"
+            full_repeat = max(1, args.reads // max(1, count // 1000))
+            full = timed(lambda: load_all(path)[-20:], full_repeat)
+
+            print(
+                f"{count:>7} turns | append {append_rate:7.0f} pairs/s | "
+                f"last 20 {last * 1e6:7.0f}us | page of 50 {page * 1e6:7.0f}us | "
+                f"load everything {full * 1000:8.1f}ms"
+            )
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
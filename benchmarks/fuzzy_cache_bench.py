@@ -0,0 +1,93 @@
+"""
+Fuzzy cache lookup latency vs index size
+
+Usage:
+    python benchmarks/fuzzy_cache_bench.py
+    python benchmarks/fuzzy_cache_bench.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from fuzzy_cache import FuzzyCache  # noqa: E402
+
+COMMON = "what is how does why should tell me about give an example of explain the".split()
+SYLLABLES = "ka lo mi ne ru ta pe so vi da ze bo ly fu gr st ch on er an".split()
+
+
+def make_vocabulary(size: int, rng: random.Random):
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def make_prompt(rng: random.Random, vocabulary) -> str:
+    """A few common question words plus topic words from the vocabulary"""
+    words = [rng.choice(COMMON) for _ in range(rng.randint(2, 4))]
+    words += [rng.choice(vocabulary) for _ in range(rng.randint(2, 5))]
+    return " ".join(words) + "?"
+
+
+def perturb(prompt: str, rng: random.Random) -> str:
+    """Near-duplicate: different casing and punctuation"""
+    return prompt.upper().rstrip("?") + rng.choice(["!", ".", " ?", ""])
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(size: int, lookups: int, vocabulary_size: int, seed: int = 7):
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    cache = FuzzyCache(max_entries=size, max_bytes=1 << 40)
+    # Look up a uniform sample of the stored prompts
+    sample_every = max(1, size // lookups)
+    prompts = []
+
+    start = time.perf_counter()
+    for i in range(size):
+        prompt = make_prompt(rng, vocabulary)
+        cache.set("mistral", prompt, f"answer {i}")
+        if i % sample_every == 0 and len(prompts) < lookups:
+            prompts.append(prompt)
+    build_seconds = time.perf_counter() - start
+
+    hit_times, miss_times = [], []
+    for prompt in prompts:
+        t = time.perf_counter()
+        cache.get("mistral", perturb(prompt, rng))
+        hit_times.append(time.perf_counter() - t)
+
+        t = time.perf_counter()
+        cache.get("mistral", "unrelated question about gardening and tomatoes " + str(rng.random()))
+        miss_times.append(time.perf_counter() - t)
+
+    stats = cache.stats()
+    print(
+        f"{size:>9,} entries | build {build_seconds:7.1f}s | "
+        f"lookup p50 {percentile(hit_times, 50) * 1e6:6.1f}us "
+        f"p99 {percentile(hit_times, 99) * 1e6:6.1f}us | "
+        f"miss p50 {percentile(miss_times, 50) * 1e6:6.1f}us "
+        f"p99 {percentile(miss_times, 99) * 1e6:6.1f}us | "
+        f"hit rate {stats['hits'] / len(prompts):.2f} | "
+        f"~{stats['memory_bytes'] / size:.0f} B/entry"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--lookups", type=int, default=1_000)
+    parser.add_argument("--vocabulary", type=int, default=5_000,
+                        help="distinct topic words (smaller = more bucket collisions)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(" FUZZY CACHE BENCHMARK")
+    print("=" * 60)
+    for size in args.sizes:
+        run(size, args.lookups, args.vocabulary)
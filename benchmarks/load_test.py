@@ -0,0 +1,325 @@
+"""
+End-to-end load test of the FastAPI backend against a stubbed upstream
+
+Starts the backend with LLM_PROVIDER=stub (simulated model latency, see
+backend/providers.py) and rate limits raised out of the way, then drives a
+weighted mix of /login, /models, /query and /switch-model:
+
+    closed   --concurrency clients, each sending its next request as soon as
+             the previous one returns (measures capacity)
+    open     Poisson arrivals at --rate requests/s regardless of how fast the
+             server answers; latency is measured from the scheduled arrival,
+             so queueing delay is not hidden (measures behaviour under load)
+
+Reports throughput, errors and p50/p95/p99 latency per endpoint and writes
+them as JSON (--output). --compare prints the change against an earlier
+JSON file and exits with status 1 when an endpoint's p95/p99 latency or
+throughput is worse than --threshold percent.
+
+STUB_* settings (e.g. STUB_TTFT_SECONDS, STUB_ERROR_RATE) are passed to the
+backend, so the simulated model can be tuned per run.
+
+Usage:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --mode open --rate 200 --duration 60
+    python benchmarks/load_test.py --mix query=60,models=20,switch-model=10,login=10 --output results.json
+    python benchmarks/load_test.py --output new.json --compare results.json --threshold 10
+    python benchmarks/load_test.py --url http://127.0.0.1:8000
+"""
+from collections import Counter
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import aiohttp
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND)
+
+from latency import LatencyHistogram  # noqa: E402
+
+ENDPOINTS = ("login", "models", "query", "switch-model")
+ACCOUNTS = [("demo", "demo123"), ("user", "password"), ("admin", "admin123")]
+MODELS = ["mistral", "zephyr", "llama"]
+TOPICS = ["Python", "machine learning", "databases", "HTTP caching", "unit tests", "async IO",
+          "neural networks", "Docker", "Git", "REST APIs", "type hints", "garbage collection"]
+
+
+def parse_mix(spec: str) -> dict:
+    """"query=60,models=20" -> {"query": 60.0, "models": 20.0}"""
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        endpoint, _, weight = item.partition("=")
+        if endpoint not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint in --mix: {endpoint} (choose from {', '.join(ENDPOINTS)})")
+        mix[endpoint] = float(weight)
+    return mix
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = LatencyHistogram(window=sys.maxsize)
+        self.statuses = Counter()
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.completed_in_window = 0
+
+    def record(self, status: str, seconds: float, in_window: bool):
+        self.statuses[status] += 1
+        if status.startswith("2"):
+            self.latency.record(seconds)
+            self.completed_in_window += in_window
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def summary(self, duration: float) -> dict:
+        requests = sum(self.statuses.values())
+        ok = self.latency.total
+        latency = self.latency.snapshot()
+        return {
+            "requests": requests,
+            "ok": ok,
+            "errors": requests - ok,
+            "throughput_per_second": round(self.completed_in_window / duration, 2),
+            "statuses": dict(sorted(self.statuses.items())),
+            "p50_ms": latency["p50_ms"],
+            "p95_ms": latency["p95_ms"],
+            "p99_ms": latency["p99_ms"],
+            "mean_ms": round(self.total_seconds / ok * 1000, 1) if ok else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1)
+        }
+
+
+class LoadTest:
+    def __init__(self, url: str, mix: dict, args):
+        self.url = url.rstrip("/")
+        self.endpoints = list(mix)
+        self.weights = list(mix.values())
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.prompts = [f"Explain {TOPICS[i % len(TOPICS)]} in one sentence (#{i})" for i in range(args.prompts)]
+        self.stats = {endpoint: EndpointStats() for endpoint in self.endpoints}
+        self.recording_from = 0.0
+        self.recording_until = 0.0
+        self.dropped = 0
+
+    async def login(self, session, client: dict) -> str:
+        username, password = client["account"]
+        async with session.post(f"{self.url}/login", json={"username": username, "password": password}) as response:
+            if response.status == 200:
+                client["token"] = (await response.json())["token"]
+            else:
+                await response.read()
+            return str(response.status)
+
+    async def call(self, session, endpoint: str, client: dict) -> str:
+        if endpoint == "login":
+            return await self.login(session, client)
+        headers = {"Authorization": f"Bearer {client['token']}"}
+        if endpoint == "models":
+            request = session.get(f"{self.url}/models", headers=headers)
+        elif endpoint == "query":
+            request = session.post(f"{self.url}/query", headers=headers, json={
+                "prompt": self.random.choice(self.prompts), "max_tokens": self.args.max_tokens
+            })
+        else:
+            request = session.post(f"{self.url}/switch-model", headers=headers,
+                                   json={"model_name": self.random.choice(MODELS)})
+        async with request as response:
+            await response.read()
+            return str(response.status)
+
+    async def timed(self, session, endpoint: str, client: dict, start: float):
+        """One request; latency counts from `start` (the scheduled send time)"""
+        try:
+            status = await self.call(session, endpoint, client)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        # Latency of every request sent in the window; throughput counts the
+        # ones that also finished in it
+        now = time.perf_counter()
+        if self.recording_from <= start < self.recording_until:
+            self.stats[endpoint].record(status, now - start, now <= self.recording_until)
+
+    def pick(self) -> str:
+        return self.random.choices(self.endpoints, self.weights)[0]
+
+    async def closed_loop(self, session, clients, end: float):
+        async def worker(client):
+            while time.perf_counter() < end:
+                await self.timed(session, self.pick(), client, time.perf_counter())
+        await asyncio.gather(*(worker(clients[i % len(clients)]) for i in range(self.args.concurrency)))
+
+    async def open_loop(self, session, clients, end: float):
+        in_flight = set()
+        scheduled = time.perf_counter()
+        index = 0
+        while scheduled < end:
+            scheduled += self.random.expovariate(self.args.rate)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= self.args.max_in_flight:
+                # The load generator itself would become the bottleneck
+                self.dropped += 1
+                continue
+            task = asyncio.ensure_future(self.timed(session, self.pick(), clients[index % len(clients)], scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            index += 1
+        if in_flight:
+            await asyncio.wait(in_flight)
+
+    async def run(self) -> dict:
+        args = self.args
+        connector = aiohttp.TCPConnector(limit=0)
+        timeout = aiohttp.ClientTimeout(total=args.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            clients = [{"account": ACCOUNTS[i % len(ACCOUNTS)], "token": None} for i in range(args.clients)]
+            statuses = await asyncio.gather(*(self.login(session, client) for client in clients))
+            if any(status != "200" for status in statuses):
+                raise SystemExit(f"initial logins failed: {Counter(statuses)}")
+
+            start = time.perf_counter()
+            self.recording_from = start + args.warmup
+            end = self.recording_until = self.recording_from + args.duration
+            if args.mode == "closed":
+                await self.closed_loop(session, clients, end)
+            else:
+                await self.open_loop(session, clients, end)
+        duration = args.duration
+
+        endpoints = {name: stats.summary(duration) for name, stats in self.stats.items()}
+        completed = sum(stats.completed_in_window for stats in self.stats.values())
+        return {
+            "config": {
+                "mode": args.mode, "concurrency": args.concurrency, "rate": args.rate,
+                "clients": args.clients, "duration": args.duration, "warmup": args.warmup,
+                "mix": dict(zip(self.endpoints, self.weights)), "max_tokens": args.max_tokens,
+                "prompts": args.prompts, "seed": args.seed,
+                "stub": {key: value for key, value in sorted(os.environ.items()) if key.startswith("STUB_")}
+            },
+            "duration_seconds": round(duration, 2),
+            "requests": sum(summary["requests"] for summary in endpoints.values()),
+            "ok": sum(summary["ok"] for summary in endpoints.values()),
+            "throughput_per_second": round(completed / duration, 2),
+            "dropped": self.dropped,
+            "endpoints": endpoints
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(timeout: float = 30):
+    """uvicorn with the stub provider; returns (process, base url)"""
+    port = free_port()
+    unlimited = ",".join(f"{tier}:{endpoint}=1000000000/60"
+                         for tier in ("default", "admin") for endpoint in ("query", "switch-model"))
+    env = dict(os.environ)
+    env.update({"LLM_PROVIDER": "stub", "RATE_LIMITS": unlimited})
+    env.setdefault("STUB_SEED", "1")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=1):
+                return server, url
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.05)
+    server.terminate()
+    raise RuntimeError(f"backend did not start within {timeout}s")
+
+
+def change(new: float, old: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Print the change per endpoint; True if anything regressed beyond threshold"""
+    print(f"\n Compared with baseline (regression threshold {threshold:.0f}%)")
+    regressed = False
+    for endpoint, new in results["endpoints"].items():
+        old = baseline["endpoints"].get(endpoint)
+        if not old or not old["ok"]:
+            continue
+        deltas = {key: change(new[key], old[key]) for key in ("throughput_per_second", "p50_ms", "p95_ms", "p99_ms")}
+        worse = (deltas["throughput_per_second"] < -threshold
+                 or deltas["p95_ms"] > threshold or deltas["p99_ms"] > threshold)
+        regressed |= worse
+        print(f"{endpoint:>13} | throughput {deltas['throughput_per_second']:+6.1f}% | "
+              f"p50 {deltas['p50_ms']:+6.1f}% | p95 {deltas['p95_ms']:+6.1f}% | "
+              f"p99 {deltas['p99_ms']:+6.1f}% | {'REGRESSION' if worse else 'ok'}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="running backend to test (default: start one with the stub provider)")
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed")
+    parser.add_argument("--concurrency", type=int, default=32, help="closed loop: clients sending back to back")
+    parser.add_argument("--rate", type=float, default=100, help="open loop: mean arrivals per second")
+    parser.add_argument("--max-in-flight", type=int, default=2000, help="open loop: arrivals beyond this are dropped")
+    parser.add_argument("--clients", type=int, default=None, help="logged-in sessions (default: --concurrency)")
+    parser.add_argument("--mix", default="query=60,models=20,switch-model=10,login=10", help="endpoint weights")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of load before measuring")
+    parser.add_argument("--max-tokens", type=int, default=60)
+    parser.add_argument("--prompts", type=int, default=1000, help="distinct prompts (fewer = more cache hits)")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    parser.add_argument("--compare", default=None, help="earlier --output file to compare with")
+    parser.add_argument("--threshold", type=float, default=10, help="percent change counted as a regression")
+    args = parser.parse_args()
+    args.clients = args.clients or (args.concurrency if args.mode == "closed" else 32)
+
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_backend()
+    try:
+        test = LoadTest(url, parse_mix(args.mix), args)
+        results = asyncio.run(test.run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print("=" * 60)
+    load = f"{args.concurrency} clients" if args.mode == "closed" else f"{args.rate:g} req/s offered"
+    print(f" LOAD TEST ({args.mode} loop, {load}, {results['duration_seconds']}s)")
+    print("=" * 60)
+    for endpoint, summary in results["endpoints"].items():
+        print(f"{endpoint:>13} | {summary['throughput_per_second']:8.1f} req/s | errors {summary['errors']:6d} | "
+              f"p50 {summary['p50_ms']:8.1f}ms | p95 {summary['p95_ms']:8.1f}ms | p99 {summary['p99_ms']:8.1f}ms")
+    print(f"{'total':>13} | {results['throughput_per_second']:8.1f} req/s | dropped by the load generator: {results['dropped']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Login throughput and event-loop responsiveness during a login burst
+
+A burst of concurrent logins (a mix of valid, wrong-password and unknown
+users, as in a credential-stuffing attack) is run two ways:
+
+    inline  bcrypt on the event loop (every other request waits)
+    pool    authenticate_user_async: bcrypt on auth.PASSWORD_POOL
+
+For each, logins/s and the worst event-loop stall seen by a 10ms heartbeat
+are reported, and an unknown username (checked against the precomputed
+dummy hash) is timed against a wrong password for a real user.
+
+Usage:
+    python benchmarks/login_bench.py
+    python benchmarks/login_bench.py --logins 64 --rounds 10 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+
+async def heartbeat(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Worst delay between when a 10ms sleep should end and when it did"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+def attempts(n: int):
+    credentials = [("demo", "demo123"), ("demo", "wrong"), ("nobody", "guess")]
+    return [credentials[i % len(credentials)] for i in range(n)]
+
+
+async def run(mode: str, logins: int) -> tuple:
+    import auth
+
+    async def inline(username, password):
+        return auth.authenticate_user(username, password)
+
+    login = inline if mode == "inline" else auth.authenticate_user_async
+    stop = asyncio.Event()
+    beat = asyncio.ensure_future(heartbeat(stop))
+    await asyncio.sleep(0.02)
+    start = time.perf_counter()
+    await asyncio.gather(*(login(u, p) for u, p in attempts(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return logins / elapsed, await beat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=30, help="concurrent login attempts")
+    parser.add_argument("--rounds", type=int, default=12, help="BCRYPT_ROUNDS")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="AUTH_HASH_WORKERS values")
+    args = parser.parse_args()
+
+    # Users hashed at --rounds in a scratch file, so nothing is re-hashed
+    # (or written back to backend/users.json) during the run
+    users_file = os.path.join(tempfile.mkdtemp(), "users.json")
+    with open(users_file, "w") as f:
+        json.dump({"demo": bcrypt.hashpw(b"demo123", bcrypt.gensalt(rounds=args.rounds)).decode()}, f)
+    os.environ["AUTH_USERS_FILE"] = users_file
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+
+    # Silence per-login logging
+    with contextlib.redirect_stdout(io.StringIO()):
+        import auth
+        auth.MAX_PENDING_LOGINS = args.logins
+
+        results = [("inline", None, asyncio.run(run("inline", args.logins)))]
+        for workers in args.workers:
+            auth.PASSWORD_POOL = ThreadPoolExecutor(max_workers=workers)
+            results.append(("pool", workers, asyncio.run(run("pool", args.logins))))
+
+        timings = {}
+        for username in ("demo", "nobody"):
+            start = time.perf_counter()
+            for _ in range(5):
+                auth.check_credentials(username, "guess")
+            timings[username] = (time.perf_counter() - start) / 5
+
+    print("=" * 60)
+    print(f" LOGIN BURST ({args.logins} concurrent, {args.rounds} rounds, {os.cpu_count()} CPUs)")
+    print("=" * 60)
+    for mode, workers, (rate, stall) in results:
+        label = mode if workers is None else f"{mode} x{workers}"
+        print(f"{label:>9} | {rate:6.1f} logins/s | worst event-loop stall {stall * 1000:7.1f}ms")
+    print(f"\nwrong password {timings['demo'] * 1000:.0f}ms vs unknown user {timings['nobody'] * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
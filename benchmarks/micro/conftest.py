@@ -0,0 +1,47 @@
+import asyncio
+import base64
+import os
+import random
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# No network or token needed; the benchmarks swap in their own clients anyway
+os.environ.setdefault("LLM_PROVIDER", "stub")
+
+import auth  # noqa: E402
+from session_store import SessionStore  # noqa: E402
+
+
+def make_tokens(count: int, seed: int = 0) -> list:
+    """Deterministic tokens shaped like secrets.token_urlsafe(32)"""
+    rng = random.Random(seed)
+    return [base64.urlsafe_b64encode(rng.randbytes(32)).rstrip(b"=").decode() for _ in range(count)]
+
+
+@pytest.fixture(scope="module", params=[10_000, 1_000_000], ids=["10k", "1M"])
+def sessions(request):
+    """auth.SESSIONS replaced by a store holding 10k or 1M sessions"""
+    tokens = make_tokens(request.param)
+    store = SessionStore(max_sessions=request.param)
+    for i, token in enumerate(tokens):
+        store.add(token, f"user{i % 1000}")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(auth, "SESSIONS", store)
+        yield tokens
+
+
+@pytest.fixture
+def empty_sessions(monkeypatch):
+    monkeypatch.setattr(auth, "SESSIONS", SessionStore())
+
+
+@pytest.fixture(scope="module")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
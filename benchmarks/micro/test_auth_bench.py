@@ -0,0 +1,44 @@
+import itertools
+
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+
+
+def test_verify_token(benchmark, sessions):
+    credentials = itertools.cycle([
+        HTTPAuthorizationCredentials(scheme="Bearer", credentials=token) for token in sessions[::len(sessions) // 1000]
+    ])
+    assert benchmark(lambda: auth.verify_token(next(credentials))).startswith("user")
+
+
+def test_verify_token_unknown(benchmark, sessions):
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="not-a-session")
+
+    def unknown():
+        try:
+            auth.verify_token(credentials)
+        except auth.HTTPException:
+            pass
+
+    benchmark(unknown)
+
+
+def test_get_active_users(benchmark, sessions):
+    assert benchmark(auth.get_active_users) == len(sessions)
+
+
+def test_get_all_sessions(benchmark, sessions):
+    assert len(benchmark(auth.get_all_sessions, 0, 50)) == 50
+
+
+def test_authenticate_user_hit(benchmark, empty_sessions):
+    # bcrypt at 12 rounds: a handful of rounds is enough
+    token = benchmark.pedantic(auth.authenticate_user, args=("demo", "demo123"), rounds=5, warmup_rounds=1)
+    assert token is not None
+
+
+def test_authenticate_user_miss(benchmark, empty_sessions):
+    # An unknown user must cost the same as a known one
+    token = benchmark.pedantic(auth.authenticate_user, args=("nobody", "demo123"), rounds=5, warmup_rounds=1)
+    assert token is None
@@ -0,0 +1,47 @@
+import pytest
+
+from llm_service import LLMService
+from providers import chat_response
+
+HISTORY = [
+    {"role": "user" if i % 2 == 0 else "assistant", "content": f"Turn {i}: " + "some earlier text " * 10}
+    for i in range(20)
+]
+
+
+class InstantClient:
+    """Answers at once, so only the service's own work is measured"""
+
+    def __init__(self):
+        self.response = chat_response("  Machine learning is learning patterns from data.  ")
+
+    async def chat_completion(self, messages, model, max_tokens, temperature, stream=False):
+        return self.response
+
+
+@pytest.fixture(scope="module")
+def service():
+    service = LLMService()
+    for state in service.models.values():
+        state.client = InstantClient()
+    return service
+
+
+@pytest.mark.parametrize("history", [None, HISTORY], ids=["no-history", "20-turns"])
+def test_build_messages(benchmark, service, history):
+    messages = benchmark(service._build_messages, "What is machine learning?", "Be brief", history)
+    assert messages[-1]["content"] == "What is machine learning?"
+
+
+def test_generate_response_uncached(benchmark, service, loop):
+    # Limiter, breaker, single-flight and response extraction, no upstream wait
+    answer = benchmark(lambda: loop.run_until_complete(
+        service.generate_response("What is machine learning?", 100, use_cache=False)
+    ))
+    assert answer == "Machine learning is learning patterns from data."
+
+
+def test_generate_response_cache_hit(benchmark, service, loop):
+    loop.run_until_complete(service.generate_response("Cached question", 100))
+    answer = benchmark(lambda: loop.run_until_complete(service.generate_response("Cached question", 100)))
+    assert answer == "Machine learning is learning patterns from data."
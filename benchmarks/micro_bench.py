@@ -0,0 +1,67 @@
+"""
+Microbenchmarks of the per-request code in auth.py and llm_service.py
+
+Runs the pytest-benchmark suite in benchmarks/micro/:
+
+    verify_token            known and unknown tokens, 10k and 1M sessions
+    get_active_users        10k and 1M sessions
+    get_all_sessions        one admin page, 10k and 1M sessions
+    authenticate_user       hit and miss (bcrypt at the configured rounds)
+    _build_messages         without history and with 20 earlier turns
+    generate_response       cache hit, and a miss against an instant client
+                            (limiter, breaker, coalescing, response extraction)
+
+Fixtures are deterministic (seeded tokens, fixed prompts), so runs on the
+same machine are comparable. --save stores a run as a named baseline;
+--compare runs again and fails (exit status 1) when any benchmark's median
+is more than --threshold percent slower than that baseline.
+
+Requires pytest and pytest-benchmark (pip install -r requirements-dev.txt).
+
+Usage:
+    python benchmarks/micro_bench.py
+    python benchmarks/micro_bench.py --quick
+    python benchmarks/micro_bench.py --save baseline
+    python benchmarks/micro_bench.py --compare baseline --threshold 10
+"""
+import argparse
+import os
+import sys
+
+import pytest
+from pytest_benchmark.session import PerformanceRegression
+
+MICRO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "micro")
+BASELINES = os.path.join(MICRO, ".baselines")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", metavar="NAME", help="store this run as a baseline")
+    parser.add_argument("--compare", metavar="NAME", help="baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="percent slower (median) that fails --compare")
+    parser.add_argument("--quick", action="store_true", help="skip the 1M-session fixtures")
+    args = parser.parse_args()
+
+    options = [
+        MICRO, "-q", "-p", "no:cacheprovider",
+        f"--benchmark-storage=file://{BASELINES}",
+        "--benchmark-sort=name",
+        "--benchmark-columns=min,median,mean,ops,rounds"
+    ]
+    if args.quick:
+        options += ["-k", "not 1M"]
+    if args.save:
+        options += [f"--benchmark-save={args.save}"]
+    if args.compare:
+        options += [f"--benchmark-compare=*_{args.compare}",
+                    f"--benchmark-compare-fail=median:{args.threshold:g}%"]
+    try:
+        sys.exit(pytest.main(options))
+    except PerformanceRegression:
+        # Raised after the report; the offending benchmarks are listed above
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
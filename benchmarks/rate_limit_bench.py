@@ -0,0 +1,91 @@
+"""
+Cost of the rate-limit check next to the auth dependency
+
+Times verify_token() alone, verify_token() + RateLimiter.check(), and check()
+with many distinct users (bucket inserts + idle eviction), next to one
+in-process request to an authenticated endpoint for scale.
+
+Usage:
+    python benchmarks/rate_limit_bench.py
+    python benchmarks/rate_limit_bench.py --calls 1000000 --users 100000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+
+os.environ.setdefault("HUGGINGFACE_API_TOKEN", "benchmark")
+
+from auth import SESSIONS, create_token, get_user_tier, verify_token  # noqa: E402
+from rate_limit import RateLimiter, RateLimitPolicy  # noqa: E402
+
+
+def timed(fn, calls: int) -> float:
+    """Nanoseconds per call"""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=100_000, help="distinct users for the insert test")
+    parser.add_argument("--requests", type=int, default=2_000, help="in-process GET /models requests")
+    args = parser.parse_args()
+
+    # A session without going through bcrypt
+    token = create_token()
+    SESSIONS.add(token, "demo")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    # Large limit so every check takes the normal (allowed) path
+    limiter = RateLimiter({("default", "query"): RateLimitPolicy(10 ** 12, 60)})
+
+    def auth_only():
+        verify_token(credentials)
+
+    def auth_and_limit():
+        username = verify_token(credentials)
+        limiter.check(username, get_user_tier(username), "query")
+
+    def check_only():
+        limiter.check("demo", "default", "query")
+
+    users = [f"user{i}" for i in range(args.users)]
+    many = RateLimiter({("default", "query"): RateLimitPolicy(30, 60)}, max_buckets=args.users // 2)
+    position = iter(range(10 ** 12))
+
+    def check_many_users():
+        many.check(users[next(position) % len(users)], "default", "query")
+
+    print("=" * 60)
+    print(" RATE LIMIT BENCHMARK")
+    print("=" * 60)
+    base = timed(auth_only, args.calls)
+    both = timed(auth_and_limit, args.calls)
+    print(f"verify_token                 {base:8.0f} ns/call")
+    print(f"verify_token + check         {both:8.0f} ns/call  (+{both - base:.0f} ns)")
+    print(f"check (hot bucket)           {timed(check_only, args.calls):8.0f} ns/call")
+    print(f"check ({args.users:,} users, LRU) {timed(check_many_users, args.calls):8.0f} ns/call "
+          f"| buckets {many.stats()['buckets']:,}")
+
+    from fastapi.testclient import TestClient
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main as api
+    client = TestClient(api.app)
+    headers = {"Authorization": f"Bearer {token}"}
+    with contextlib.redirect_stdout(io.StringIO()):  # endpoint logging
+        request = timed(lambda: client.get("/models", headers=headers), args.requests)
+    print(f"GET /models (in-process)     {request:8.0f} ns/call  "
+          f"(check = {(both - base) / request:.2%} of a request)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Session store at scale: create, touch, page and sweep one million sessions
+
+Usage:
+    python benchmarks/session_store_bench.py
+    python benchmarks/session_store_bench.py --sessions 1000000 --batch 10000
+"""
+import argparse
+import os
+import random
+import secrets
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from session_store import SessionStore  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def per_op(seconds: float, ops: int) -> str:
+    return f"{seconds / ops * 1e6:6.2f}us/op"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=10_000, help="sweeper batch size")
+    args = parser.parse_args()
+    n = args.sessions
+
+    clock = Clock()
+    store = SessionStore(max_age=24 * 3600, idle_timeout=2 * 3600, max_sessions=n, clock=clock)
+    tokens = [secrets.token_urlsafe(32) for _ in range(n)]
+
+    print("=" * 60)
+    print(" SESSION STORE BENCHMARK")
+    print("=" * 60)
+
+    usernames = [f"user{i % 1000}" for i in range(n)]
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for i, token in enumerate(tokens[:100_000]):
+        store.add(token, usernames[i])
+    memory = (tracemalloc.get_traced_memory()[0] - baseline) / min(n, 100_000)
+    tracemalloc.stop()
+    store.clear()
+
+    start = time.perf_counter()
+    for i, token in enumerate(tokens):
+        # Logins spread over one hour
+        clock.now += 3600 / n
+        store.add(token, usernames[i])
+    add_seconds = time.perf_counter() - start
+    print(f"add     {n:>9,} sessions  {per_op(add_seconds, n)} | ~{memory:.0f} B/session (excl. token)")
+
+    sample = random.Random(1).sample(tokens, min(n, 200_000))
+    start = time.perf_counter()
+    for token in sample:
+        store.touch(token)
+    print(f"touch   {len(sample):>9,} lookups   {per_op(time.perf_counter() - start, len(sample))}")
+
+    start = time.perf_counter()
+    pages = 0
+    for offset in range(0, 50 * 100, 50):
+        list(store.page(offset, 50))
+        pages += 1
+    print(f"page    first {pages} pages of 50 {per_op(time.perf_counter() - start, pages)}")
+
+    # Nothing expired yet: a sweep must not scan
+    start = time.perf_counter()
+    store.sweep(args.batch)
+    print(f"sweep   nothing expired     {(time.perf_counter() - start) * 1e6:8.1f}us")
+
+    # Sessions from the first ~half hour that were not touched go idle,
+    # then everything passes max age
+    clock.now += 1.5 * 3600
+    batches, worst, start = 0, 0.0, time.perf_counter()
+    while True:
+        t = time.perf_counter()
+        removed = store.sweep(args.batch)
+        worst = max(worst, time.perf_counter() - t)
+        batches += 1
+        if removed < args.batch:
+            break
+    idle_seconds = time.perf_counter() - start
+    idled = store.stats()["idled_out"]
+    print(f"sweep   {idled:>9,} idle      {per_op(idle_seconds, max(1, idled))} | "
+          f"{batches} batches, worst batch {worst * 1000:.1f}ms")
+
+    clock.now += 24 * 3600
+    batches, worst, start = 0, 0.0, time.perf_counter()
+    remaining = len(store)
+    while True:
+        t = time.perf_counter()
+        removed = store.sweep(args.batch)
+        worst = max(worst, time.perf_counter() - t)
+        batches += 1
+        if removed < args.batch:
+            break
+    expire_seconds = time.perf_counter() - start
+    print(f"sweep   {remaining:>9,} expired   {per_op(expire_seconds, max(1, remaining))} | "
+          f"{batches} batches, worst batch {worst * 1000:.1f}ms")
+    print(f"left    {len(store):,} sessions, {store.stats()['expiry_slots']:,} expiry slots")
+
+
+if __name__ == "__main__":
+    main()
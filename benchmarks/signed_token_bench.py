@@ -0,0 +1,88 @@
+"""
+Token verification cost: server-side session lookup vs signed tokens
+
+Compares the per-request work of verify_token in both AUTH_TOKEN_MODEs:
+
+    session  SessionStore.touch (in-process dict, single worker only)
+    signed   HMAC check + revocation filter lookup (any worker)
+
+and measures how many lookups reach SQLite when some tokens are revoked.
+
+Usage:
+    python benchmarks/signed_token_bench.py
+    python benchmarks/signed_token_bench.py --tokens 100000 --revoked 10000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+from session_store import SessionStore  # noqa: E402
+from signed_tokens import RevocationList, TokenSigner  # noqa: E402
+
+
+def per_op(seconds: float, ops: int) -> str:
+    return f"{seconds / ops * 1e6:6.2f}us/op"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=100_000, help="live tokens")
+    parser.add_argument("--revoked", type=int, default=10_000, help="logged-out tokens")
+    parser.add_argument("--lookups", type=int, default=200_000)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    print("=" * 60)
+    print(" TOKEN VERIFICATION")
+    print("=" * 60)
+
+    store = SessionStore(max_sessions=args.tokens)
+    session_tokens = [f"token-{i}" for i in range(args.tokens)]
+    for token in session_tokens:
+        store.add(token, "demo")
+    sample = [rng.choice(session_tokens) for _ in range(args.lookups)]
+    start = time.perf_counter()
+    for token in sample:
+        store.touch(token)
+    print(f"session  SessionStore.touch        {per_op(time.perf_counter() - start, args.lookups)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        signer = TokenSigner(["benchmark-secret"])
+        revocations = RevocationList(os.path.join(tmp, "revoked.db"), refresh_interval=1.0)
+        signed_tokens = [signer.issue("demo") for _ in range(args.tokens)]
+        revoked_tokens = [signer.issue("demo") for _ in range(args.revoked)]
+        for token in revoked_tokens:
+            claims = signer.verify(token)
+            revocations.revoke(claims.token_id, claims.expires_at)
+
+        # Mostly live tokens, plus 1% replays of logged-out ones
+        sample = [
+            rng.choice(revoked_tokens if rng.random() < 0.01 else signed_tokens)
+            for _ in range(args.lookups)
+        ]
+        start = time.perf_counter()
+        for token in sample:
+            signer.verify(token)
+        print(f"signed   HMAC verify only         {per_op(time.perf_counter() - start, args.lookups)}")
+
+        start = time.perf_counter()
+        for token in sample:
+            claims = signer.verify(token)
+            revocations.is_revoked(claims.token_id)
+        elapsed = time.perf_counter() - start
+        print(f"signed   verify + revocation check {per_op(elapsed, args.lookups)}")
+
+        stats = revocations.stats()
+        print(f"\n{stats['revoked']} revoked ids in a {stats['filter_bytes'] / 1024:.0f} KB filter; "
+              f"{stats['exact_checks']} of {stats['lookups']} lookups needed SQLite "
+              f"({stats['exact_checks'] / stats['lookups']:.2%})")
+        revocations.close()
+
+
+if __name__ == "__main__":
+    main()
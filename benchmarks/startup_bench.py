@@ -0,0 +1,101 @@
+"""
+Cold-start time: importing the backend and serving the first /health
+
+Each run starts a fresh interpreter, so nothing is cached in-process:
+
+    import    time to `import main` (the FastAPI app, auth, LLM service)
+    health    time from launching uvicorn until GET /health returns 200
+
+Medians are compared against budgets and the script exits with status 1
+when either is exceeded, so it can gate startup regressions in CI.
+
+Usage:
+    python benchmarks/startup_bench.py
+    python benchmarks/startup_bench.py --runs 5 --max-import-ms 1000 --max-health-ms 2000
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import main; "
+    "print('IMPORT_SECONDS', time.perf_counter() - start)"
+)
+
+
+def environment() -> dict:
+    env = dict(os.environ)
+    env.setdefault("HUGGINGFACE_API_TOKEN", "benchmark")
+    return env
+
+
+def import_time() -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND, env=environment(),
+        capture_output=True, text=True, check=True
+    )
+    line = next(line for line in result.stdout.splitlines() if line.startswith("IMPORT_SECONDS"))
+    return float(line.split()[1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_health(timeout: float = 30) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=environment(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError(f"/health did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=1000, help="budget for the median import time")
+    parser.add_argument("--max-health-ms", type=float, default=2000, help="budget for the median time to /health")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(" STARTUP TIME")
+    print("=" * 60)
+    imports = [import_time() for _ in range(args.runs)]
+    health = [time_to_health() for _ in range(args.runs)]
+
+    failed = False
+    for label, samples, budget in (("import main", imports, args.max_import_ms),
+                                   ("first /health", health, args.max_health_ms)):
+        median = statistics.median(samples) * 1000
+        ok = median <= budget
+        failed |= not ok
+        print(f"{label:>14} | median {median:7.0f}ms | min {min(samples) * 1000:7.0f}ms | "
+              f"budget {budget:6.0f}ms | {'ok' if ok else 'REGRESSION'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
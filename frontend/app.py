@@ -1,9 +1,14 @@
 import streamlit as st
 import requests
+import json
 from auth_ui import show_login_page, logout
 
 API_URL = "http://localhost:8000"
 
+# System prompt - sent separately from the question so the backend can cache
+# answers per question
+SYSTEM_PROMPT = """Keep your answer SHORT (2-3 sentences max). Be helpful and friendly. Use 1-2 emojis. Get straight to the point."""
+
 # Page config
 st.set_page_config(
     page_title="AI Chat Assistant",
@@ -44,23 +49,78 @@ def switch_model(model_name, token):
     except Exception as e:
         return f"Error: {e}"
 
-def generate_response(prompt, max_tokens, token):
+def create_conversation(token):
+    """Start a server-side conversation; returns (id, None) or (None, error)"""
     try:
         response = requests.post(
-            f"{API_URL}/query",
-            json={"prompt": prompt, "max_tokens": max_tokens},
+            f"{API_URL}/conversations",
+            json={"system_prompt": SYSTEM_PROMPT},
             headers={"Authorization": f"Bearer {token}"},
-            timeout=60
+            timeout=5
         )
+        if response.status_code != 200:
+            return None, response.json().get('detail', response.status_code)
+        return response.json()["id"], None
+    except Exception as e:
+        return None, e
+
+def delete_conversation(conversation_id, token):
+    try:
+        requests.delete(
+            f"{API_URL}/conversations/{conversation_id}",
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=5
+        )
+    except:
+        pass
+
+def stream_response(prompt, max_tokens, token, model=None):
+    """
+    Yield answer chunks as the model produces them. Only the new message is
+    sent; the backend keeps the conversation history.
+    """
+    try:
+        if st.session_state.conversation_id is None:
+            conversation_id, error = create_conversation(token)
+            if conversation_id is None:
+                yield f" Error: could not start a conversation ({error})"
+                return
+            st.session_state.conversation_id = conversation_id
         
-        if response.status_code == 401:
-            st.error(" Session expired")
-            logout()
-            return "Session expired"
-        
-        return response.json()["response"]
+        with requests.post(
+            f"{API_URL}/conversations/{st.session_state.conversation_id}/messages",
+            json={"prompt": prompt, "max_tokens": max_tokens, "model": model},
+            headers={"Authorization": f"Bearer {token}"},
+            stream=True,
+            timeout=60
+        ) as response:
+            if response.status_code == 404:
+                # Conversation is gone (e.g. backend restarted): start a new one
+                st.session_state.conversation_id = None
+                yield " Conversation expired, please send your message again"
+                return
+            
+            if response.status_code == 401:
+                st.error(" Session expired")
+                logout()
+                yield "Session expired"
+                return
+            
+            if response.status_code != 200:
+                # e.g. 503 while a model is unavailable - show the reason
+                yield f" Error: {response.json().get('detail', response.status_code)}"
+                return
+            
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "token" in event:
+                    yield event["token"]
+                elif "error" in event:
+                    yield f"\n\n Error: {event['error']}"
     except Exception as e:
-        return f" Error: {e}"
+        yield f" Error: {e}"
 
 # Session state
 if 'authenticated' not in st.session_state:
@@ -75,6 +135,8 @@ if 'process_question' not in st.session_state:
     st.session_state.process_question = None
 if 'current_model' not in st.session_state:
     st.session_state.current_model = "mistral"
+if 'conversation_id' not in st.session_state:
+    st.session_state.conversation_id = None
 
 # Check backend
 if not check_api_health():
@@ -87,17 +149,17 @@ if not st.session_state.authenticated:
     show_login_page()
     st.stop()
 
-# System prompt
-SYSTEM_PROMPT = """Keep your answer SHORT (2-3 sentences max). Be helpful and friendly. Use 1-2 emojis. Get straight to the point."""
-
-def create_enhanced_prompt(user_message):
-    return f"{SYSTEM_PROMPT}\n\nQuestion: {user_message}\n\nAnswer:"
-
 def process_user_question(question, max_tokens):
     st.session_state.messages.append({"role": "user", "content": question})
-    enhanced_prompt = create_enhanced_prompt(question)
-    response = generate_response(enhanced_prompt, max_tokens, st.session_state.token)
-    response = response.strip()
+    with st.chat_message("user"):
+        st.markdown(question)
+    
+    # Render the answer incrementally while tokens arrive
+    with st.chat_message("assistant"):
+        response = st.write_stream(
+            stream_response(question, max_tokens, st.session_state.token, st.session_state.current_model)
+        )
+    response = response.strip() if isinstance(response, str) else "".join(response).strip()
     st.session_state.messages.append({"role": "assistant", "content": response})
 
 # Sidebar
@@ -163,6 +225,9 @@ with st.sidebar:
     
     # Clear chat
     if st.button(" Clear Chat", use_container_width=True):
+        if st.session_state.conversation_id:
+            delete_conversation(st.session_state.conversation_id, st.session_state.token)
+        st.session_state.conversation_id = None
         st.session_state.messages = []
         st.success("Chat cleared!")
         st.rerun()
@@ -233,8 +298,7 @@ if len(st.session_state.messages) == 0:
 
 # Process button clicks
 if st.session_state.process_question:
-    with st.spinner(" Thinking..."):
-        process_user_question(st.session_state.process_question, max_tokens)
+    process_user_question(st.session_state.process_question, max_tokens)
     st.session_state.process_question = None
     st.rerun()
 
@@ -247,8 +311,7 @@ for message in st.session_state.messages:
 user_input = st.chat_input(" Ask me anything...")
 
 if user_input:
-    with st.spinner(" Thinking..."):
-        process_user_question(user_input, max_tokens)
+    process_user_question(user_input, max_tokens)
     st.rerun()
 
 # Footer
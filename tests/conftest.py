@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Backend modules import each other as top-level modules (e.g. `from llm_service import ...`)
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("HUGGINGFACE_API_TOKEN", "test-token")
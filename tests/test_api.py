@@ -0,0 +1,364 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from auth import authenticate_user
+from conversation_log import LogConversationStore
+from rate_limit import RateLimiter, RateLimitPolicy
+from scheduler import FairScheduler
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+async def _chunks(*texts):
+    for text in texts:
+        yield _chunk(text)
+
+
+class FakeClient:
+    async def chat_completion(self, messages, model, max_tokens, temperature, stream=False):
+        assert stream
+        return _chunks("Hello", None, " world")
+
+
+def test_query_stream_sends_tokens_as_ndjson(monkeypatch):
+    for state in main.llm_service.models.values():
+        monkeypatch.setattr(state, "client", FakeClient())
+    token = authenticate_user("demo", "demo123")
+    client = TestClient(main.app)
+
+    response = client.post(
+        "/query/stream",
+        json={"prompt": "hi", "max_tokens": 20},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [e["token"] for e in events if "token" in e] == ["Hello", " world"]
+    assert events[-1] == {"done": True, "model": "mistral"}
+    assert main.scheduler.stats()["running"] == 0
+
+
+def test_switch_model_only_affects_the_calling_session():
+    client = TestClient(main.app)
+    first = authenticate_user("demo", "demo123")
+    second = authenticate_user("demo", "demo123")
+
+    switched = client.post(
+        "/switch-model",
+        json={"model_name": "zephyr"},
+        headers={"Authorization": f"Bearer {first}"},
+    )
+    assert switched.json()["current_model"] == "zephyr"
+
+    def current(token):
+        return client.get("/models", headers={"Authorization": f"Bearer {token}"}).json()["current"]
+
+    assert current(first) == "zephyr"
+    assert current(second) == "mistral"
+
+
+def test_unknown_model_is_rejected():
+    client = TestClient(main.app)
+    token = authenticate_user("demo", "demo123")
+    response = client.post(
+        "/query",
+        json={"prompt": "hi", "model": "gpt-99"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 400
+
+
+class UnavailableClient:
+    async def chat_completion(self, messages, model, max_tokens, temperature, stream=False):
+        raise ConnectionError("connection refused")
+
+
+def test_open_circuit_returns_503_with_retry_after(monkeypatch):
+    breaker = main.llm_service.models["llama"].breaker
+    monkeypatch.setattr(main.llm_service.models["llama"], "client", UnavailableClient())
+    monkeypatch.setattr(main.llm_service.retry_policy, "base_delay", 0)
+    token = authenticate_user("demo", "demo123")
+    client = TestClient(main.app)
+
+    try:
+        for _ in range(breaker.failure_threshold):
+            failed = client.post(
+                "/query",
+                json={"prompt": "hi", "model": "llama"},
+                headers={"Authorization": f"Bearer {token}", "Cache-Control": "no-cache"},
+            )
+            assert failed.status_code >= 500
+            assert main.scheduler.stats()["running"] == 0
+
+        response = client.post(
+            "/query/stream",
+            json={"prompt": "hi", "model": "llama"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) > 0
+        assert main.scheduler.stats()["running"] == 0
+
+        health = client.get("/health").json()
+        assert health["status"] == "degraded"
+        assert health["models"]["llama"]["state"] == "open"
+    finally:
+        breaker.record_success()
+
+
+def test_full_scheduler_queue_returns_429_with_depth_hint(monkeypatch):
+    monkeypatch.setattr(main, "scheduler", FairScheduler(max_concurrent=0, max_queue=0))
+    token = authenticate_user("demo", "demo123")
+    client = TestClient(main.app)
+
+    response = client.post(
+        "/query",
+        json={"prompt": "hi"},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+    assert response.status_code == 429
+    assert response.headers["X-Queue-Depth"] == "0"
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_rate_limit_headers_and_429(monkeypatch):
+    for state in main.llm_service.models.values():
+        monkeypatch.setattr(state, "client", FakeClient())
+    monkeypatch.setattr(main, "rate_limiter", RateLimiter({("default", "query"): RateLimitPolicy(1, 60)}))
+    token = authenticate_user("demo", "demo123")
+    client = TestClient(main.app)
+
+    def stream():
+        return client.post(
+            "/query/stream",
+            json={"prompt": "hi"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    allowed = stream()
+    assert allowed.status_code == 200
+    assert allowed.headers["RateLimit-Remaining"] == "0"
+    assert allowed.headers["RateLimit-Policy"] == "1;w=60"
+    assert main.scheduler.stats()["running"] == 0
+
+    denied = stream()
+    assert denied.status_code == 429
+    assert int(denied.headers["Retry-After"]) > 0
+
+
+def test_admin_sessions_are_paginated():
+    client = TestClient(main.app)
+    admin = authenticate_user("admin", "admin123")
+    for _ in range(3):
+        authenticate_user("demo", "demo123")
+
+    response = client.get("/admin/sessions?offset=0&limit=2", headers={"Authorization": f"Bearer {admin}"})
+
+    assert response.status_code == 200
+    page = response.json()
+    assert len(page["sessions"]) == 2
+    assert page["total"] >= 4
+    # The admin's own request makes it the most recently active session
+    assert page["sessions"][0]["username"] == "admin"
+
+
+def test_logged_out_token_is_rejected():
+    client = TestClient(main.app)
+    token = authenticate_user("demo", "demo123")
+    assert client.post(f"/logout?token={token}").json()["success"]
+    response = client.get("/models", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+class RecordingClient:
+    """Streams a fixed reply and remembers the messages it was sent"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def chat_completion(self, messages, model, max_tokens, temperature, stream=False):
+        self.calls.append(messages)
+        return _chunks(f"reply {len(self.calls)}")
+
+
+@pytest.mark.parametrize("backend", ["memory", "log"])
+def test_conversation_history_is_kept_server_side(monkeypatch, tmp_path, backend):
+    if backend == "log":
+        monkeypatch.setattr(main, "conversations", LogConversationStore(str(tmp_path)))
+    client_stub = RecordingClient()
+    monkeypatch.setattr(main.llm_service.models["mistral"], "client", client_stub)
+    token = authenticate_user("demo", "demo123")
+    headers = {"Authorization": f"Bearer {token}", "Cache-Control": "no-cache"}
+    client = TestClient(main.app)
+
+    conversation = client.post("/conversations", json={"system_prompt": "Be brief"}, headers=headers).json()
+    url = f"/conversations/{conversation['id']}/messages"
+    for prompt in ("first question", "second question"):
+        response = client.post(url, json={"prompt": prompt, "model": "mistral"}, headers=headers)
+        assert response.status_code == 200
+        assert main.scheduler.stats()["running"] == 0
+
+    # The client only sent the new message; the backend added the history
+    assert client_stub.calls[-1] == [
+        {"role": "system", "content": "Be brief"},
+        {"role": "user", "content": "first question"},
+        {"role": "assistant", "content": "reply 1"},
+        {"role": "user", "content": "second question"},
+    ]
+    history = client.get(f"/conversations/{conversation['id']}?offset=2&limit=2", headers=headers).json()
+    assert [m["content"] for m in history["messages"]] == ["second question", "reply 2"]
+    assert history["turns"] == 4
+
+    other = authenticate_user("user", "password")
+    assert client.get(
+        f"/conversations/{conversation['id']}", headers={"Authorization": f"Bearer {other}"}
+    ).status_code == 404
+    assert client.delete(f"/conversations/{conversation['id']}", headers=headers).status_code == 200
+    assert client.post(url, json={"prompt": "third"}, headers=headers).status_code == 404
+
+
+
+class SilentClient:
+    async def chat_completion(self, messages, model, max_tokens, temperature, stream=False):
+        return _chunks(None, "")
+
+
+def test_empty_reply_is_not_saved_to_the_conversation(monkeypatch):
+    monkeypatch.setattr(main.llm_service.models["mistral"], "client", SilentClient())
+    token = authenticate_user("demo", "demo123")
+    headers = {"Authorization": f"Bearer {token}", "Cache-Control": "no-cache"}
+    client = TestClient(main.app)
+    conversation = client.post("/conversations", json={}, headers=headers).json()
+
+    response = client.post(
+        f"/conversations/{conversation['id']}/messages",
+        json={"prompt": "hi", "model": "mistral"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert json.loads(response.text.splitlines()[-1])["done"]
+    assert client.get(f"/conversations/{conversation['id']}", headers=headers).json()["turns"] == 0
+
+@pytest.mark.parametrize("max_tokens", [None, 0])
+def test_conversation_message_rejects_a_missing_token_budget(max_tokens):
+    token = authenticate_user("demo", "demo123")
+    headers = {"Authorization": f"Bearer {token}"}
+    client = TestClient(main.app)
+    conversation = client.post("/conversations", json={}, headers=headers).json()
+
+    response = client.post(
+        f"/conversations/{conversation['id']}/messages",
+        json={"prompt": "hi", "max_tokens": max_tokens},
+        headers=headers,
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("endpoint", ["/query", "/query/stream", "/query/batch"])
+@pytest.mark.parametrize("max_tokens", [None, 0, -5, main.MAX_RESPONSE_TOKENS + 1])
+def test_queries_reject_an_out_of_range_token_budget(endpoint, max_tokens):
+    token = authenticate_user("demo", "demo123")
+    query = {"prompt": "hi", "max_tokens": max_tokens}
+    response = TestClient(main.app).post(
+        endpoint,
+        json={"items": [query]} if endpoint == "/query/batch" else query,
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 422
+
+
+class EchoClient:
+    async def chat_completion(self, messages, model, max_tokens, temperature, stream=False):
+        reply = SimpleNamespace(content=f"echo: {messages[-1]['content']}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=reply)])
+
+
+def test_batch_streams_every_item_and_isolates_failures(monkeypatch):
+    monkeypatch.setattr(main.llm_service.models["mistral"], "client", EchoClient())
+    monkeypatch.setattr(main.llm_service.models["llama"], "client", UnavailableClient())
+    monkeypatch.setattr(main.llm_service.retry_policy, "base_delay", 0)
+    monkeypatch.setattr(main, "rate_limiter", RateLimiter({("default", "query"): RateLimitPolicy(10, 60)}))
+    token = authenticate_user("demo", "demo123")
+    client = TestClient(main.app)
+
+    items = [
+        {"prompt": "one", "model": "mistral"},
+        {"prompt": "two", "model": "gpt-99"},
+        {"prompt": "three", "model": "llama"},
+        {"prompt": "four", "model": "mistral"},
+    ]
+    try:
+        response = client.post(
+            "/query/batch",
+            json={"items": items},
+            headers={"Authorization": f"Bearer {token}", "Cache-Control": "no-cache"},
+        )
+    finally:
+        main.llm_service.models["llama"].breaker.record_success()
+
+    assert response.status_code == 200
+    assert response.headers["RateLimit-Remaining"] == "6"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results = {line["index"]: line for line in lines if "index" in line}
+    assert results[0]["response"] == "echo: one"
+    assert results[3]["response"] == "echo: four"
+    assert results[1]["status"] == 400
+    assert results[2]["status"] == 503
+    assert lines[-1] == {"done": True, "succeeded": 2, "failed": 2}
+    assert main.scheduler.stats()["running"] == 0
+
+
+def test_batch_larger_than_the_rate_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(main, "rate_limiter", RateLimiter({("default", "query"): RateLimitPolicy(2, 60)}))
+    token = authenticate_user("demo", "demo123")
+    response = TestClient(main.app).post(
+        "/query/batch",
+        json={"items": [{"prompt": str(i)} for i in range(3)]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 413
+    assert response.json()["detail"] == "At most 2 items per batch for the default tier"
+
+
+def test_batch_within_the_bucket_still_waits_for_tokens(monkeypatch):
+    monkeypatch.setattr(main, "rate_limiter", RateLimiter({("default", "query"): RateLimitPolicy(3, 60)}))
+    token = authenticate_user("demo", "demo123")
+    main.check_rate_limit("demo", "query")
+    response = TestClient(main.app).post(
+        "/query/batch",
+        json={"items": [{"prompt": str(i)} for i in range(3)]},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 429
+
+
+def test_session_sweeper_keeps_running_after_a_failed_sweep(monkeypatch):
+    calls = []
+
+    def cleanup(max_age_hours=None, *, limit=None):
+        calls.append(limit)
+        if len(calls) == 1:
+            raise KeyError("token")
+        return 0
+
+    monkeypatch.setattr(main, "cleanup_old_sessions", cleanup)
+    monkeypatch.setattr(main, "SESSION_SWEEP_INTERVAL", 0)
+
+    async def run():
+        sweeper = asyncio.create_task(main.sweep_sessions())
+        while len(calls) < 3:
+            await asyncio.sleep(0)
+        sweeper.cancel()
+
+    asyncio.run(run())
+    assert len(calls) >= 3
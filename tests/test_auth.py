@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+import bcrypt
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import auth
+import main
+from session_store import SessionStore
+from user_store import UserStore
+
+
+def copy_users(tmp_path):
+    path = tmp_path / "users.json"
+    shutil.copy(auth.USERS.path, path)
+    return UserStore(str(path))
+
+
+def test_unknown_user_checks_the_precomputed_dummy_hash(monkeypatch):
+    def no_new_salts(*args, **kwargs):
+        raise AssertionError("gensalt called on the login path")
+
+    monkeypatch.setattr(bcrypt, "gensalt", no_new_salts)
+    assert auth.authenticate_user("nobody", "guess") is None
+    assert auth.authenticate_user("demo", "wrong") is None
+
+
+def test_password_is_rehashed_when_the_work_factor_changes(monkeypatch, tmp_path):
+    users = copy_users(tmp_path)
+    monkeypatch.setattr(auth, "USERS", users)
+    monkeypatch.setattr(auth, "BCRYPT_ROUNDS", 4)
+    assert auth.needs_rehash(users["demo"])
+
+    assert auth.authenticate_user("demo", "demo123")
+    assert users["demo"].startswith("$2b$04$")
+    assert not auth.needs_rehash(users["demo"])
+    assert auth.authenticate_user("demo", "demo123")
+    # Persisted, so the next start does not re-hash again
+    assert json.loads((tmp_path / "users.json").read_text())["demo"] == users["demo"]
+
+
+def test_importing_main_hashes_nothing_and_defers_the_http_clients():
+    code = (
+        "import sys, main, auth; "
+        "assert not auth.USERS.loaded; "
+        "assert 'huggingface_hub' not in sys.modules; "
+        "assert 'aiohttp' not in sys.modules"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.path.dirname(main.__file__),
+        capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+
+
+def test_login_endpoint_runs_bcrypt_off_the_event_loop(monkeypatch):
+    threads = []
+    checkpw = bcrypt.checkpw
+
+    def recording_checkpw(password, hashed):
+        threads.append(threading.current_thread().name)
+        return checkpw(password, hashed)
+
+    monkeypatch.setattr(bcrypt, "checkpw", recording_checkpw)
+    client = TestClient(main.app)
+    response = client.post("/login", json={"username": "demo", "password": "demo123"})
+    assert response.status_code == 200
+    # Only PASSWORD_POOL workers are named "bcrypt_<n>"; the event loop and
+    # FastAPI's own threadpool never run the hash
+    assert len(threads) == 1 and threads[0].startswith("bcrypt")
+    assert response.json()["token"] in auth.SESSIONS
+    assert client.post("/login", json={"username": "demo", "password": "nope"}).status_code == 401
+
+
+def test_too_many_pending_logins_are_turned_away(monkeypatch):
+    monkeypatch.setattr(auth, "_pending_logins", auth.MAX_PENDING_LOGINS)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(auth.authenticate_user_async("demo", "demo123"))
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == "1"
+
+
+def test_cleanup_old_sessions_keeps_its_max_age_argument(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(auth, "SESSIONS", SessionStore(idle_timeout=10 * 3600, clock=lambda: clock[0]))
+    auth.SESSIONS.add("old", "demo")
+    clock[0] += 2 * 3600
+    auth.SESSIONS.add("new", "demo")
+
+    assert auth.cleanup_old_sessions() == 0
+    assert auth.cleanup_old_sessions(1) == 1
+    assert "old" not in auth.SESSIONS and "new" in auth.SESSIONS
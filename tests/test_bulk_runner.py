@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+from bulk_runner import run_bulk
+from llm_service import Completion
+from resilience import UpstreamUnavailable
+
+
+class FakeService:
+    """Uppercases prompts after a short, uneven delay; can hang after `stall_after` calls"""
+
+    def __init__(self, stall_after=None):
+        self.calls = 0
+        self.stall_after = stall_after
+
+    async def generate(self, prompt, max_tokens=512, system_prompt=None, use_cache=True, model=None):
+        self.calls += 1
+        if self.stall_after is not None and self.calls > self.stall_after:
+            await asyncio.Event().wait()
+        await asyncio.sleep(0.001 * (len(prompt) % 5))
+        if prompt == "fail":
+            raise UpstreamUnavailable(model or "zephyr", "model is down")
+        if prompt == "crash":
+            raise AttributeError("'int' object has no attribute 'strip'")
+        return Completion(prompt.upper(), model or "zephyr")
+
+
+def _write_input(path, count):
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(json.dumps({"id": f"q{i}", "prompt": "fail" if i == 3 else f"prompt {i}"}) + "\n")
+        f.write("\n")
+        f.write("not json\n")
+
+
+def _results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_every_line_gets_one_result(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_input(source, 20)
+    report = asyncio.run(run_bulk(FakeService(), str(source), str(output), concurrency=4, log=lambda _: None))
+
+    results = {result["line"]: result for result in _results(output)}
+    assert sorted(results) == list(range(20)) + [21]
+    assert results[0] == {"line": 0, "id": "q0", "response": "PROMPT 0", "model": "zephyr",
+                          "cached": False, "latency_ms": results[0]["latency_ms"]}
+    assert results[3]["status"] == 503
+    assert results[21]["status"] == 400
+    assert (report["processed"], report["ok"], report["failed"]) == (21, 19, 2)
+    assert report["latency"]["count"] == 19
+
+
+def test_a_killed_run_resumes_without_duplicates(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_input(source, 50)
+
+    async def interrupted():
+        run = asyncio.ensure_future(run_bulk(FakeService(stall_after=30), str(source), str(output),
+                                             concurrency=4, checkpoint_interval=0, log=lambda _: None))
+        await asyncio.sleep(0.2)
+        run.cancel()
+        try:
+            await run
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(interrupted())
+    first = _results(output)
+    assert 0 < len(first) < 52
+    # A write that never made it into the checkpoint (killed mid-line)
+    with open(output, "a") as f:
+        f.write('{"line": 0, "id": "q0", "respo')
+
+    service = FakeService()
+    asyncio.run(run_bulk(service, str(source), str(output), concurrency=4, log=lambda _: None))
+    lines = [result["line"] for result in _results(output)]
+    assert sorted(lines) == list(range(50)) + [51]
+    assert service.calls == 50 - sum(1 for result in first if result["line"] < 50)
+
+
+def test_bad_lines_fail_alone_and_the_run_finishes(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    lines = [
+        {"prompt": "good one"},
+        {"prompt": 123},
+        {"prompt": "bad budget", "max_tokens": "10"},
+        {"prompt": "no budget", "max_tokens": 0},
+        ["prompt"],
+        {"prompt": "crash"},
+        {"prompt": "good two", "max_tokens": 20},
+    ]
+    source.write_text("".join(json.dumps(line) + "\n" for line in lines))
+    report = asyncio.run(run_bulk(FakeService(), str(source), str(output), concurrency=2, log=lambda _: None))
+
+    results = {result["line"]: result for result in _results(output)}
+    assert sorted(results) == list(range(7))
+    assert [results[i]["status"] for i in range(1, 5)] == [400] * 4
+    assert results[1]["error"] == "invalid input line: prompt must be a string"
+    assert results[2]["error"] == "invalid input line: max_tokens must be a positive integer"
+    assert results[5]["status"] == 500
+    assert results[6]["response"] == "GOOD TWO"
+    assert (report["ok"], report["failed"]) == (2, 5)
+    with open(f"{output}.checkpoint") as f:
+        assert json.load(f)["next_line"] == 7
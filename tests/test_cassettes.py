@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from cassettes import CassetteRecorder, ReplayProvider, load_cassette
+from llm_service import LLMService
+from resilience import UpstreamError
+
+
+def _service(monkeypatch, **settings):
+    monkeypatch.delenv("HUGGINGFACE_API_TOKEN", raising=False)
+    monkeypatch.setenv("LLM_RETRY_ATTEMPTS", "1")
+    for name, value in settings.items():
+        monkeypatch.setenv(name, str(value))
+    return LLMService()
+
+
+def _record(monkeypatch, path):
+    """Record one answer and one stream from the stub provider"""
+    service = _service(monkeypatch, LLM_PROVIDER="stub", LLM_RECORD_CASSETTE=path, STUB_TTFT_SECONDS=0.05,
+                       STUB_TOKENS_PER_SECOND=200, STUB_ANSWER_TOKENS=6, STUB_JITTER=0, STUB_TAIL_RATE=0)
+
+    async def run():
+        try:
+            answer = await service.generate_response("What is Python?", 50, model="zephyr")
+            tokens = [token async for token in service.stream_response("Explain AI", 50)]
+            return answer, tokens
+        finally:
+            await service.close()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".jsonl.gz"])
+def test_replay_returns_recorded_answers_with_recorded_timing(monkeypatch, tmp_path, suffix):
+    path = str(tmp_path / f"cassette{suffix}")
+    answer, tokens = _record(monkeypatch, path)
+    interactions = load_cassette(path)
+    assert [i["stream"] for i in interactions] == [False, True]
+    assert len(interactions[1]["chunks"]) == 6
+
+    monkeypatch.delenv("LLM_RECORD_CASSETTE")
+    service = _service(monkeypatch, LLM_PROVIDER="replay", CASSETTE_PATH=path, REPLAY_SPEED=1)
+
+    async def replay():
+        start = time.perf_counter()
+        replayed_answer = await service.generate_response("What is Python?", 50, model="zephyr", use_cache=False)
+        answer_seconds = time.perf_counter() - start
+        replayed_tokens = [token async for token in service.stream_response("Explain AI", 50, use_cache=False)]
+        return replayed_answer, answer_seconds, replayed_tokens
+
+    replayed_answer, answer_seconds, replayed_tokens = asyncio.run(replay())
+    assert replayed_answer == answer
+    assert replayed_tokens == tokens
+    recorded_seconds = interactions[0]["latency_ms"] / 1000
+    assert recorded_seconds * 0.9 <= answer_seconds < recorded_seconds + 0.05
+
+
+def test_replay_speed_and_misses(monkeypatch, tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    _record(monkeypatch, path)
+    interactions = load_cassette(path)
+
+    strict = ReplayProvider(interactions, speed=0)
+    messages = [{"role": "user", "content": "Something else"}]
+    with pytest.raises(Exception) as error:
+        asyncio.run(strict.chat_completion(messages, interactions[0]["model"], 50, 0.7))
+    assert error.value.status == 404
+
+    sequential = ReplayProvider(interactions, speed=0, miss="sequential")
+    start = time.perf_counter()
+    response = asyncio.run(sequential.chat_completion(messages, "any-model", 10, 0.7))
+    assert time.perf_counter() - start < 0.01
+    assert response.choices[0].message.content == interactions[0]["text"]
+    assert sequential.stats()["misses"] == 1
+
+
+def test_recorded_failures_replay_as_failures(monkeypatch, tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    service = _service(monkeypatch, LLM_PROVIDER="stub", LLM_RECORD_CASSETTE=path,
+                       STUB_TTFT_SECONDS=0, STUB_ERROR_RATE=1, STUB_ERROR_STATUS=429)
+
+    async def run():
+        try:
+            await service.generate("hi", 10)
+        finally:
+            await service.close()
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(run())
+    assert load_cassette(path)[0]["status"] == 429
+
+    monkeypatch.delenv("LLM_RECORD_CASSETTE")
+    replay = _service(monkeypatch, LLM_PROVIDER="replay", CASSETTE_PATH=path)
+    with pytest.raises(UpstreamError) as error:
+        asyncio.run(replay.generate("hi", 10))
+    assert error.value.status_code == 429
+
+
+def test_recording_writes_off_the_event_loop(tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    recorder = CassetteRecorder(path)
+    threads = []
+    write_lines = recorder._write_lines
+
+    def recording_write(lines):
+        threads.append(threading.current_thread())
+        write_lines(lines)
+
+    recorder._write_lines = recording_write
+
+    async def run():
+        for i in range(5):
+            recorder.record({"model": "m", "text": str(i)})
+        assert threads == []
+        await recorder.close()
+
+    asyncio.run(run())
+    assert [i["text"] for i in load_cassette(path)] == ["0", "1", "2", "3", "4"]
+    assert threads and threading.main_thread() not in threads
@@ -0,0 +1,117 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import concurrency
+from concurrency import AdaptiveLimiter
+from resilience import UpstreamOverloaded
+
+
+@pytest.fixture(autouse=True)
+def fake_clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(concurrency, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def _feed(limiter, clock, latency, samples):
+    """Complete `samples` calls with the given latency while the limit is in use"""
+    for _ in range(samples):
+        limiter.in_flight = int(limiter.limit)
+        clock.now += latency / limiter.limit
+        limiter.release(latency)
+    limiter.in_flight = 0
+
+
+def test_limit_grows_while_latency_is_steady(fake_clock):
+    limiter = AdaptiveLimiter("m", initial_limit=4, max_limit=64)
+    _feed(limiter, fake_clock, 0.05, 300)
+    assert 16 < limiter.limit < 64
+    _feed(limiter, fake_clock, 0.05, 300)
+    assert limiter.limit == 64
+
+
+def test_limit_does_not_grow_when_unused(fake_clock):
+    limiter = AdaptiveLimiter("m", initial_limit=4, max_limit=64)
+    for _ in range(200):
+        limiter.in_flight = 1
+        limiter.release(0.05)
+    assert int(limiter.limit) == 4
+
+
+def test_rising_latency_shrinks_the_limit(fake_clock):
+    limiter = AdaptiveLimiter("m", initial_limit=32, max_limit=64)
+    _feed(limiter, fake_clock, 0.05, 200)
+    before = limiter.limit
+    _feed(limiter, fake_clock, 0.5, 200)
+    assert limiter.limit < before / 4
+    assert limiter.snapshot()["decreases"] > 1
+
+
+def test_at_most_one_decrease_per_round_trip(fake_clock):
+    limiter = AdaptiveLimiter("m", initial_limit=32, max_limit=64, backoff=0.5)
+    _feed(limiter, fake_clock, 0.1, 50)
+    before = limiter.limit
+    for _ in range(10):
+        limiter.in_flight = 1
+        limiter.release(None, dropped=True)
+    assert limiter.limit == before / 2
+
+
+def test_overload_errors_cut_the_limit_multiplicatively(fake_clock):
+    limiter = AdaptiveLimiter("m", initial_limit=40, max_limit=64, backoff=0.5, min_limit=2)
+    limiter.in_flight = 1
+    limiter.release(None, dropped=True)
+    assert int(limiter.limit) == 20
+    for _ in range(10):
+        fake_clock.now += 1
+        limiter.in_flight = 1
+        limiter.release(None, dropped=True)
+    assert limiter.limit == 2
+
+
+def test_fixed_mode_keeps_the_max_limit(fake_clock):
+    limiter = AdaptiveLimiter("m", max_limit=16, adaptive=False)
+    _feed(limiter, fake_clock, 0.5, 10)
+    limiter.in_flight = 1
+    limiter.release(None, dropped=True)
+    assert limiter.limit == 16
+
+
+def test_excess_work_waits_then_is_shed():
+    limiter = AdaptiveLimiter("m", initial_limit=1, max_queue=1, queue_timeout=0.05)
+
+    async def run():
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(UpstreamOverloaded):
+            await limiter.acquire()          # queue full -> shed at once
+        with pytest.raises(UpstreamOverloaded):
+            await waiting                    # waited too long -> shed
+        limiter.release(None)
+        await asyncio.wait_for(limiter.acquire(), 1)
+
+    asyncio.run(run())
+    assert limiter.snapshot()["shed"] == 2
+    assert limiter.in_flight == 1
+    assert limiter.queued == 0
+
+
+def test_released_slot_goes_to_the_oldest_waiter():
+    limiter = AdaptiveLimiter("m", initial_limit=1)
+    order = []
+
+    async def worker(name):
+        await limiter.acquire()
+        order.append(name)
+        await asyncio.sleep(0)
+        limiter.release(0.01)
+
+    async def run():
+        await asyncio.gather(*(worker(i) for i in range(5)))
+
+    asyncio.run(run())
+    assert order == [0, 1, 2, 3, 4]
+    assert limiter.in_flight == 0
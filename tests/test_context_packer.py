@@ -0,0 +1,61 @@
+from context_packer import ContextPacker, estimate_tokens
+from conversations import InMemoryConversationStore, Turn
+
+
+def make_conversation(turns, system_prompt="Be brief", max_turns=1000):
+    store = InMemoryConversationStore(max_turns=max_turns)
+    conversation = store.create("alice", system_prompt=system_prompt)
+    store.append("alice", conversation.id, [
+        Turn("user" if i % 2 == 0 else "assistant", f"Turn {i} starts here. " + "filler words " * 20, float(i))
+        for i in range(turns)
+    ])
+    return store, conversation
+
+
+def test_short_conversations_are_sent_whole():
+    _, conversation = make_conversation(4)
+    packed = ContextPacker({"m": 4096}).pack(conversation, "next", "m", 256)
+    assert packed.system_prompt == "Be brief"
+    assert len(packed.history) == 4
+    assert packed.turns_summarized == 0
+
+
+def test_long_conversations_fit_the_budget_with_a_summary():
+    _, conversation = make_conversation(200)
+    packer = ContextPacker({"m": 2048}, max_prompt_tokens=4096, summary_tokens=200)
+    packed = packer.pack(conversation, "next question", "m", 512)
+
+    assert packed.prompt_tokens <= packer.budget("m", 512) == 1536
+    # The newest turns go verbatim, older ones only as summary lines
+    assert packed.history[-1]["content"].startswith("Turn 199 ")
+    assert 0 < packed.turns_included < 200
+    assert packed.system_prompt.startswith("Be brief\n\nSummary of the earlier conversation:")
+    assert "- Assistant: Turn" in packed.system_prompt
+    assert sum(line.tokens for line in conversation.summary_lines) <= 200
+    # Summaries cover the turns just before the verbatim window
+    first_kept = 200 - packed.turns_included
+    assert f"Turn {first_kept - 1} starts here." in packed.system_prompt
+
+
+def test_a_bigger_answer_leaves_less_room_for_history():
+    _, conversation = make_conversation(200)
+    packer = ContextPacker({"m": 4096})
+    short = packer.pack(conversation, "q", "m", 128)
+    long = packer.pack(conversation, "q", "m", 2048)
+    assert long.turns_included < short.turns_included
+
+
+def test_each_turn_is_summarized_once():
+    store, conversation = make_conversation(100)
+    packer = ContextPacker({"m": 2048}, summary_tokens=10_000)
+    for i in range(50):
+        packer.pack(conversation, "q", "m", 512)
+        store.append("alice", conversation.id, [Turn("user", f"Extra {i}. " + "more " * 30, 0.0)])
+    packed = packer.pack(conversation, "q", "m", 512)
+    assert packer.turns_summarized == conversation.summarized == 150 - packed.turns_included
+    assert [line.turn for line in conversation.summary_lines] == list(range(conversation.summarized))
+
+
+def test_token_counts_are_cached_on_the_turn():
+    store, conversation = make_conversation(1)
+    assert conversation.turns[0].tokens == estimate_tokens(conversation.turns[0].content) > 0
@@ -0,0 +1,74 @@
+import os
+
+from conversation_log import INDEX_ENTRY, LogConversationStore
+from conversations import Turn
+
+
+def _turns(start, stop):
+    return [Turn("user" if i % 2 == 0 else "assistant", f"message {i}", float(i)) for i in range(start, stop)]
+
+
+def test_conversations_survive_a_restart(tmp_path):
+    store = LogConversationStore(str(tmp_path))
+    conversation = store.create("alice", system_prompt="Be brief", model="zephyr")
+    store.append("alice", conversation.id, _turns(0, 3))
+    store.close()
+
+    reopened = LogConversationStore(str(tmp_path)).get("alice", conversation.id)
+    assert reopened.system_prompt == "Be brief"
+    assert reopened.model == "zephyr"
+    assert [m["content"] for m in reopened.messages()] == ["message 0", "message 1", "message 2"]
+    assert reopened.turns[0].tokens > 0
+
+
+def test_pages_and_last_turns_are_read_by_offset(tmp_path):
+    store = LogConversationStore(str(tmp_path), max_turns=10_000)
+    conversation = store.create("alice")
+    for start in range(0, 1000, 100):
+        store.append("alice", conversation.id, _turns(start, start + 100))
+    turns = conversation.turns
+    assert len(turns) == 1000
+    assert [t.content for t in turns[-3:]] == ["message 997", "message 998", "message 999"]
+    assert [t.content for t in turns[500:502]] == ["message 500", "message 501"]
+    assert turns[-1].role == "assistant"
+
+
+def test_old_turns_are_dropped_and_the_segment_compacted(tmp_path):
+    store = LogConversationStore(str(tmp_path), max_turns=50)
+    conversation = store.create("alice")
+    for start in range(0, 500, 10):
+        store.append("alice", conversation.id, _turns(start, start + 10))
+    assert len(conversation.turns) == 50
+    assert conversation.turns[0].content == "message 450"
+    assert conversation.dropped == 450
+    assert store.stats()["compactions"] > 0
+
+    path = store._path("alice", conversation.id)
+    assert os.path.getsize(f"{path}.idx") < 150 * INDEX_ENTRY.size
+    reopened = LogConversationStore(str(tmp_path), max_turns=50).get("alice", conversation.id)
+    assert reopened.turns[0].content == "message 450"
+    assert reopened.dropped == 450
+
+
+def test_delete_removes_the_files_and_foreign_ids_are_rejected(tmp_path):
+    store = LogConversationStore(str(tmp_path))
+    conversation = store.create("alice")
+    store.append("alice", conversation.id, _turns(0, 2))
+    assert store.get("bob", conversation.id) is None
+    assert store.get("alice", "../../etc/passwd") is None
+
+    assert store.delete("alice", conversation.id)
+    assert store.get("alice", conversation.id) is None
+    assert os.listdir(store._user_dir("alice")) == []
+
+
+def test_a_torn_index_write_is_ignored(tmp_path):
+    store = LogConversationStore(str(tmp_path))
+    conversation = store.create("alice")
+    store.append("alice", conversation.id, _turns(0, 2))
+    store.close()
+    with open(f"{store._path('alice', conversation.id)}.idx", "ab") as index:
+        index.write(b"\x01\x02\x03")
+
+    reopened = LogConversationStore(str(tmp_path)).get("alice", conversation.id)
+    assert len(reopened.turns) == 2
@@ -0,0 +1,54 @@
+import pytest
+
+from conversation_log import LogConversationStore
+from conversations import Conversation, ConversationStore, InMemoryConversationStore, Turn
+
+
+def _turns(n, start=0):
+    return [Turn("user", f"message {i}", float(i)) for i in range(start, start + n)]
+
+
+def test_conversations_belong_to_their_user():
+    store = InMemoryConversationStore()
+    conversation = store.create("alice", system_prompt="Be brief")
+    assert store.get("alice", conversation.id) is conversation
+    assert store.get("bob", conversation.id) is None
+    assert not store.append("bob", conversation.id, _turns(1))
+    assert not store.delete("bob", conversation.id)
+    assert store.delete("alice", conversation.id)
+    assert store.list("alice") == []
+
+
+def test_each_conversation_keeps_its_latest_turns():
+    store = InMemoryConversationStore(max_turns=4)
+    conversation = store.create("alice")
+    store.append("alice", conversation.id, _turns(3))
+    store.append("alice", conversation.id, _turns(3, start=3))
+    assert [m["content"] for m in conversation.messages()] == [f"message {i}" for i in range(2, 6)]
+    assert store.stats()["turns_dropped"] == 2
+
+
+def test_least_recently_used_conversations_and_users_are_evicted():
+    store = InMemoryConversationStore(max_per_user=2, max_users=2)
+    first = store.create("alice")
+    second = store.create("alice")
+    store.get("alice", first.id)            # first is now the most recent
+    third = store.create("alice")
+    assert [c.id for c in store.list("alice")] == [third.id, first.id]
+    assert store.get("alice", second.id) is None
+
+    store.create("bob")
+    store.create("carol")                   # alice is the least recently active
+    assert store.list("alice") == []
+    assert store.stats()["users"] == 2
+
+
+def test_store_backends_must_implement_the_whole_interface(tmp_path):
+    class PartialStore(ConversationStore):
+        def create(self, username, system_prompt=None, model=None):
+            return Conversation("c1", username)
+
+    with pytest.raises(TypeError):
+        PartialStore()
+    assert isinstance(InMemoryConversationStore(), ConversationStore)
+    assert isinstance(LogConversationStore(str(tmp_path)), ConversationStore)
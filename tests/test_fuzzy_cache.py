@@ -0,0 +1,30 @@
+from fuzzy_cache import FuzzyCache
+
+
+def test_near_duplicates_hit_and_unrelated_prompts_miss():
+    cache = FuzzyCache(threshold=0.8)
+    cache.set("mistral", "What is Python programming?", "A language")
+
+    assert cache.get("mistral", "what is python programming") == "A language"
+    assert cache.get("mistral", "WHAT IS PYTHON PROGRAMMING!!") == "A language"
+    assert cache.get("mistral", "What is Rust programming?") is None
+    assert cache.stats()["hits"] == 2
+
+
+def test_partitions_are_isolated():
+    cache = FuzzyCache()
+    cache.set("mistral", "tell me a programming joke", "joke")
+    assert cache.get("zephyr", "tell me a programming joke") is None
+
+
+def test_eviction_cleans_up_buckets_and_respects_memory_cap():
+    cache = FuzzyCache(max_entries=10, max_bytes=12_000)
+    for i in range(100):
+        cache.set("p", f"question number {i} about topic {i * 7}", "answer")
+
+    stats = cache.stats()
+    assert stats["entries"] <= 10
+    assert stats["memory_bytes"] <= 12_000
+    assert stats["evictions"] >= 90
+    # Only buckets of live entries remain
+    assert stats["buckets"] <= stats["entries"] * cache.bands
@@ -0,0 +1,22 @@
+from latency import LatencyHistogram
+
+
+def test_percentiles_are_within_bucket_precision():
+    histogram = LatencyHistogram(window=10_000)
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+
+    assert abs(histogram.percentile(50) - 0.5) / 0.5 < 0.06
+    assert abs(histogram.percentile(99) - 0.99) / 0.99 < 0.06
+    assert histogram.snapshot()["count"] == 1000
+
+
+def test_old_samples_age_out_of_the_window():
+    histogram = LatencyHistogram(window=100)
+    for _ in range(100):
+        histogram.record(5.0)
+    for _ in range(150):
+        histogram.record(0.01)
+
+    assert histogram.count == 150
+    assert histogram.percentile(99) < 0.02
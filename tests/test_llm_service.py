@@ -0,0 +1,260 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm_service import LLMService
+from resilience import UpstreamBadRequest, UpstreamError, UpstreamOverloaded
+
+
+def _completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+class SlowClient:
+    """Fake AsyncInferenceClient that records peak concurrency"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def chat_completion(self, messages, model, max_tokens, temperature, stream=False):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            return _completion(f"answer to {messages[-1]['content']}")
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        pass
+
+
+def use_client(service, client):
+    """Point every model of the service at the same fake client"""
+    for state in service.models.values():
+        state.client = client
+    return client
+
+
+def test_generate_response_runs_concurrently_up_to_limit(monkeypatch):
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "8")
+    service = LLMService()
+    client = use_client(service, SlowClient(delay=0.05))
+
+    async def run():
+        start = time.perf_counter()
+        answers = await asyncio.gather(
+            *(service.generate_response(f"q{i}", 10) for i in range(32))
+        )
+        return answers, time.perf_counter() - start
+
+    answers, elapsed = asyncio.run(run())
+
+    assert answers[3] == "answer to q3"
+    assert client.peak == 8
+    # 32 calls at 8 in flight -> ~4 rounds, far below 32 serial rounds
+    assert elapsed < 32 * 0.05 / 2
+
+
+class FailingClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def chat_completion(self, messages, model, max_tokens, temperature, stream=False):
+        self.calls += 1
+        raise RuntimeError("upstream down")
+
+
+def test_identical_prompts_are_served_from_cache():
+    service = LLMService()
+    client = use_client(service, SlowClient(delay=0))
+
+    first = asyncio.run(service.generate_response("What is Python?", 50))
+    second = asyncio.run(service.generate_response("What  is Python?", 50))
+    bypassed = asyncio.run(service.generate_response("What is Python?", 50, use_cache=False))
+
+    assert first == second == bypassed
+    assert client.calls == 2
+    assert service.cache.stats()["hits"] == 1
+
+
+def test_errors_are_raised_and_never_cached():
+    service = LLMService()
+    client = use_client(service, FailingClient())
+
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            asyncio.run(service.generate_response("hi", 50))
+
+    assert client.calls == 2
+    assert len(service.cache) == 0
+
+
+def test_fuzzy_tier_serves_near_duplicate_prompts(monkeypatch):
+    monkeypatch.setenv("FUZZY_CACHE_ENABLED", "true")
+    service = LLMService()
+    client = use_client(service, SlowClient(delay=0))
+
+    first = asyncio.run(service.generate_response("What is Python?", 50, system_prompt="Be brief"))
+    second = asyncio.run(service.generate_response("what is python", 50, system_prompt="Be brief"))
+    other_system = asyncio.run(service.generate_response("what is python", 50, system_prompt="Be verbose"))
+
+    assert first == second == "answer to What is Python?"
+    assert other_system == "answer to what is python"
+    assert client.calls == 2
+    assert service.cache_stats()["fuzzy"]["hits"] == 1
+
+
+def test_concurrent_identical_queries_are_coalesced():
+    service = LLMService()
+    client = use_client(service, SlowClient(delay=0.02))
+
+    async def run():
+        return await asyncio.gather(
+            *(service.generate_response("hot question", 50, use_cache=False) for _ in range(5))
+        )
+
+    assert set(asyncio.run(run())) == {"answer to hot question"}
+    assert client.calls == 1
+    assert service.stats()["coalescing"]["coalesced"] == 4
+
+
+def use_client_for(service, name):
+    client = SlowClient(delay=0.02)
+    service.models[name].client = client
+    return client
+
+
+def test_models_run_side_by_side_with_separate_limits(monkeypatch):
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "2")
+    service = LLMService()
+    clients = {name: use_client_for(service, name) for name in service.models}
+
+    async def run():
+        return await asyncio.gather(*(
+            service.generate_response(f"q{i}", 10, model=name)
+            for name in service.models for i in range(4)
+        ))
+
+    asyncio.run(run())
+    stats = service.stats()["models"]
+    for name, client in clients.items():
+        assert client.peak == 2
+        assert stats[name]["requests"] == 4
+
+
+def test_excess_load_is_shed_without_opening_the_circuit(monkeypatch):
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "1")
+    monkeypatch.setenv("LLM_MAX_QUEUE", "1")
+    service = LLMService()
+    client = use_client(service, SlowClient(delay=0.05))
+
+    async def run():
+        return await asyncio.gather(
+            *(service.generate_response(f"q{i}", 10) for i in range(8)),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    shed = [r for r in results if isinstance(r, UpstreamOverloaded)]
+    assert len(shed) == 6
+    assert client.calls == 2
+    assert service.health()["mistral"]["state"] == "closed"
+    assert service.stats()["models"]["mistral"]["concurrency"]["shed"] == 6
+
+
+class StreamingClient(SlowClient):
+    """Fake client that streams two chunks after an initial delay"""
+
+    async def chat_completion(self, messages, model, max_tokens, temperature, stream=False):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self._chunks(model)
+
+    async def _chunks(self, model):
+        for text in (model, " done"):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def hedging_service(monkeypatch, primary_delay, fallback_delay, client_cls=SlowClient):
+    monkeypatch.setenv("HEDGE_ENABLED", "true")
+    monkeypatch.setenv("HEDGE_DEFAULT_DELAY_SECONDS", "0.05")
+    service = LLMService()
+    service.models["mistral"].client = client_cls(delay=primary_delay)
+    service.models["zephyr"].client = client_cls(delay=fallback_delay)
+    return service
+
+
+def test_slow_primary_is_hedged_and_loser_cancelled(monkeypatch):
+    service = hedging_service(monkeypatch, primary_delay=1.0, fallback_delay=0.01)
+
+    async def run():
+        completion = await service.generate("q", 10, model="mistral")
+        await asyncio.sleep(0)
+        return completion
+
+    completion = asyncio.run(run())
+
+    assert completion.model == "zephyr"
+    stats = service.stats()
+    assert stats["hedging"]["fired"] == 1
+    assert stats["hedging"]["won"] == 1
+    assert stats["models"]["mistral"]["cancelled"] == 1
+
+
+def test_fast_primary_is_not_hedged(monkeypatch):
+    service = hedging_service(monkeypatch, primary_delay=0.001, fallback_delay=0.001)
+
+    completion = asyncio.run(service.generate("q", 10, model="mistral"))
+
+    assert completion.model == "mistral"
+    assert service.models["zephyr"].client.calls == 0
+
+
+def test_stream_hedges_on_slow_first_token(monkeypatch):
+    service = hedging_service(monkeypatch, 1.0, 0.01, client_cls=StreamingClient)
+
+    async def run():
+        return [pair async for pair in service.stream("q", 10, model="mistral")]
+
+    pairs = asyncio.run(run())
+
+    assert pairs == [("zephyr", service.MODELS["zephyr"]), ("zephyr", " done")]
+    assert service.stats()["hedging"]["won"] == 1
+
+
+class RejectingClient(SlowClient):
+    """Fake client that rejects every request with a 400 after a delay"""
+
+    async def chat_completion(self, messages, model, max_tokens, temperature, stream=False):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        error = Exception("prompt too long")
+        error.status = 400
+        raise error
+
+
+@pytest.mark.parametrize("primary_delay", [0.001, 0.1])
+@pytest.mark.parametrize("streaming", [False, True])
+def test_rejected_request_is_not_hedged_to_another_model(monkeypatch, primary_delay, streaming):
+    service = hedging_service(monkeypatch, primary_delay, 1.0)
+    service.models["mistral"].client = RejectingClient(delay=primary_delay)
+
+    async def run():
+        if streaming:
+            return [pair async for pair in service.stream("q", 10, model="mistral", use_cache=False)]
+        return await service.generate("q", 10, model="mistral", use_cache=False)
+
+    start = time.perf_counter()
+    with pytest.raises(UpstreamBadRequest):
+        asyncio.run(run())
+    # The primary's 400 comes back without waiting on the (slow) fallback
+    assert time.perf_counter() - start < 0.5
+    fired = service.stats()["hedging"]["fired"]
+    assert service.models["zephyr"].client.calls == fired == (1 if primary_delay > 0.05 else 0)
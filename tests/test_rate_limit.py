@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from rate_limit import RateLimiter, RateLimitPolicy, parse_limits
+
+
+@pytest.fixture(autouse=True)
+def fake_clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_bucket_allows_a_burst_then_refills_lazily(fake_clock):
+    limiter = RateLimiter({("default", "query"): RateLimitPolicy(3, 60)})
+
+    results = [limiter.check("demo", "default", "query") for _ in range(4)]
+    assert [r.allowed for r in results] == [True, True, True, False]
+    assert results[2].remaining == 0
+    assert results[3].retry_after == pytest.approx(20)
+
+    fake_clock.now += 20
+    again = limiter.check("demo", "default", "query")
+    assert again.allowed
+    assert again.reset == pytest.approx(60)
+
+
+def test_users_and_endpoints_have_separate_buckets():
+    limiter = RateLimiter({
+        ("default", "query"): RateLimitPolicy(1, 60),
+        ("default", "switch-model"): RateLimitPolicy(1, 60),
+    })
+    assert limiter.check("demo", "default", "query").allowed
+    assert not limiter.check("demo", "default", "query").allowed
+    assert limiter.check("demo", "default", "switch-model").allowed
+    assert limiter.check("user", "default", "query").allowed
+
+
+def test_tier_limits_fall_back_to_default():
+    limiter = RateLimiter({
+        ("default", "query"): RateLimitPolicy(1, 60),
+        ("admin", "query"): RateLimitPolicy(100, 60),
+    })
+    assert limiter.check("admin", "admin", "query").remaining == 99
+    assert limiter.check("demo", "batch", "query").policy.limit == 1
+    assert limiter.check("demo", "default", "models") is None
+
+
+def test_idle_buckets_are_evicted_and_memory_is_bounded(fake_clock):
+    limiter = RateLimiter({("default", "query"): RateLimitPolicy(5, 60)}, max_buckets=100)
+    for i in range(500):
+        limiter.check(f"user{i}", "default", "query")
+    assert limiter.stats()["buckets"] <= 100
+
+    fake_clock.now += 61
+    for i in range(3):
+        limiter.check(f"new{i}", "default", "query")
+    # Each insert also drops up to two buckets that are full again
+    assert limiter.stats()["buckets"] <= 100 - 3
+
+
+def test_headers_follow_the_ratelimit_fields():
+    limiter = RateLimiter({("default", "query"): RateLimitPolicy(1, 60)})
+    ok = limiter.check("demo", "default", "query").headers()
+    denied = limiter.check("demo", "default", "query").headers()
+
+    assert ok == {
+        "RateLimit-Limit": "1",
+        "RateLimit-Remaining": "0",
+        "RateLimit-Reset": "60",
+        "RateLimit-Policy": "1;w=60",
+    }
+    assert "Retry-After" not in ok
+    assert denied["Retry-After"] == "60"
+
+
+def test_parse_limits():
+    assert parse_limits("default:query=30/60, admin:query=300") == {
+        ("default", "query"): RateLimitPolicy(30, 60),
+        ("admin", "query"): RateLimitPolicy(300, 60),
+    }
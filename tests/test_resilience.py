@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    UpstreamBadRequest,
+    UpstreamRateLimited,
+    UpstreamUnavailable,
+    call_with_resilience,
+    classify_error,
+)
+
+
+class HTTPFailure(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.headers = headers or {}
+
+
+def flaky(failures, status=503):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise HTTPFailure(status)
+        return "ok"
+
+    return fn, calls
+
+
+NO_WAIT = RetryPolicy(attempts=3, base_delay=0, max_delay=0)
+
+
+def test_errors_are_classified_by_status():
+    assert isinstance(classify_error("m", HTTPFailure(503)), UpstreamUnavailable)
+    assert isinstance(classify_error("m", HTTPFailure(422)), UpstreamBadRequest)
+    limited = classify_error("m", HTTPFailure(429, {"Retry-After": "7"}))
+    assert isinstance(limited, UpstreamRateLimited)
+    assert limited.retry_after == 7
+    assert classify_error("m", TimeoutError()).status_code == 504
+
+
+def test_retryable_errors_are_retried_until_success():
+    fn, calls = flaky(failures=2)
+    breaker = CircuitBreaker("m", failure_threshold=5)
+
+    assert asyncio.run(call_with_resilience(fn, "m", breaker, NO_WAIT)) == "ok"
+    assert len(calls) == 3
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_bad_requests_are_not_retried():
+    fn, calls = flaky(failures=5, status=400)
+    with pytest.raises(UpstreamBadRequest):
+        asyncio.run(call_with_resilience(fn, "m", CircuitBreaker("m"), NO_WAIT))
+    assert len(calls) == 1
+
+
+def test_breaker_opens_fails_fast_and_recovers_after_probe(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("m", failure_threshold=3, reset_timeout=30)
+    fn, calls = flaky(failures=3)
+
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(call_with_resilience(fn, "m", breaker, NO_WAIT))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError) as error:
+        asyncio.run(call_with_resilience(fn, "m", breaker, NO_WAIT))
+    assert error.value.retry_after == 30
+    assert len(calls) == 3
+
+    now[0] += 31
+    assert asyncio.run(call_with_resilience(fn, "m", breaker, NO_WAIT)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
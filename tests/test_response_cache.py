@@ -0,0 +1,47 @@
+import time
+
+from response_cache import ResponseCache, make_cache_key
+
+
+def test_key_ignores_whitespace_but_not_parameters():
+    a = make_cache_key("m", [{"role": "user", "content": "What  is Python?\n"}], 150, 0.7)
+    b = make_cache_key("m", [{"role": "user", "content": "What is Python?"}], 150, 0.7)
+    c = make_cache_key("m", [{"role": "user", "content": "What is Python?"}], 200, 0.7)
+    d = make_cache_key("other", [{"role": "user", "content": "What is Python?"}], 150, 0.7)
+    assert a == b
+    assert len({a, c, d}) == 3
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = ResponseCache(ttl_seconds=10)
+    cache.set("a", "1")
+
+    now[0] += 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 0
+    assert stats["memory_bytes"] == 0
+
+
+def test_memory_budget_is_enforced():
+    cache = ResponseCache(max_entries=1000, max_bytes=2000)
+    for i in range(50):
+        cache.set(str(i), "x" * 200)
+    assert cache.stats()["memory_bytes"] <= 2000
+    assert len(cache) < 50
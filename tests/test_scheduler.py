@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from scheduler import FairScheduler, QueueFullError, QueueTimeoutError, parse_weights
+
+
+async def _run_all(scheduler, jobs):
+    """Hold one slot, queue `jobs` (username, lane), then record dispatch order"""
+    order = []
+
+    async def job(username, lane):
+        async with scheduler.slot(username, lane):
+            order.append(username)
+            await asyncio.sleep(0)
+
+    await scheduler.acquire("holder")
+    tasks = []
+    for username, lane in jobs:
+        tasks.append(asyncio.ensure_future(job(username, lane)))
+        await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_flooding_user_does_not_starve_others():
+    scheduler = FairScheduler(max_concurrent=1)
+    jobs = [("flood", "default")] * 6 + [("alice", "default"), ("bob", "default")]
+
+    order = asyncio.run(_run_all(scheduler, jobs))
+
+    # alice and bob are served within the first rounds, not after all 6 flood jobs
+    assert order.index("alice") <= 2
+    assert order.index("bob") <= 2
+
+
+def test_weights_scale_a_users_share():
+    scheduler = FairScheduler(max_concurrent=1, weights={"heavy": 2.0})
+    jobs = [("light", "default")] * 4 + [("heavy", "default")] * 4
+
+    order = asyncio.run(_run_all(scheduler, jobs))
+
+    assert order[:6].count("heavy") == 4
+
+
+def test_higher_lane_is_served_first():
+    scheduler = FairScheduler(max_concurrent=1)
+    jobs = [("demo", "batch"), ("demo", "default"), ("admin", "admin")]
+
+    order = asyncio.run(_run_all(scheduler, jobs))
+
+    assert order[0] == "admin"
+
+
+def test_full_queue_rejects_with_depth_hint():
+    scheduler = FairScheduler(max_concurrent=1, max_queue=2)
+
+    async def run():
+        await scheduler.acquire("a")
+        waiting = [asyncio.ensure_future(scheduler.acquire(u)) for u in ("b", "c")]
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError) as excinfo:
+            await scheduler.acquire("d")
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        return excinfo.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 429
+    assert error.queue_depth == 2
+    assert error.retry_after >= 1
+    assert scheduler.stats()["queue_depth"] == 0
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_waiting_too_long_times_out_and_frees_the_queue():
+    scheduler = FairScheduler(max_concurrent=1, max_wait=0.01)
+
+    async def run():
+        await scheduler.acquire("a")
+        with pytest.raises(QueueTimeoutError):
+            await scheduler.acquire("b")
+        scheduler.release()
+        # The abandoned waiter must not have taken the freed slot
+        await asyncio.wait_for(scheduler.acquire("c"), 1)
+
+    asyncio.run(run())
+    assert scheduler.stats()["running"] == 1
+    assert scheduler.stats()["timed_out"] == 1
+
+
+def test_queue_wait_is_recorded_per_lane():
+    scheduler = FairScheduler(max_concurrent=1)
+    asyncio.run(_run_all(scheduler, [("demo", "default"), ("admin", "admin")]))
+
+    lanes = scheduler.stats()["lanes"]
+    assert lanes["admin"]["wait"]["count"] == 1
+    assert lanes["default"]["wait"]["count"] == 2
+
+
+def test_parse_weights():
+    assert parse_weights("alice=2, bob=0.5,") == {"alice": 2.0, "bob": 0.5}
+    assert parse_weights("") == {}
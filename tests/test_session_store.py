@@ -0,0 +1,115 @@
+from types import SimpleNamespace
+import sys
+import threading
+
+from session_store import SessionStore
+
+
+def make_store(**kwargs):
+    clock = SimpleNamespace(now=1000.0)
+    store = SessionStore(clock=lambda: clock.now, **kwargs)
+    return store, clock
+
+
+def test_sessions_expire_after_max_age_even_when_active():
+    store, clock = make_store(max_age=100, idle_timeout=50)
+    store.add("t", "demo")
+    for _ in range(3):
+        clock.now += 30
+        assert store.touch("t").username == "demo"
+    clock.now += 30
+    assert store.touch("t") is None
+    assert len(store) == 0
+
+
+def test_idle_sessions_time_out():
+    store, clock = make_store(max_age=1000, idle_timeout=50)
+    store.add("active", "demo")
+    store.add("idle", "user")
+    clock.now += 40
+    store.touch("active")
+    clock.now += 20
+
+    assert store.sweep() == 1
+    assert store.get("idle") is None
+    assert store.get("active").username == "demo"
+    assert store.stats()["idled_out"] == 1
+
+
+def test_sweep_removes_expired_sessions_in_batches():
+    store, clock = make_store(max_age=100, idle_timeout=1000, resolution=1)
+    for i in range(10):
+        store.add(f"old{i}", "demo")
+    clock.now += 50
+    store.add("new", "demo")
+    clock.now += 60
+
+    assert store.sweep(limit=4) == 4
+    assert store.sweep() == 6
+    assert store.sweep() == 0
+    assert list(t for t, _ in store.page()) == ["new"]
+
+
+def test_max_sessions_evicts_least_recently_active():
+    store, clock = make_store(max_sessions=3)
+    for token in ("a", "b", "c"):
+        store.add(token, "demo")
+    store.touch("a")
+    store.add("d", "demo")
+
+    assert store.get("b") is None
+    assert {t for t, _ in store.page()} == {"a", "c", "d"}
+    assert store.stats()["evicted"] == 1
+
+
+def test_removed_sessions_leave_nothing_in_the_expiry_index():
+    store, clock = make_store(max_age=100, max_sessions=10)
+    for i in range(5000):
+        clock.now += 1
+        store.add(f"t{i}", "demo")
+        if i % 2:
+            store.remove(f"t{i}")
+    assert len(store) == 9
+    assert sum(len(tokens) for tokens in store._wheel.values()) == 9
+
+
+def test_page_lists_most_recently_active_first():
+    store, clock = make_store()
+    for token in ("a", "b", "c", "d"):
+        clock.now += 1
+        store.add(token, "demo")
+    store.touch("b")
+
+    assert [t for t, _ in store.page(0, 2)] == ["b", "d"]
+    assert [t for t, _ in store.page(2, 2)] == ["c", "a"]
+
+
+def test_requests_on_other_threads_do_not_break_the_sweep():
+    # Dependencies touch the store from the threadpool while sweep() runs
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    store, clock = make_store(max_age=5, idle_timeout=1000, resolution=1)
+    errors = []
+
+    def requests():
+        try:
+            for i in range(20000):
+                store.add(f"t{i}", "demo")
+                store.touch(f"t{i - 3}")
+                store.remove(f"t{i - 7}")
+        except Exception as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=requests)
+    worker.start()
+    try:
+        while worker.is_alive():
+            clock.now += 1
+            store.sweep(limit=50)
+    finally:
+        worker.join()
+        sys.setswitchinterval(switch_interval)
+
+    assert errors == []
+    store.sweep()
+    assert sum(len(tokens) for tokens in store._wheel.values()) == len(store)
@@ -0,0 +1,76 @@
+import secrets
+
+import auth
+from signed_tokens import BloomFilter, RevocationList, TokenSigner
+
+
+def test_signed_token_round_trip():
+    signer = TokenSigner(["s3cret"], max_age=100)
+    token = signer.issue("demo", now=1000)
+    claims = signer.verify(token, now=1050)
+    assert claims.username == "demo"
+    assert claims.expires_at == 1100
+    assert signer.verify(token, now=1100) is None
+
+
+def test_tampered_or_foreign_tokens_are_rejected():
+    signer = TokenSigner(["s3cret"])
+    token = signer.issue("demo")
+    body, _, mac = token.partition(".")
+    forged = TokenSigner(["other"]).issue("admin")
+    assert signer.verify(forged) is None
+    assert signer.verify(forged.partition(".")[0] + "." + mac) is None
+    assert signer.verify(body[:-2] + "." + mac) is None
+    assert signer.verify("not a token") is None
+
+
+def test_old_secret_still_verifies_after_rotation():
+    token = TokenSigner(["old"]).issue("demo")
+    assert TokenSigner(["new", "old"]).verify(token).username == "demo"
+    assert TokenSigner(["new"]).verify(token) is None
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    added = [secrets.token_hex(8) for _ in range(1000)]
+    for item in added:
+        bloom.add(item)
+    assert all(item in bloom for item in added)
+    false_positives = sum(secrets.token_hex(8) in bloom for _ in range(10_000))
+    assert false_positives < 300
+
+
+def test_revocations_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "revoked.db")
+    worker_a = RevocationList(path, refresh_interval=0)
+    worker_b = RevocationList(path, refresh_interval=0)
+    assert not worker_b.is_revoked("abc")
+    worker_a.revoke("abc", expires_at=2000)
+    assert worker_a.is_revoked("abc")
+    assert worker_b.is_revoked("abc")
+    assert not worker_b.is_revoked("def")
+
+    # Once the token would have expired anyway, the revocation can go
+    assert worker_a.prune(now=1000) == 0
+    assert worker_a.prune(now=2000) == 1
+    assert not worker_a.is_revoked("abc")
+    worker_a.close()
+    worker_b.close()
+
+
+def test_logout_revokes_a_signed_token(tmp_path, monkeypatch):
+    revocations = RevocationList(str(tmp_path / "revoked.db"))
+    monkeypatch.setattr(auth, "SIGNER", TokenSigner(["s3cret"]))
+    monkeypatch.setattr(auth, "REVOCATIONS", revocations)
+
+    token = auth.authenticate_user("demo", "demo123")
+    assert token not in auth.SESSIONS
+    assert auth.set_session_model(token, "zephyr")
+    assert auth.get_session_model(token) == "zephyr"
+    assert auth.get_user_info(token).username == "demo"
+
+    assert auth.logout_user(token)
+    assert auth.signed_claims(token) is None
+    assert auth.get_session_model(token) is None
+    assert not auth.logout_user(token)
+    revocations.close()